@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class QueueFull(Exception):
+    """Too many requests are already waiting for the key"""
+
+
+class AdmissionQueue:
+    """Per-key locks granted in arrival order, with a bounded queue
+
+    Each key has a queue of waiters, the first one holds the key and hands
+    it over to the next when done, so nobody is overtaken. A request
+    arriving when ``max_depth`` requests are already queued is refused with
+    QueueFull instead of waiting. Like KeyedLocks, callers needing several
+    keys must always acquire them in the same order.
+    """
+
+    def __init__(self, max_depth=100):
+        self.max_depth = max_depth
+        self.admitted = 0
+        self.shed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def hold(self, key):
+        started = time.perf_counter()
+        with self._lock:
+            queue = self._queues.setdefault(key, deque())
+            if len(queue) >= self.max_depth:
+                self.shed += 1
+                raise QueueFull(key)
+            waiter = threading.Lock()
+            waiter.acquire()
+            queue.append(waiter)
+            if len(queue) == 1:
+                waiter.release()
+        # Released by the previous holder, or above when first in line
+        waiter.acquire()
+        waited = time.perf_counter() - started
+        with self._lock:
+            self.admitted += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        try:
+            yield
+        finally:
+            with self._lock:
+                queue.popleft()
+                if queue:
+                    queue[0].release()
+                else:
+                    del self._queues[key]
+
+    def depth(self, key):
+        """Return the number of requests holding or waiting for the key"""
+
+        queue = self._queues.get(key)
+        return 0 if queue is None else len(queue)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "depths": {key: len(queue)
+                           for key, queue in self._queues.items()},
+                "admitted": self.admitted,
+                "shed": self.shed,
+                "waitSecondsTotal": self.wait_total,
+                "waitSecondsMax": self.wait_max,
+            }
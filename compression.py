@@ -0,0 +1,39 @@
+import gzip
+
+import brotli
+
+# Preferred first, when the client accepts both as much
+ENCODINGS = ("br", "gzip")
+# Fast enough to compress per request, Brotli still beats gzip in size
+LEVELS = {"br": 5, "gzip": 6}
+COMPRESSIBLE = ("text/", "application/json", "application/javascript",
+                "image/svg+xml")
+
+
+def negotiate(accept_encodings):
+    """Return the encoding to send given the Accept-Encoding, or None"""
+
+    best = None
+    best_quality = 0
+    for encoding in ENCODINGS:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best = encoding
+            best_quality = quality
+    return best
+
+
+def compressible(mimetype):
+    return mimetype is not None and mimetype.startswith(COMPRESSIBLE)
+
+
+def compress(body, encoding):
+    """Return body, bytes or text, compressed with encoding"""
+
+    if isinstance(body, str):
+        body = body.encode()
+    if encoding == "br":
+        return brotli.compress(body, quality=LEVELS["br"])
+    # Without a timestamp the same page always compresses the same
+    return gzip.compress(body, compresslevel=LEVELS["gzip"], mtime=0)
+
@@ -0,0 +1,138 @@
+import json
+import logging
+import os
+import threading
+
+from models import Booking
+from persistence import write_atomic
+
+
+def encode(seq, booking):
+    record = {"seq": seq, "club": booking.club,
+              "competition": booking.competition, "places": booking.places}
+    return json.dumps(record, separators=(",", ":")) + "\n"
+
+
+class BookingJournal:
+    """Append-only log of bookings, replayed over the JSON snapshots
+
+    Every booking is written as one compact JSON line carrying a sequence
+    number. Snapshots remember the last sequence number they contain, so a
+    record is only replayed on the snapshots that do not include it yet.
+    """
+
+    def __init__(self, path="bookings.journal", compact_every=1000):
+        self.path = path
+        self.compact_every = compact_every
+        self.seq = 0
+        self.pending = 0
+        self.bytes_written = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def append(self, booking):
+        """Write a booking record and return its sequence number"""
+
+        return self.append_many([booking])
+
+    def append_many(self, bookings, fsync=False):
+        """Write bookings in a single write
+
+        Return the sequence number of the last record.
+        """
+
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a")
+            lines = []
+            for booking in bookings:
+                self.seq += 1
+                lines.append(encode(self.seq, booking))
+            data = "".join(lines)
+            self._file.write(data)
+            self._file.flush()
+            if fsync:
+                os.fsync(self._file.fileno())
+            self.pending += len(lines)
+            # Records are ASCII, as json.dumps escapes other characters
+            self.bytes_written += len(data)
+            return self.seq
+
+    def records(self):
+        """Yield the (seq, booking) records of the journal file in order
+
+        Raise ValueError if a record other than the last one is corrupted.
+        """
+
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as journal_file:
+            lines = enumerate(journal_file, start=1)
+            for line_number, line in lines:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as error:
+                    if next(lines, None) is not None:
+                        raise ValueError(
+                            f"Corrupted record at line {line_number} of "
+                            f"{self.path}"
+                        ) from error
+                    # Only the last line can be torn by a crash mid-write
+                    logging.warning(
+                        f"Ignoring truncated record at line {line_number} of "
+                        f"{self.path}"
+                    )
+                    return
+                yield record["seq"], Booking(
+                    record["club"], record["competition"], record["places"]
+                )
+
+    def restore(self, snapshot_seq):
+        """Return the records to replay and resume numbering after them"""
+
+        records = list(self.records())
+        self._drop_torn_record()
+        self.seq = max([snapshot_seq] + [seq for seq, _ in records])
+        self.pending = len(records)
+        return records
+
+    def _drop_torn_record(self):
+        """Cut a record torn by a crash, so the next append starts a line"""
+
+        if not os.path.exists(self.path):
+            return
+        with self._lock, open(self.path, "rb+") as journal_file:
+            content = journal_file.read()
+            end = content.rfind(b"\n") + 1
+            if end < len(content):
+                journal_file.truncate(end)
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+
+    def needs_compaction(self):
+        return self.pending >= self.compact_every
+
+    def truncate(self, upto_seq):
+        """Drop the records up to upto_seq once folded into the snapshots
+
+        Records appended after the snapshots were taken are kept. They are
+        written to a new file replacing the journal, so a crash leaves either
+        journal whole.
+        """
+
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            remaining = [(seq, booking) for seq, booking in self.records()
+                         if seq > upto_seq]
+            write_atomic(self.path, "".join(
+                encode(seq, booking) for seq, booking in remaining
+            ))
+            self.pending = len(remaining)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
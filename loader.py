@@ -0,0 +1,170 @@
+import json
+import logging
+import re
+
+CHUNK_SIZE = 1 << 16
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class SnapshotDecodeError(json.JSONDecodeError):
+    """Invalid JSON in a snapshot, located in the whole file"""
+
+    def __init__(self, msg, path, offset, line):
+        ValueError.__init__(
+            self, f"{msg}: {path} line {line} (char {offset})"
+        )
+        self.msg = msg
+        self.doc = ""
+        self.pos = offset
+        self.lineno = line
+        self.colno = None
+
+
+class SnapshotReader:
+    """Parse a JSON snapshot record by record, without loading it whole
+
+    The snapshot is an object holding a list of records under ``key``.
+    ``records`` yields them one at a time, decoded from a buffer refilled
+    from the file, so only one record is held in memory besides the models
+    built from it. The other values of the object, like ``journalSeq``, are
+    kept in ``values``.
+    """
+
+    def __init__(self, file, key, path=None, chunk_size=CHUNK_SIZE):
+        self.key = key
+        self.path = path or getattr(file, "name", "snapshot")
+        self.values = {}
+        self._file = file
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        # Offset in the file of the start of the buffer
+        self._offset = 0
+        # Line in the file of the position _counted of the buffer
+        self._line = 1
+        self._counted = 0
+        self._eof = False
+
+    def records(self):
+        """Yield the (line, record) of the records in order"""
+
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            name = self._decode()
+            self._expect(":")
+            if name == self.key:
+                yield from self._records()
+            else:
+                self.values[name] = self._decode()
+            if self._expect(",}") == "}":
+                break
+        if self._peek():
+            self._error("Extra data")
+
+    def _records(self):
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            self._peek()
+            line = self._current_line()
+            yield line, self._decode()
+            if self._expect(",]") == "]":
+                return
+
+    def _fill(self, size=None):
+        """Read the next chunk, return False at the end of the file
+
+        size reads that many characters instead of a chunk.
+        """
+
+        if self._eof:
+            return False
+        if self._pos > self._chunk_size:
+            self._current_line()
+            self._offset += self._pos
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+            self._counted = 0
+        chunk = self._file.read(size or self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer += chunk
+        return True
+
+    def _peek(self):
+        """Skip whitespace, return the next character, empty at the end"""
+
+        while True:
+            self._pos = WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, characters):
+        character = self._peek()
+        if not character or character not in characters:
+            self._error(f"Expecting one of {characters!r}")
+        self._pos += 1
+        return character
+
+    def _decode(self):
+        self._peek()
+        size = self._chunk_size
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as error:
+                # The value may continue further in the file. Reading twice
+                # as much each time, a large value is only decoded again a
+                # few times, and an error is only raised at the end.
+                error_offset = error.pos - self._pos
+                if not self._fill(size):
+                    self._pos += error_offset
+                    self._error(error.msg)
+                size *= 2
+                continue
+            if end == len(self._buffer) and self._fill():
+                # A number may continue in the next chunk
+                continue
+            self._pos = end
+            return value
+
+    def _current_line(self):
+        self._line += self._buffer.count("\n", self._counted, self._pos)
+        self._counted = self._pos
+        return self._line
+
+    def _error(self, msg):
+        raise SnapshotDecodeError(
+            msg, self.path, self._offset + self._pos, self._current_line()
+        )
+
+
+def load_snapshot(path, key, from_dict):
+    """Return the models of a JSON snapshot and its last journal sequence
+
+    Models are built as records are parsed. Malformed records are reported
+    with their line and skipped, invalid JSON stops the load.
+    """
+
+    models = []
+    with open(path) as snapshot:
+        reader = SnapshotReader(snapshot, key, path=path)
+        for index, (line, record) in enumerate(reader.records()):
+            try:
+                models.append(from_dict(record))
+            except (KeyError, TypeError, ValueError, AttributeError) as error:
+                logging.warning(
+                    f"Skipping malformed record {index} of {key} at line "
+                    f"{line} of {path}: {error!r}"
+                )
+    return models, reader.values.get("journalSeq", 0)
@@ -0,0 +1,26 @@
+import threading
+from contextlib import contextmanager
+
+
+class KeyedLocks:
+    """One lock per key, created on first use
+
+    Holding the lock of a key never blocks threads working on other keys.
+    Callers needing several keys must always acquire them in the same order.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def get(self, key):
+        lock = self._locks.get(key)
+        if lock is None:
+            with self._guard:
+                lock = self._locks.setdefault(key, threading.Lock())
+        return lock
+
+    @contextmanager
+    def hold(self, key):
+        with self.get(key):
+            yield
@@ -0,0 +1,168 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# In seconds, from sub-millisecond lookups to slow disk writes
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\")
+                         .replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Total increased by each event, one per combination of label values"""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        # Without labels the total is reported from the start
+        self._values = {} if labels else {(): 0}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = (
+                self._values.get(label_values, 0) + amount
+            )
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            yield self.name, dict(zip(self.labels, label_values)), value
+
+
+class Histogram:
+    """Distribution of observed durations, counted in fixed buckets
+
+    Observing only increments the bucket the value falls in, the cumulative
+    counts Prometheus expects are summed when the metrics are collected.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Bucket counts, then the sum of the values
+                series = self._series[label_values] = (
+                    [0] * (len(self.buckets) + 1) + [0.0]
+                )
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def count(self, *label_values):
+        series = self._series.get(label_values)
+        return 0 if series is None else sum(series[:-1])
+
+    def samples(self):
+        with self._lock:
+            series = sorted(
+                (label_values, list(values))
+                for label_values, values in self._series.items()
+            )
+        for label_values, values in series:
+            labels = dict(zip(self.labels, label_values))
+            total = 0
+            for bound, count in zip(
+                self.buckets + (float("inf"),), values[:-1]
+            ):
+                total += count
+                yield (self.name + "_bucket",
+                       dict(labels, le=format_value(float(bound))), total)
+            yield self.name + "_sum", labels, values[-1]
+            yield self.name + "_count", labels, total
+
+
+class Registry:
+    """Metrics of the process, rendered in the Prometheus text format
+
+    Besides counters and histograms, collectors report values kept
+    elsewhere, read only when the metrics are rendered. A collector returns
+    (name, kind, help, [(labels, value), ...]) families.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, collect):
+        self._collectors.append(collect)
+        return collect
+
+    def families(self):
+        for metric in self._metrics:
+            yield metric.name, metric.kind, metric.help, [
+                (name, labels, value)
+                for name, labels, value in metric.samples()
+            ]
+        for collect in self._collectors:
+            for name, kind, help, samples in collect():
+                yield name, kind, help, [
+                    (name, labels, value) for labels, value in samples
+                ]
+
+    def render(self):
+        lines = []
+        for family, kind, help, samples in self.families():
+            lines.append(f"# HELP {family} {help}")
+            lines.append(f"# TYPE {family} {kind}")
+            for name, labels, value in samples:
+                lines.append(
+                    f"{name}{format_labels(labels)} {format_value(value)}"
+                )
+        return "\n".join(lines) + "\n"
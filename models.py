@@ -0,0 +1,81 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_date(date):
+    return datetime.strptime(date, DATE_FORMAT)
+
+
+def format_date(date):
+    return date.strftime(DATE_FORMAT)
+
+
+@dataclass(slots=True)
+class Competition:
+    name: str
+    date: datetime
+    number_of_places: int
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a competition from its JSON representation"""
+
+        return cls(
+            name=data["name"],
+            date=parse_date(data["date"]),
+            number_of_places=int(data["numberOfPlaces"]),
+        )
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "date": format_date(self.date),
+            "numberOfPlaces": str(self.number_of_places),
+        }
+
+
+@dataclass(slots=True)
+class Club:
+    name: str
+    email: str
+    points: int
+    # Places booked, by competition name
+    bookings: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a club from its JSON representation
+
+        Bookings are stored in JSON as a list of {competition: places}.
+        """
+
+        bookings = {}
+        for booking in data.get("bookings", []):
+            for competition_name, places in booking.items():
+                bookings[competition_name] = (
+                    bookings.get(competition_name, 0) + int(places)
+                )
+        return cls(
+            name=data["name"],
+            email=data["email"],
+            points=int(data["points"]),
+            bookings=bookings,
+        )
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "email": self.email,
+            "points": str(self.points),
+            "bookings": [{name: places}
+                         for name, places in self.bookings.items()],
+        }
+
+
+@dataclass(slots=True)
+class Booking:
+    club: str
+    competition: str
+    places: int
@@ -0,0 +1,191 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+
+MODES = ("sync", "group", "async")
+
+
+def write_atomic(path, content):
+    """Replace path with content so readers never see a partial file
+
+    Return the size of the file written, in bytes.
+    """
+
+    path = os.fspath(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        mode = "wb" if isinstance(content, bytes) else "w"
+        with os.fdopen(fd, mode) as tmp_file:
+            tmp_file.write(content)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+            size = os.fstat(tmp_file.fileno()).st_size
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return size
+
+
+def completed():
+    future = Future()
+    future.set_result(None)
+    return future
+
+
+class PersistenceWriter:
+    """Background writer batching bookings into the journal
+
+    Durability modes:
+
+    - ``sync``: the booking is written and fsynced before submit returns.
+    - ``group``: bookings submitted within ``window_ms`` share one write and
+      one fsync, ``wait`` returns once that batch is on disk.
+    - ``async``: ``wait`` returns immediately, the batch is written later.
+
+    ``lock`` must be held while mutating the loaded data and submitting the
+    matching booking, so a compaction never snapshots a booking that is not
+    in the journal yet. Compactions run on their own thread, so batches
+    keep being written while the snapshots are rewritten.
+    """
+
+    def __init__(self, journal, compact, mode="group", window_ms=5):
+        if mode not in MODES:
+            raise ValueError(f"Unknown durability mode {mode}")
+        self.journal = journal
+        self.compact = compact
+        self.mode = mode
+        self.window = window_ms / 1000
+        self.lock = threading.Lock()
+        self._queue = []
+        self._compaction_requested = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._thread = None
+        self._compactor = None
+
+    def submit(self, booking):
+        """Queue a booking and return a future resolved once it is written"""
+
+        return self.submit_many([booking])
+
+    def submit_many(self, bookings):
+        """Queue bookings to be written together, return a single future"""
+
+        if self.mode == "sync":
+            self.journal.append_many(bookings, fsync=True)
+            if self.journal.needs_compaction():
+                self._request_compaction()
+            return completed()
+        future = Future()
+        with self._condition:
+            self._queue.append((bookings, future))
+            self._condition.notify_all()
+        self._ensure_started()
+        return future
+
+    def wait(self, future):
+        """Block until the booking is durable as required by the mode"""
+
+        if self.mode != "async":
+            future.result()
+
+    def drain(self):
+        """Write every queued booking to the journal now"""
+
+        with self._flush_lock:
+            with self._condition:
+                batch, self._queue = self._queue, []
+            if not batch:
+                return
+            try:
+                self.journal.append_many(
+                    [b for bookings, _ in batch for b in bookings], fsync=True
+                )
+            except Exception as error:
+                for _, future in batch:
+                    future.set_exception(error)
+                raise
+            for _, future in batch:
+                future.set_result(None)
+
+    def flush(self):
+        """Drain the queue and run a pending compaction in the caller"""
+
+        self.drain()
+        with self._condition:
+            self._compaction_requested = False
+        with self._compact_lock:
+            if self.journal.needs_compaction():
+                self.compact()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for thread in (self._thread, self._compactor):
+            if thread is not None:
+                thread.join()
+        self._thread = self._compactor = None
+        self.flush()
+
+    def _request_compaction(self):
+        with self._condition:
+            self._compaction_requested = True
+            self._condition.notify_all()
+            if self._compactor is None and not self._closed:
+                self._compactor = threading.Thread(
+                    target=self._run_compactions, name="persistence-compactor",
+                    daemon=True
+                )
+                self._compactor.start()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._condition:
+                if self._thread is None and not self._closed:
+                    self._thread = threading.Thread(
+                        target=self._run, name="persistence-writer",
+                        daemon=True
+                    )
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+            if self.window:
+                # Let concurrent bookings join the batch
+                time.sleep(self.window)
+            try:
+                self.drain()
+            except Exception:
+                logging.exception("Persistence writer failed")
+            if self.journal.needs_compaction():
+                self._request_compaction()
+
+    def _run_compactions(self):
+        while True:
+            with self._condition:
+                while not self._compaction_requested and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                self._compaction_requested = False
+            try:
+                with self._compact_lock:
+                    # Requested again while the previous one was running
+                    if self.journal.needs_compaction():
+                        self.compact()
+            except Exception:
+                logging.exception("Compaction failed")
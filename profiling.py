@@ -0,0 +1,137 @@
+import argparse
+import cProfile
+import glob
+import itertools
+import logging
+import os
+import pstats
+import re
+import secrets
+import time
+from collections import Counter
+
+from werkzeug.exceptions import HTTPException
+
+UNSAFE = re.compile(r"[^A-Za-z0-9_-]")
+
+
+def endpoint_of(url_map, environ):
+    """Return the endpoint a request is routed to, to tag its dump"""
+
+    try:
+        endpoint, _ = url_map.bind_to_environ(environ).match()
+    except HTTPException:
+        return "unmatched"
+    return UNSAFE.sub("_", endpoint)
+
+
+class ProfilingMiddleware:
+    """Profile some requests with cProfile and dump their stats
+
+    Requests are profiled when they carry the PROFILE_HEADER with the
+    PROFILE_TOKEN, one in PROFILE_SAMPLE_EVERY, or, when PROFILE_SLOW_SECONDS
+    is set, all of them, keeping only the dumps of the slower ones. Nothing
+    is profiled without PROFILE_DIR. The response body is produced while
+    profiling, so a profiled streamed page is sent once complete.
+
+    Dumps are named ``<endpoint>.<timestamp>.<milliseconds>ms.<pid>.prof``.
+    """
+
+    def __init__(self, wsgi_app, config, url_map):
+        self.wsgi_app = wsgi_app
+        self.config = config
+        self.url_map = url_map
+        self._requests = itertools.count(1)
+
+    def __call__(self, environ, start_response):
+        directory = self.config.get("PROFILE_DIR")
+        if not directory:
+            return self.wsgi_app(environ, start_response)
+        forced = self.forced(environ)
+        sample_every = self.config.get("PROFILE_SAMPLE_EVERY")
+        sampled = (bool(sample_every)
+                   and next(self._requests) % sample_every == 0)
+        slow_seconds = self.config.get("PROFILE_SLOW_SECONDS")
+        if not (forced or sampled or slow_seconds is not None):
+            return self.wsgi_app(environ, start_response)
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active, on Python versions allowing one
+            return self.wsgi_app(environ, start_response)
+        started = time.perf_counter()
+        try:
+            response = self.wsgi_app(environ, start_response)
+            try:
+                body = list(response)
+            finally:
+                if hasattr(response, "close"):
+                    response.close()
+        finally:
+            profile.disable()
+        elapsed = time.perf_counter() - started
+        if forced or sampled or elapsed >= slow_seconds:
+            self.dump(profile, directory, environ, elapsed)
+        return body
+
+    def forced(self, environ):
+        token = self.config.get("PROFILE_TOKEN")
+        header = "HTTP_" + self.config["PROFILE_HEADER"].upper().replace(
+            "-", "_"
+        )
+        given = environ.get(header)
+        return bool(token) and given is not None and secrets.compare_digest(
+            given.encode(), token.encode()
+        )
+
+    def dump(self, profile, directory, environ, elapsed):
+        os.makedirs(directory, exist_ok=True)
+        name = "{}.{}.{:.0f}ms.{}.prof".format(
+            endpoint_of(self.url_map, environ), time.time_ns(),
+            elapsed * 1000, os.getpid(),
+        )
+        try:
+            profile.dump_stats(os.path.join(directory, name))
+        except OSError:
+            logging.exception(f"Could not write the profile {name}")
+
+
+def dumps(directory, endpoint=None):
+    """Return the paths of the dumps in directory, of one endpoint or all"""
+
+    return sorted(glob.glob(
+        os.path.join(directory, f"{endpoint or '*'}.*.prof")
+    ))
+
+
+def report(paths, sort="cumulative", top=30, stream=None):
+    """Print the top functions of the dumps, aggregated"""
+
+    stats = pstats.Stats(*paths, stream=stream)
+    stats.sort_stats(sort).print_stats(top)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Report the top functions of the request profiles"
+    )
+    parser.add_argument("directory", nargs="?", default="profiles")
+    parser.add_argument("--endpoint", help="only the dumps of an endpoint")
+    parser.add_argument("--sort", default="cumulative",
+                        choices=["cumulative", "tottime", "calls"])
+    parser.add_argument("--top", type=int, default=30)
+    args = parser.parse_args(argv)
+    paths = dumps(args.directory, args.endpoint)
+    if not paths:
+        parser.error(f"No profile in {args.directory}")
+    counts = Counter(os.path.basename(path).split(".")[0] for path in paths)
+    print(f"{len(paths)} profiles: " + ", ".join(
+        f"{name} {count}" for name, count in sorted(counts.items())
+    ))
+    report(paths, args.sort, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+import threading
+from datetime import datetime
+from itertools import islice
+from operator import attrgetter, itemgetter
+
+from sortedcontainers import SortedKeyList, SortedList
+
+
+def normalize_email(email):
+    return email.strip().lower()
+
+
+def date_key(competition):
+    return competition.date, competition.name
+
+
+def search_key(name):
+    return name.casefold(), name
+
+
+def names_starting_with(names, prefix):
+    """Yield the names of a sorted search index starting with prefix"""
+
+    prefix = prefix.casefold()
+    for folded, name in names.islice(names.bisect_left((prefix, ""))):
+        if not folded.startswith(prefix):
+            return
+        yield name
+
+
+class Repository:
+    """In-memory clubs and competitions with hash indexes for lookups
+
+    The lists given at construction are kept as-is, so any module holding a
+    reference to them sees reloads: ``load`` replaces their content in place.
+
+    Clubs are also kept sorted by name and competitions by date, so pages of
+    them are sliced from a bisect, and the past and upcoming competitions
+    are split with one. Their date must only be changed through
+    ``set_competition_date`` to keep that order. These indexes, the name
+    ones below and the lookups by name are changed and read under a lock,
+    as reloads change them while requests read pages.
+
+    ``version`` is bumped on every change, ``touch`` must be called after
+    changing places or points in place. Clubs and competitions also
+    remember the version of their last change, given to ``touch``.
+
+    Names are also kept sorted case-insensitively, so the names starting
+    with a prefix are found with a bisect. The names of the competitions
+    still to come are kept apart, so searching them does not skip over
+    years of past ones. Competitions leave that index as they start, when
+    a search finds them past.
+
+    The leaderboard keeps (-points, name) entries sorted, with the points
+    each club was indexed with, so ``touch`` moves a club whose points
+    changed in O(log N) and ranks are found with a bisect. It is changed
+    and read under a lock, as clubs are touched while others read pages.
+    """
+
+    def __init__(self, clubs=None, competitions=None):
+        self.version = 0
+        self._loaded_version = 0
+        self._club_versions = {}
+        self._competition_versions = {}
+        self.clubs = clubs if clubs is not None else []
+        self.competitions = competitions if competitions is not None else []
+        self._clubs_by_email = {}
+        self._clubs_by_name = {}
+        self._clubs_sorted = SortedKeyList(key=attrgetter("name"))
+        self._indexed_points = {}
+        self._clubs_by_points = SortedList()
+        self._points_lock = threading.Lock()
+        self._club_names = SortedList()
+        self._competition_names = SortedList()
+        self._upcoming_names = SortedList()
+        self._upcoming_since = datetime.min
+        self._sorted_lock = threading.RLock()
+        self._competitions_by_name = {}
+        self._competitions_by_date = SortedKeyList(key=date_key)
+        self._build_indexes()
+
+    def _build_indexes(self):
+        # Built aside, then swapped in at once for the readers
+        clubs_by_email = {normalize_email(c.email): c for c in self.clubs}
+        clubs_by_name = {c.name: c for c in self.clubs}
+        clubs_sorted = SortedKeyList(self.clubs, key=attrgetter("name"))
+        indexed_points = {c.name: c.points for c in self.clubs}
+        clubs_by_points = SortedList(
+            (-points, name) for name, points in indexed_points.items()
+        )
+        club_names = SortedList(search_key(name) for name in clubs_by_name)
+        competitions_by_name = {c.name: c for c in self.competitions}
+        competitions_by_date = SortedKeyList(self.competitions, key=date_key)
+        competition_names = SortedList(
+            search_key(name) for name in competitions_by_name
+        )
+        upcoming_since = datetime.today()
+        upcoming_names = SortedList(
+            search_key(c.name) for c in competitions_by_date.islice(
+                competitions_by_date.bisect_key_left((upcoming_since, ""))
+            )
+        )
+        with self._sorted_lock, self._points_lock:
+            self._clubs_by_email = clubs_by_email
+            self._clubs_by_name = clubs_by_name
+            self._clubs_sorted = clubs_sorted
+            self._indexed_points = indexed_points
+            self._clubs_by_points = clubs_by_points
+            self._club_names = club_names
+            self._competitions_by_name = competitions_by_name
+            self._competitions_by_date = competitions_by_date
+            self._competition_names = competition_names
+            self._upcoming_since = upcoming_since
+            self._upcoming_names = upcoming_names
+
+    def load(self, clubs, competitions):
+        """Replace the whole dataset and rebuild every index"""
+
+        self.clubs[:] = clubs
+        self.competitions[:] = competitions
+        self._build_indexes()
+        self.touch()
+        self._loaded_version = self.version
+        self._club_versions = {}
+        self._competition_versions = {}
+
+    def touch(self, competition=None, club=None):
+        self.version += 1
+        if competition is not None:
+            self._competition_versions[competition.name] = self.version
+        if club is not None:
+            self._club_versions[club.name] = self.version
+            with self._points_lock:
+                indexed = self._indexed_points.get(club.name)
+                if indexed is not None and indexed != club.points:
+                    self._clubs_by_points.remove((-indexed, club.name))
+                    self._clubs_by_points.add((-club.points, club.name))
+                    self._indexed_points[club.name] = club.points
+
+    def add_club(self, club):
+        self.clubs.append(club)
+        with self._sorted_lock:
+            self._clubs_by_email[normalize_email(club.email)] = club
+            self._clubs_by_name[club.name] = club
+            self._clubs_sorted.add(club)
+            self._club_names.add(search_key(club.name))
+        with self._points_lock:
+            self._indexed_points[club.name] = club.points
+            self._clubs_by_points.add((-club.points, club.name))
+        self.touch(club=club)
+
+    def add_competition(self, competition):
+        self.competitions.append(competition)
+        with self._sorted_lock:
+            self._competitions_by_name[competition.name] = competition
+            self._competitions_by_date.add(competition)
+            self._competition_names.add(search_key(competition.name))
+            if competition.date >= self._upcoming_since:
+                self._upcoming_names.add(search_key(competition.name))
+        self.touch(competition)
+
+    def remove_club(self, club):
+        # Off the leaderboard first, which still finds it by name until then
+        with self._points_lock:
+            self._clubs_by_points.remove(
+                (-self._indexed_points.pop(club.name), club.name)
+            )
+        self.clubs.remove(club)
+        with self._sorted_lock:
+            del self._clubs_by_email[normalize_email(club.email)]
+            del self._clubs_by_name[club.name]
+            self._clubs_sorted.remove(club)
+            self._club_names.remove(search_key(club.name))
+        self._club_versions.pop(club.name, None)
+        self._forget_changes()
+
+    def remove_competition(self, competition):
+        self.competitions.remove(competition)
+        with self._sorted_lock:
+            del self._competitions_by_name[competition.name]
+            self._competitions_by_date.remove(competition)
+            self._competition_names.remove(search_key(competition.name))
+            self._upcoming_names.discard(search_key(competition.name))
+        self._competition_versions.pop(competition.name, None)
+        self._forget_changes()
+
+    def _forget_changes(self):
+        # Removals are not listed by changed_since, which must then fail
+        self.touch()
+        self._loaded_version = self.version
+
+    def set_club_email(self, club, email):
+        with self._sorted_lock:
+            del self._clubs_by_email[normalize_email(club.email)]
+            club.email = email
+            self._clubs_by_email[normalize_email(email)] = club
+        self.touch(club=club)
+
+    def set_competition_date(self, competition, date):
+        with self._sorted_lock:
+            self._competitions_by_date.remove(competition)
+            competition.date = date
+            self._competitions_by_date.add(competition)
+            self._upcoming_names.discard(search_key(competition.name))
+            if date >= self._upcoming_since:
+                self._upcoming_names.add(search_key(competition.name))
+        self.touch(competition)
+
+    def club_by_email(self, email):
+        return self._clubs_by_email.get(normalize_email(email))
+
+    def club_by_name(self, name):
+        return self._clubs_by_name.get(name)
+
+    def competition_by_name(self, name):
+        return self._competitions_by_name.get(name)
+
+    def competition_version(self, name):
+        """Return the version of the last change of a competition"""
+
+        return self._competition_versions.get(name, self._loaded_version)
+
+    def changed_since(self, version):
+        """Return the (clubs, competitions) changed after version
+
+        They are ordered by change. Return None if the changes are not known
+        that far back, the whole data must then be fetched again.
+        """
+
+        if version < self._loaded_version or version > self.version:
+            return None
+        clubs = [
+            self._clubs_by_name[name]
+            for name, changed in sorted(
+                self._club_versions.items(), key=itemgetter(1)
+            )
+            if changed > version
+        ]
+        competitions = [
+            self._competitions_by_name[name]
+            for name, changed in sorted(
+                self._competition_versions.items(), key=itemgetter(1)
+            )
+            if changed > version
+        ]
+        return clubs, competitions
+
+    def upcoming_competitions(self, now):
+        """Return the competitions taking place from now on, soonest first"""
+
+        with self._sorted_lock:
+            return self._competitions_by_date[self.past_count(now):]
+
+    def past_competitions(self, now):
+        """Return the competitions that took place before now, oldest first"""
+
+        with self._sorted_lock:
+            return self._competitions_by_date[:self.past_count(now)]
+
+    def past_count(self, now):
+        """Return the number of competitions that took place before now"""
+
+        with self._sorted_lock:
+            return self._competitions_by_date.bisect_key_left((now, ""))
+
+    def clubs_page(self, after=None, limit=None):
+        """Return up to limit clubs by name, starting after the name after"""
+
+        with self._sorted_lock:
+            start = 0
+            if after is not None:
+                start = self._clubs_sorted.bisect_key_right(after)
+            stop = None if limit is None else start + limit
+            return list(self._clubs_sorted.islice(start, stop))
+
+    def leaderboard(self, after=None, limit=None):
+        """Return up to limit (rank, club) by points, most points first
+
+        The page starts after the club named after. Clubs with as many
+        points share a rank: one more than the clubs with more points.
+        """
+
+        with self._points_lock:
+            start = 0
+            if after is not None and after in self._indexed_points:
+                start = self._clubs_by_points.bisect_right(
+                    (-self._indexed_points[after], after)
+                )
+            stop = None if limit is None else start + limit
+            ranked = []
+            previous = None
+            for index, (points, name) in enumerate(
+                self._clubs_by_points.islice(start, stop), start
+            ):
+                if points == previous:
+                    rank = ranked[-1][0]
+                elif not ranked:
+                    rank = self._clubs_by_points.bisect_left((points, "")) + 1
+                else:
+                    rank = index + 1
+                ranked.append((rank, self._clubs_by_name[name]))
+                previous = points
+            return ranked
+
+    def rank(self, club):
+        """Return the rank of a club by points, 1 for the most points
+
+        None for a club that is not in the repository.
+        """
+
+        with self._points_lock:
+            points = self._indexed_points.get(club.name)
+            if points is None:
+                return None
+            return self._clubs_by_points.bisect_left((-points, "")) + 1
+
+    def search_clubs(self, prefix, limit=None):
+        """Return up to limit clubs whose name starts with prefix
+
+        The case is ignored, they are sorted by name.
+        """
+
+        with self._sorted_lock:
+            return list(islice(
+                map(self._clubs_by_name.get,
+                    names_starting_with(self._club_names, prefix)),
+                limit,
+            ))
+
+    def search_competitions(self, prefix, limit=None, now=None,
+                            available=False):
+        """Return up to limit competitions whose name starts with prefix
+
+        The case is ignored, they are sorted by name. Only the ones taking
+        place from now on are returned when now is given, and only the ones
+        with places left when available is set.
+        """
+
+        with self._sorted_lock:
+            names = self._competition_names
+            if now is not None and now >= self._upcoming_since:
+                self._forget_started(now)
+                names = self._upcoming_names
+            competitions = map(
+                self._competitions_by_name.get,
+                names_starting_with(names, prefix),
+            )
+            if now is not None:
+                competitions = (c for c in competitions if c.date >= now)
+            if available:
+                competitions = (c for c in competitions
+                                if c.number_of_places > 0)
+            return list(islice(competitions, limit))
+
+    def _forget_started(self, now):
+        """Remove the competitions started since the last search"""
+
+        started = self._competitions_by_date.islice(
+            self.past_count(self._upcoming_since), self.past_count(now)
+        )
+        for competition in started:
+            self._upcoming_names.discard(search_key(competition.name))
+        self._upcoming_since = now
+
+    def competitions_page(self, now, after=None, limit=None):
+        """Return up to limit (upcoming, past) competitions, in display order
+
+        Upcoming competitions come first, soonest first, then the past ones,
+        oldest first. The page starts after the competition named after, or
+        from the beginning if there is none by that name.
+        """
+
+        with self._sorted_lock:
+            past_count = self.past_count(now)
+            total = len(self._competitions_by_date)
+            upcoming_count = total - past_count
+            start = 0
+            after_competition = None if after is None else (
+                self.competition_by_name(after)
+            )
+            if after_competition is not None:
+                index = self._competitions_by_date.index(after_competition)
+                if index >= past_count:
+                    start = index - past_count + 1
+                else:
+                    start = upcoming_count + index + 1
+            stop = total if limit is None else min(total, start + limit)
+            upcoming = list(self._competitions_by_date.islice(
+                past_count + min(start, upcoming_count),
+                past_count + min(stop, upcoming_count),
+            ))
+            past = list(self._competitions_by_date.islice(
+                max(start - upcoming_count, 0), max(stop - upcoming_count, 0)
+            ))
+            return upcoming, past
@@ -0,0 +1,184 @@
+import argparse
+import logging
+import os
+import signal
+import socket
+import time
+
+import gevent
+from gevent import monkey
+from gevent.pool import Pool
+from gevent.pywsgi import WSGIServer
+
+# Seconds before replacing a worker that died, so a crashing one does not
+# fork in a loop
+RESPAWN_DELAY = 1
+
+
+def warm_up(app):
+    """Compile every template, return how many there are
+
+    Templates are otherwise compiled by the first request rendering them.
+    """
+
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def serve(app, listener, connections=1000, shutdown_timeout=30,
+          access_log=False):
+    """Serve app on listener with gevent until SIGTERM or SIGINT
+
+    Each connection is handled by a greenlet, at most connections at once.
+    On a signal the listener is closed, the requests in progress get
+    shutdown_timeout seconds to complete, then serve returns.
+    """
+
+    http = WSGIServer(listener, app, spawn=Pool(connections),
+                      log="default" if access_log else None)
+
+    def stop(signum):
+        logging.info(f"Stopping on {signal.Signals(signum).name}, waiting "
+                     f"up to {shutdown_timeout}s for requests in progress")
+        http.close()
+
+    # Started first, a signal received meanwhile would not stop it
+    http.start()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        gevent.signal_handler(signum, stop, signum)
+    http.serve_forever(stop_timeout=shutdown_timeout)
+
+
+def prefork(run, workers):
+    """Run ``run`` in workers forked processes until SIGTERM or SIGINT
+
+    The signal is passed on to the workers, prefork returns once they have
+    all exited. A worker exiting on its own is replaced.
+    """
+
+    parent = os.getpid()
+    children = set()
+    stopping = []
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                run()
+                code = 0
+            except BaseException:
+                logging.exception("Worker failed")
+            finally:
+                os._exit(code)
+        children.add(pid)
+        logging.info(f"Started worker {pid}")
+
+    def stop(signum):
+        # Workers inherit this handler, only the parent passes signals on
+        if os.getpid() != parent:
+            return
+        stopping.append(signum)
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        gevent.signal_handler(signum, stop, signum)
+    for _ in range(workers):
+        spawn()
+    while children:
+        try:
+            pid, status = os.waitpid(-1, 0)
+        except ChildProcessError:
+            break
+        if pid not in children:
+            # gevent may report a worker again
+            continue
+        children.remove(pid)
+        if stopping:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        logging.warning(f"Worker {pid} exited with {code}, replacing it")
+        time.sleep(RESPAWN_DELAY)
+        if not stopping:
+            spawn()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve the application with gevent, in one process or "
+                    "in pre-forked workers"
+    )
+    parser.add_argument("--host",
+                        default=os.environ.get("GUDLFT_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int,
+                        default=int(os.environ.get("GUDLFT_PORT", 8000)))
+    parser.add_argument(
+        "--workers", type=int,
+        default=int(os.environ.get("GUDLFT_WORKERS", 1)),
+        help="1 serves from this process, more forks workers sharing the "
+             "SQLite storage",
+    )
+    parser.add_argument(
+        "--connections", type=int,
+        default=int(os.environ.get("GUDLFT_CONNECTIONS", 1000)),
+        help="connections handled at once by each worker",
+    )
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument(
+        "--shutdown-timeout", type=float,
+        default=float(os.environ.get("GUDLFT_SHUTDOWN_TIMEOUT", 30)),
+        help="seconds given to requests in progress on SIGTERM",
+    )
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args(argv)
+    if args.workers < 1 or args.connections < 1:
+        parser.error("--workers and --connections must be at least 1")
+    if args.workers > 1 and os.environ.get("GUDLFT_STORAGE") != "sqlite":
+        parser.error("Several workers need GUDLFT_STORAGE=sqlite, each would "
+                     "otherwise book on its own copy of the data")
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(process)d] %(levelname)s %(message)s",
+    )
+
+    # Before the application creates its locks, threads and connections
+    monkey.patch_all()
+    started = time.perf_counter()
+    import server
+    templates = warm_up(server.app)
+    logging.info(
+        f"Loaded {len(server.clubs)} clubs and {len(server.competitions)} "
+        f"competitions, compiled {templates} templates in "
+        f"{time.perf_counter() - started:.2f}s"
+    )
+    if server.storage is not None:
+        # Each worker opens its own connections
+        server.storage.close()
+
+    # Bound once warm, so no request waits for the loading
+    listener = socket.create_server((args.host, args.port),
+                                    backlog=args.backlog)
+    host, port = listener.getsockname()[:2]
+    logging.info(f"Listening on http://{host}:{port} with {args.workers} "
+                 f"worker(s)")
+
+    def run():
+        # Forked workers count their versions apart
+        server.renew_data_epoch()
+        serve(server.app, listener, args.connections, args.shutdown_timeout,
+              args.access_log)
+        server.shutdown()
+        logging.info("Pending bookings written, exiting")
+
+    if args.workers == 1:
+        run()
+    else:
+        prefork(run, args.workers)
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,61 +1,441 @@
+import atexit
+import gc
+import hashlib
 import json
 import logging
+import os
+import secrets
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from dataclasses import replace
 from datetime import datetime
+from operator import attrgetter
 
-from flask import Flask, render_template, request, redirect, flash, url_for, session
+from flask import (
+    Flask,
+    before_render_template,
+    flash,
+    g,
+    get_flashed_messages,
+    has_request_context,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    session,
+    stream_template,
+    template_rendered,
+    url_for,
+)
+from markupsafe import Markup
 
+from admission import AdmissionQueue, QueueFull
+from cache import RenderCache
+from compression import ENCODINGS, compress, compressible, negotiate
+from journal import BookingJournal
+from loader import load_snapshot
+from locks import KeyedLocks
+from metrics import Registry
+from models import Booking, Club, Competition, format_date
+from persistence import PersistenceWriter, completed, write_atomic
+from profiling import ProfilingMiddleware
+from repository import Repository
+from sessions import (
+    MemorySessionStore,
+    ServerSideSessionInterface,
+    SqliteSessionStore,
+)
+from snapshot import (
+    pack_data,
+    read_binary_snapshot,
+    write_binary_snapshot,
+)
+from storage import BookingConflict, SqliteStorage
+from watcher import FileWatcher
+
+
+def read_snapshot(path, key, from_dict):
+    """Return the models of a JSON snapshot and its last journal sequence"""
 
-def load_clubs(path="clubs.json"):
     try:
-        with open(path) as c:
-            list_of_clubs = json.load(c).get("clubs", [])
-            return list_of_clubs
+        return load_snapshot(path, key, from_dict)
     except FileNotFoundError:
-        raise FileNotFoundError(f"{path} not found for clubs")
-    except json.JSONDecodeError:
-        logging.error(f"Invalid json {path}")
+        raise FileNotFoundError(f"{path} not found for {key}")
+    except json.JSONDecodeError as error:
+        logging.error(f"Invalid json {path}: {error}")
         raise
 
 
+def load_clubs(path="clubs.json"):
+    list_of_clubs, _ = read_snapshot(path, "clubs", Club.from_dict)
+    return list_of_clubs
+
+
 def load_competitions(path="competitions.json"):
-    try:
-        with open(path) as comps:
-            list_of_competitions = json.load(comps).get("competitions", [])
-            return list_of_competitions
-    except FileNotFoundError:
-        raise FileNotFoundError(f"{path} not found for competitions")
-    except json.JSONDecodeError:
-        logging.error(f"Invalid json {path}")
-        raise
+    list_of_competitions, _ = read_snapshot(
+        path, "competitions", Competition.from_dict
+    )
+    return list_of_competitions
+
+
+def dump_clubs(club_models=None, journal_seq=None):
+    if club_models is None:
+        club_models = clubs
+    return json.dumps(
+        {"clubs": [c.to_dict() for c in club_models],
+         "journalSeq": journal.seq if journal_seq is None else journal_seq},
+        indent=4,
+    )
+
+
+def dump_competitions(competition_models=None, journal_seq=None):
+    if competition_models is None:
+        competition_models = competitions
+    return json.dumps(
+        {"competitions": [c.to_dict() for c in competition_models],
+         "journalSeq": journal.seq if journal_seq is None else journal_seq},
+        indent=4,
+    )
+
+
+def update_clubs(path="clubs.json", content=None):
+    """Atomically replace the clubs snapshot"""
+
+    with snapshot_write_seconds.time("clubs.json"):
+        size = write_atomic(path, dump_clubs() if content is None else content)
+    written_bytes.inc("clubs.json", amount=size)
+    watcher.remember(path)
+
+
+def update_competitions(path="competitions.json", content=None):
+    """Atomically replace the competitions snapshot"""
+
+    with snapshot_write_seconds.time("competitions.json"):
+        size = write_atomic(
+            path, dump_competitions() if content is None else content
+        )
+    written_bytes.inc("competitions.json", amount=size)
+    watcher.remember(path)
+
+
+def update_binary_snapshot(payload, journal_seq):
+    """Write the binary copy of the JSON snapshots just written"""
+
+    with snapshot_write_seconds.time("snapshot"):
+        size = write_binary_snapshot(
+            snapshot_path, payload, ["clubs.json", "competitions.json"],
+            journal_seq,
+        )
+    written_bytes.inc("snapshot", amount=size)
+
+
+def reload_data():
+    """Load the data from the storage backend
+
+    Without a database, the JSON snapshots are loaded and the journal is
+    replayed over them. An empty database is first filled from them.
+    """
+
+    if storage is None:
+        load_json_data()
+        return
+    if storage.is_empty():
+        load_json_data()
+        storage.import_data(store.clubs, store.competitions)
+    store.load(*storage.load())
+
+
+def refresh_data():
+    """Apply the changes made to the shared database by other workers
+
+    ``persistence.lock`` is held, as by bookings committing to the database,
+    so changes are never applied twice nor an older value over a newer one.
+    """
+
+    if storage is None:
+        return
+    with persistence.lock:
+        apply_changes(*storage.changes())
+
+
+def apply_changes(changed_clubs, changed_competitions):
+    """Update the loaded data with the changed database records"""
 
+    for changed in changed_competitions:
+        competition = find_competition_by_name(changed.name)
+        if competition is None:
+            store.add_competition(changed)
+        else:
+            if competition.date != changed.date:
+                store.set_competition_date(competition, changed.date)
+            competition.number_of_places = changed.number_of_places
+            store.touch(competition)
+    for changed in changed_clubs:
+        club = find_club_by_name(changed.name)
+        if club is None:
+            store.add_club(changed)
+        else:
+            club.points = changed.points
+            club.bookings = changed.bookings
+            store.touch(club=club)
+
+
+def load_json_data():
+    """Load the snapshots from disk and replay the journal over them"""
+
+    # Edits made from now on are picked up by reload_changed_files
+    watcher.remember("clubs.json")
+    watcher.remember("competitions.json")
+    binary = read_binary_snapshot(
+        snapshot_path, ["clubs.json", "competitions.json"]
+    )
+    if binary is not None:
+        list_of_clubs, list_of_competitions, clubs_seq = binary
+        competitions_seq = clubs_seq
+    else:
+        list_of_clubs, clubs_seq = read_snapshot(
+            "clubs.json", "clubs", Club.from_dict
+        )
+        list_of_competitions, competitions_seq = read_snapshot(
+            "competitions.json", "competitions", Competition.from_dict
+        )
+    store.load(list_of_clubs, list_of_competitions)
+    snapshot_seqs["clubs.json"] = clubs_seq
+    snapshot_seqs["competitions.json"] = competitions_seq
+    for seq, booking in journal.restore(max(clubs_seq, competitions_seq)):
+        competition = find_competition_by_name(booking.competition)
+        if competition and seq > competitions_seq:
+            take_places(competition, booking.places)
+        club = find_club_by_name(booking.club)
+        if club and seq > clubs_seq:
+            spend_points(club, booking.competition, booking.places)
+            store.touch(club=club)
+
+
+def bookings_since(seq):
+    """Return the bookings made after seq, ``persistence.lock`` held"""
+
+    persistence.drain()
+    return [booking for record_seq, booking in journal.records()
+            if record_seq > seq]
+
+
+def competition_targets(loaded, bookings):
+    """Return the state each competition of the file has in memory
+
+    It is the file content with the bookings made since it was written.
+    """
+
+    booked = Counter()
+    for booking in bookings:
+        booked[booking.competition] += booking.places
+    return {
+        name: replace(
+            competition,
+            number_of_places=competition.number_of_places - booked[name],
+        )
+        for name, competition in loaded.items()
+    }
+
+
+def club_targets(loaded, bookings):
+    """Return the state each club of the file has in memory
+
+    It is the file content with the bookings made since it was written.
+    """
+
+    targets = {}
+    for booking in bookings:
+        club = targets.get(booking.club) or loaded.get(booking.club)
+        if club is not None:
+            if booking.club not in targets:
+                club = replace(club, bookings=dict(club.bookings))
+                targets[booking.club] = club
+            spend_points(club, booking.competition, booking.places)
+    return {name: targets.get(name, club) for name, club in loaded.items()}
+
+
+def apply_competition(name, target):
+    competition = find_competition_by_name(name)
+    if target is None:
+        store.remove_competition(competition)
+    elif competition is None:
+        store.add_competition(target)
+    else:
+        if competition.date != target.date:
+            store.set_competition_date(competition, target.date)
+        if competition.number_of_places != target.number_of_places:
+            competition.number_of_places = target.number_of_places
+            store.touch(competition)
+
+
+def apply_club(name, target):
+    club = find_club_by_name(name)
+    if target is None:
+        store.remove_club(club)
+    elif club is None:
+        store.add_club(target)
+    else:
+        if club.email != target.email:
+            store.set_club_email(club, target.email)
+        if (club.points, club.bookings) != (target.points, target.bookings):
+            club.points = target.points
+            club.bookings = target.bookings
+            store.touch(club=club)
+
+
+def hot_reload_handlers(path):
+    """Return how to reload the JSON file at path
+
+    As (key, from_dict, targets, find, booked_name, locks, apply).
+    """
+
+    if path == "clubs.json":
+        return ("clubs", Club.from_dict, club_targets, find_club_by_name,
+                attrgetter("club"), club_locks, apply_club)
+    return ("competitions", Competition.from_dict, competition_targets,
+            find_competition_by_name, attrgetter("competition"),
+            competition_locks, apply_competition)
+
+
+def reload_file(path):
+    """Apply the content of an edited JSON file to the loaded data
+
+    The file is parsed and compared with the loaded data without holding
+    any lock. Only the records it changes, and the ones booked since it was
+    written, are then locked like for a booking and updated in place, so
+    other bookings and the pages are not held up. Bookings made since the
+    file was written are kept: they are replayed over its content.
+    """
+
+    key, from_dict, targets_of, find, booked_name, locks, apply = (
+        hot_reload_handlers(path)
+    )
+    records, seq = read_snapshot(path, key, from_dict)
+    if seq < snapshot_seqs[path]:
+        logging.error(
+            f"Not reloading {path}: it was edited from a copy older than "
+            f"the last compaction"
+        )
+        return
+    loaded = {record.name: record for record in records}
+    current = {record.name for record in getattr(store, key)}
+    # Records neither edited nor booked since the file was written are the
+    # same in the file and in memory
+    names = {name for name in loaded.keys() | current
+             if loaded.get(name) != find(name)}
+    with persistence.lock:
+        names.update(map(booked_name, bookings_since(seq)))
+    with ExitStack() as held:
+        for name in sorted(names):
+            held.enter_context(locks.hold(name))
+        with persistence.lock:
+            targets = targets_of(loaded, bookings_since(seq))
+            changed = [name for name in names
+                       if targets.get(name) != find(name)]
+            for name in changed:
+                apply(name, targets.get(name))
+    logging.info(f"Reloaded {path}: {len(changed)} {key} changed")
+
+
+def reload_changed_files():
+    """Reload the JSON files edited since they were loaded or written
+
+    Files are reloaded on a thread of their own, so the request noticing
+    the edit does not wait for a large file to be parsed.
+    """
+
+    interval = app.config["HOT_RELOAD_INTERVAL"]
+    if storage is not None or interval is None:
+        return
+    changes = watcher.changed(interval)
+    if changes:
+        threading.Thread(target=reload_files, args=(changes,),
+                         name="hot-reload", daemon=True).start()
 
-def update_clubs(path="clubs.json"):
-    with open(path, "w") as c:
-        final = {"clubs": clubs}
-        json.dump(final, c, indent=4)
 
+def reload_files(changes):
+    """Reload the (path, stamp) files reported changed by the watcher"""
 
-def update_competitions(path="competitions.json"):
-    with open(path, "w") as c:
-        final = {"competitions": competitions}
-        json.dump(final, c, indent=4)
+    for path, current in changes:
+        try:
+            reload_file(path)
+        except (ValueError, OSError):
+            # Not retried until edited again
+            logging.exception(f"Could not reload {path}")
+        except Exception as error:
+            # Retried on the next check, like when its queues are full
+            if not isinstance(error, QueueFull):
+                logging.exception(f"Could not reload {path}")
+            watcher.release(path)
+            continue
+        watcher.remember(path, current)
+
+
+def compact():
+    """Fold the journal into new clubs and competitions snapshots
+
+    Bookings are only held off while the mutable fields are copied, the
+    copies are serialized and written once they can proceed again. The
+    binary snapshot is written last, it is only used while it is newer than
+    both JSON files.
+    """
+
+    with persistence.lock:
+        persistence.drain()
+        seq = journal.seq
+        # The copies would trigger collections finding no garbage
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            competition_models = [
+                Competition(c.name, c.date, c.number_of_places)
+                for c in competitions
+            ]
+            club_models = [
+                Club(c.name, c.email, c.points, dict(c.bookings))
+                for c in clubs
+            ]
+        finally:
+            if gc_enabled:
+                gc.enable()
+    update_competitions(
+        content=dump_competitions(competition_models, seq)
+    )
+    update_clubs(content=dump_clubs(club_models, seq))
+    binary_content = pack_data(club_models, competition_models)
+    snapshot_seqs["clubs.json"] = snapshot_seqs["competitions.json"] = seq
+    update_binary_snapshot(binary_content, seq)
+    journal.truncate(seq)
+
+
+def shutdown():
+    """Write the bookings still pending and close the data files"""
+
+    persistence.close()
+    journal.close()
+    if storage is not None:
+        storage.close()
 
 
 def find_competition_by_name(name):
-    return next((c for c in competitions if c["name"] == name), None)
+    return store.competition_by_name(name)
 
 
 def find_club_by_name(name):
-    return next((c for c in clubs if c["name"] == name), None)
+    return store.club_by_name(name)
 
 
 def find_club_by_email(email):
-    return next((c for c in clubs if c["email"] == email), None)
+    return store.club_by_email(email)
 
 
 def find_competition_in_club_booking(competition_name, club):
-    return next((booking for booking in club["bookings"] if competition_name in
-                 booking), None)
+    """Return the places the club booked for the competition, if any"""
+
+    return club.bookings.get(competition_name)
 
 
 def validate_places(places_required):
@@ -63,51 +443,591 @@ def validate_places(places_required):
 
 
 def enough_places(competition, places_required):
-    return int(competition["numberOfPlaces"]) >= places_required
+    return competition.number_of_places >= places_required
 
 
 def enough_points(club, places_required):
-    return int(club["points"]) >= places_required
+    return club.points >= places_required
 
 
 def too_much_athlete(club, competition, places_required):
-    competition_name = competition['name']
-    booking = find_competition_in_club_booking(competition_name, club)
-    if booking is None:
+    number_athlete = find_competition_in_club_booking(competition.name, club)
+    if number_athlete is None:
         return False
-    number_athlete = booking[competition_name]
     return number_athlete + places_required > 12
 
 
 def update_booking(club, competition_name, places_required):
-    booking = find_competition_in_club_booking(competition_name, club)
-    if booking is None:
-        club['bookings'].append({competition_name: places_required})
-        return
-    booking[competition_name] += places_required
+    club.bookings[competition_name] = (
+        club.bookings.get(competition_name, 0) + places_required
+    )
+
+
+def take_places(competition, places_required):
+    competition.number_of_places -= places_required
+
+
+def spend_points(club, competition_name, places_required):
+    club.points -= places_required
+    update_booking(club, competition_name, places_required)
+
+
+def apply_booking(club, competition, places_required):
+    """Update current loaded data and queue the booking for the journal
+
+    Return the pending write, to be given to ``persistence.wait``. With a
+    database the booking is committed there first, which raises
+    BookingConflict if another worker took the places or points meanwhile.
+    """
+
+    return apply_bookings(club, [(competition, places_required)])
+
+
+def apply_bookings(club, lines):
+    """Apply (competition, places) lines of a club as one booking
+
+    They are written to the journal, or committed to the database, together.
+    With a database, the loaded data takes the committed values rather than
+    being decremented, as they may include bookings of other workers.
+    """
+
+    bookings = [
+        Booking(club.name, competition.name, places_required)
+        for competition, places_required in lines
+    ]
+    with persistence.lock:
+        if storage is not None:
+            committed = storage.book_many(bookings)
+            for (competition, places_required), (places, points, booked) in (
+                zip(lines, committed)
+            ):
+                competition.number_of_places = places
+                club.points = points
+                club.bookings[competition.name] = booked
+                store.touch(competition, club)
+                booked_places.inc(amount=places_required)
+            bookings_total.inc(amount=len(lines))
+            return completed()
+        for competition, places_required in lines:
+            take_places(competition, places_required)
+            spend_points(club, competition.name, places_required)
+            store.touch(competition, club)
+            booked_places.inc(amount=places_required)
+        bookings_total.inc(amount=len(lines))
+        return persistence.submit_many(bookings)
 
 
 def book_places(club, competition, places_required):
-    """Update clubs and competitions JSON and current loaded data"""
+    """Update current loaded data and append the booking to the journal
 
-    competition["numberOfPlaces"] = str(
-        int(competition["numberOfPlaces"]) - places_required
-    )
-    update_competitions()
-    club["points"] = str(int(club["points"]) - places_required)
-    update_booking(club, competition["name"], places_required)
-    club_data = find_club_by_name(club["name"])
-    if club_data:
-        club_data["points"] = club["points"]
-        club_data["bookings"] = club["bookings"]
-        update_clubs()
+    The JSON snapshots are only rewritten when the journal is compacted.
+    """
+
+    persistence.wait(apply_booking(club, competition, places_required))
+
+
+def booking_refusal(club, competition, places_required):
+    """Return why a booking is refused, as (reason, message)
+
+    The reason is "invalid", "places", "points" or "athletes", for the
+    rejections metric. None when the booking can be made.
+    """
+
+    if not validate_places(places_required):
+        return "invalid", "Place must be between 0 and 12"
+
+    if not enough_places(competition, places_required):
+        left_places = competition.number_of_places
+        return "places", "There is only {} places available".format(
+            left_places
+        )
+
+    if not enough_points(club, places_required):
+        return "points", "You have only {} points available".format(
+            club.points
+        )
+
+    if too_much_athlete(club, competition, places_required):
+        number_athlete = find_competition_in_club_booking(
+            competition.name, club
+        )
+        return "athletes", (
+            f"You have already {number_athlete} athletes registered for this "
+            f"competition. "
+            f"You can only register {12 - number_athlete} more athletes.")
+
+    return None
+
+
+def check_and_book(club, competition, places_required):
+    """Validate and book as one step, return the refusal message if any
+
+    The competition lock then the club lock are held from the checks to the
+    update, so concurrent requests cannot both book the last places or spend
+    the same points. Bookings of other competitions and clubs are not blocked.
+    The locks are released before waiting for the journal write. Raise
+    QueueFull when too many bookings of the competition are waiting.
+    """
+
+    with ExitStack() as locks:
+        with timed("queue"):
+            locks.enter_context(competition_locks.hold(competition.name))
+            locks.enter_context(club_locks.hold(club.name))
+        with timed("validation"):
+            refusal = booking_refusal(club, competition, places_required)
+        if refusal is not None:
+            rejections.inc(refusal[0])
+            return refusal[1]
+        try:
+            with timed("apply"):
+                pending = apply_booking(club, competition, places_required)
+        except BookingConflict:
+            # Another worker booked first, check again on its data
+            refresh_data()
+            refusal = booking_refusal(club, competition, places_required)
+            if refusal is None:
+                refusal = "conflict", "Something went wrong-please try again"
+            rejections.inc(refusal[0])
+            return refusal[1]
+    with timed("persist"):
+        persistence.wait(pending)
+    return None
+
+
+def booking_refusals(club, lines):
+    """Return the (reason, message) refusal of each (competition, places) line
+
+    Each line is checked as if the previous accepted ones were booked, on
+    copies of the club and competitions. None stands for an accepted line.
+    """
+
+    club = replace(club, bookings=dict(club.bookings))
+    competitions_copies = {}
+    refusals = []
+    for competition, places_required in lines:
+        competition = competitions_copies.setdefault(
+            competition.name, replace(competition)
+        )
+        refusal = booking_refusal(club, competition, places_required)
+        if refusal is None:
+            take_places(competition, places_required)
+            spend_points(club, competition.name, places_required)
+        refusals.append(refusal)
+    return refusals
+
+
+def refused(refusals):
+    """Count the refused lines, return the message of each line"""
+
+    for refusal in refusals:
+        if refusal is not None:
+            rejections.inc(refusal[0])
+    return [None if refusal is None else refusal[1] for refusal in refusals]
+
+
+def check_and_book_many(club, lines):
+    """Validate and book every (competition, places) line, or none of them
+
+    Return the refusal message of each line, all None when booked. The
+    competition locks are taken in name order, then the club lock.
+    """
+
+    names = sorted({competition.name for competition, _ in lines})
+    with ExitStack() as locks:
+        with timed("queue"):
+            for name in names:
+                locks.enter_context(competition_locks.hold(name))
+            locks.enter_context(club_locks.hold(club.name))
+        with timed("validation"):
+            refusals = booking_refusals(club, lines)
+        if any(refusals):
+            return refused(refusals)
+        try:
+            with timed("apply"):
+                pending = apply_bookings(club, lines)
+        except BookingConflict:
+            # Another worker booked first, check again on its data
+            refresh_data()
+            refusals = booking_refusals(club, lines)
+            if not any(refusals):
+                conflict = "conflict", "Something went wrong-please try again"
+                refusals = [conflict] * len(lines)
+            return refused(refusals)
+    with timed("persist"):
+        persistence.wait(pending)
+    return [None] * len(lines)
 
 
 app = Flask(__name__)
 app.secret_key = "something_special"
+app.config["RENDER_CACHE"] = True
+# Seconds shared caches may serve public pages without revalidating them
+app.config["PUBLIC_MAX_AGE"] = 0
+# Listings are paginated by PAGE_SIZE, or entirely shown when None
+app.config["PAGE_SIZE"] = None
+app.config["MAX_PAGE_SIZE"] = 1000
+app.config["API_PAGE_SIZE"] = 100
+app.config["SEARCH_LIMIT"] = 10
+app.config["MAX_BATCH_LINES"] = 100
+# Seconds clients are asked to wait when a competition queue is full
+app.config["QUEUE_RETRY_AFTER"] = 1
+# Seconds between checks of the JSON files for edits, None to never check
+app.config["HOT_RELOAD_INTERVAL"] = 1.0
+# Send listings while they are rendered, instead of once complete
+app.config["STREAM_PAGES"] = False
+# Bodies smaller than this many bytes are sent uncompressed, None to never
+# compress
+app.config["COMPRESS_MIN_SIZE"] = 1024
+# Request profiles are written to PROFILE_DIR, see profiling.py
+app.config["PROFILE_DIR"] = os.environ.get("GUDLFT_PROFILE_DIR")
+app.config["PROFILE_SAMPLE_EVERY"] = int(
+    os.environ.get("GUDLFT_PROFILE_SAMPLE_EVERY", 0)
+)
+app.config["PROFILE_SLOW_SECONDS"] = (
+    float(os.environ["GUDLFT_PROFILE_SLOW_MS"]) / 1000
+    if "GUDLFT_PROFILE_SLOW_MS" in os.environ else None
+)
+app.config["PROFILE_TOKEN"] = os.environ.get("GUDLFT_PROFILE_TOKEN")
+app.config["PROFILE_HEADER"] = "X-Profile-Token"
+app.wsgi_app = ProfilingMiddleware(app.wsgi_app, app.config, app.url_map)
+
+# Versions restart with the process, ETags must not match across restarts
+DATA_EPOCH = secrets.token_hex(8)
+
+
+def renew_data_epoch():
+    """Draw a new DATA_EPOCH, called in each forked worker
+
+    Workers count their versions apart, the same version in two of them
+    is not the same data.
+    """
+
+    global DATA_EPOCH
+    DATA_EPOCH = secrets.token_hex(8)
+
+
+metrics = Registry()
+request_seconds = metrics.histogram(
+    "gudlft_request_seconds", "Time to handle a request, up to its response",
+    ("endpoint", "status"),
+)
+phase_seconds = metrics.histogram(
+    "gudlft_phase_seconds", "Time spent in each phase of a request",
+    ("endpoint", "phase"),
+)
+snapshot_write_seconds = metrics.histogram(
+    "gudlft_snapshot_write_seconds", "Time to write a snapshot file",
+    ("file",),
+)
+written_bytes = metrics.counter(
+    "gudlft_snapshot_written_bytes_total", "Bytes written to snapshot files",
+    ("file",),
+)
+bookings_total = metrics.counter(
+    "gudlft_bookings_total", "Bookings made, one per competition booked"
+)
+booked_places = metrics.counter(
+    "gudlft_booked_places_total", "Places booked"
+)
+rejections = metrics.counter(
+    "gudlft_booking_rejections_total", "Bookings refused, by reason",
+    ("reason",),
+)
+
+store = Repository()
+storage = None
+if os.environ.get("GUDLFT_STORAGE", "json") == "sqlite":
+    storage = SqliteStorage(os.environ.get("GUDLFT_DATABASE", "gudlft.db"))
+render_cache = RenderCache()
+# Bookings of a competition are served in arrival order, beyond the queue
+# depth they are refused
+competition_locks = AdmissionQueue(
+    max_depth=int(os.environ.get("GUDLFT_QUEUE_DEPTH", 100))
+)
+club_locks = KeyedLocks()
+journal = BookingJournal()
+snapshot_path = os.environ.get("GUDLFT_SNAPSHOT", "gudlft.snapshot")
+# Journal sequence of the JSON files, as last loaded or written
+snapshot_seqs = {"clubs.json": 0, "competitions.json": 0}
+watcher = FileWatcher(["clubs.json", "competitions.json"])
+persistence = PersistenceWriter(
+    journal,
+    compact,
+    mode=os.environ.get("GUDLFT_DURABILITY", "group"),
+    window_ms=float(os.environ.get("GUDLFT_GROUP_COMMIT_MS", 5)),
+)
+atexit.register(persistence.close)
+reload_data()
+competitions = store.competitions
+clubs = store.clubs
+
+
+@metrics.collector
+def collect_state():
+    """Report the counters kept by the journal, the queues and the cache"""
+
+    queues = competition_locks.stats()
+    return [
+        ("gudlft_journal_written_bytes_total", "counter",
+         "Bytes appended to the booking journal",
+         [({}, journal.bytes_written)]),
+        ("gudlft_queue_depth", "gauge",
+         "Bookings holding or waiting for a competition",
+         [({"competition": name}, depth)
+          for name, depth in sorted(queues["depths"].items())]),
+        ("gudlft_queue_admitted_total", "counter",
+         "Bookings admitted by the competition queues",
+         [({}, queues["admitted"])]),
+        ("gudlft_queue_wait_seconds_total", "counter",
+         "Time bookings waited in the competition queues",
+         [({}, queues["waitSecondsTotal"])]),
+        ("gudlft_render_cache_hits_total", "counter",
+         "Pages and fragments served from the render cache",
+         [({}, render_cache.hits)]),
+        ("gudlft_render_cache_misses_total", "counter",
+         "Pages and fragments rendered for the render cache",
+         [({}, render_cache.misses)]),
+    ]
+
+
+def start_timer():
+    g.started = time.perf_counter()
+
+
+def observe_request(response):
+    started = g.pop("started", None)
+    if started is not None:
+        request_seconds.observe(
+            time.perf_counter() - started,
+            request.endpoint or "", response.status_code,
+        )
+    return response
+
+
+def response_encoding(size=None):
+    """Return the encoding accepted for a body of size bytes, or None"""
+
+    min_size = app.config["COMPRESS_MIN_SIZE"]
+    if min_size is None or (size is not None and size < min_size):
+        return None
+    return negotiate(request.accept_encodings)
 
-competitions = load_competitions()
-clubs = load_clubs()
+
+def compress_response(response):
+    """Compress the body unless it was sent from the cache already compressed
+
+    A compressed body is another representation of the page, its ETag gets
+    the encoding as suffix.
+    """
+
+    if compressible(response.mimetype):
+        response.vary.add("Accept-Encoding")
+        if (response.status_code == 200 and response.content_encoding is None
+                and not response.is_streamed
+                and not response.direct_passthrough):
+            encoding = response_encoding(response.content_length)
+            if encoding is not None:
+                with timed("compress"):
+                    response.set_data(compress(response.get_data(), encoding))
+                response.content_encoding = encoding
+    etag, weak = response.get_etag()
+    if etag and response.content_encoding in ENCODINGS:
+        response.set_etag(f"{etag}-{response.content_encoding}", weak)
+    return response
+
+
+def timed(phase):
+    """Time a phase of the current request"""
+
+    endpoint = request.endpoint if has_request_context() else None
+    return phase_seconds.time(endpoint or "", phase)
+
+
+@before_render_template.connect_via(app)
+def start_render(sender, template, context, **extra):
+    g.setdefault("renders", []).append(time.perf_counter())
+
+
+@template_rendered.connect_via(app)
+def observe_render(sender, template, context, **extra):
+    renders = g.get("renders")
+    if renders:
+        phase_seconds.observe(
+            time.perf_counter() - renders.pop(), request.endpoint or "",
+            "render",
+        )
+
+
+# First, so the time of the other hooks is counted
+app.before_request(start_timer)
+app.after_request(observe_request)
+app.after_request(compress_response)
+app.before_request(refresh_data)
+app.before_request(reload_changed_files)
+if storage is None:
+    session_store = MemorySessionStore()
+else:
+    session_store = SqliteSessionStore(storage)
+app.session_interface = ServerSideSessionInterface(session_store)
+
+
+def current_club():
+    """Return the club logged in the session, resolved through the index"""
+
+    name = session.get("club")
+    return None if name is None else find_club_by_name(name)
+
+
+def render_cached(key, render):
+    """Render through the cache, for the current data version
+
+    Rendering is done directly when the RENDER_CACHE config is off.
+    """
+
+    if not app.config["RENDER_CACHE"]:
+        return render()
+    return render_cache.get_or_render((store.version,) + key, render)
+
+
+def cached_response(key, render, mimetype="text/html"):
+    """Send a page rendered through the cache, compressed as accepted
+
+    Compressed variants are cached next to the page, so a page is
+    compressed once per data version rather than on every request.
+    """
+
+    body = render_cached(key, render)
+    response = app.response_class(body, mimetype=mimetype)
+    encoding = response_encoding(response.content_length)
+    if encoding is not None:
+        response.set_data(render_cached(
+            key + (encoding,), lambda: compress(body, encoding)
+        ))
+        response.content_encoding = encoding
+    return response
+
+
+def page_args(page_size):
+    """Return the (after, limit) cursor of a listing, from the query string
+
+    Without a limit, page_size applies.
+    """
+
+    after = request.args.get("after")
+    limit = request.args.get("limit", type=int)
+    if limit is None:
+        limit = page_size
+    if limit is not None:
+        limit = max(1, min(limit, app.config["MAX_PAGE_SIZE"]))
+    return after, limit
+
+
+def clubs_context(after, limit, sort=None):
+    """Return a page of clubs by name, or by points when sort is "points"
+
+    Clubs sorted by points come with their ranks.
+    """
+
+    if sort == "points":
+        ranked = store.leaderboard(
+            after, None if limit is None else limit + 1
+        )
+        ranks = [rank for rank, _ in ranked]
+        clubs_page = [club for _, club in ranked]
+    elif after is None and limit is None:
+        # The whole listing keeps the order of the clubs file
+        return {"clubs": clubs, "ranks": None, "next_after": None,
+                "limit": None, "sort": None}
+    else:
+        ranks = None
+        clubs_page = store.clubs_page(
+            after, None if limit is None else limit + 1
+        )
+    next_after = None
+    if limit is not None and len(clubs_page) > limit:
+        clubs_page = clubs_page[:limit]
+        next_after = clubs_page[-1].name
+    return {"clubs": clubs_page, "ranks": ranks, "next_after": next_after,
+            "limit": limit, "sort": sort}
+
+
+def sort_arg():
+    """Return the order asked for a listing of clubs, None for by name"""
+
+    return "points" if request.args.get("sort") == "points" else None
+
+
+def competitions_context(now, after, limit):
+    upcoming, past = store.competitions_page(
+        now, after, None if limit is None else limit + 1
+    )
+    next_after = None
+    if limit is not None and len(upcoming) + len(past) > limit:
+        if past:
+            past = past[:-1]
+        else:
+            upcoming = upcoming[:-1]
+        next_after = (upcoming + past)[-1].name
+    return {
+        "upcoming_competitions": upcoming,
+        "past_competitions": past,
+        "next_after": next_after,
+        "limit": limit,
+    }
+
+
+def stream_page(template_name, **context):
+    """Stream a template, the session is saved before the body is sent"""
+
+    # Pop the flashed messages from the session now, while it can be saved
+    get_flashed_messages()
+    return stream_template(template_name, **context)
+
+
+def make_etag(*parts):
+    """Return a strong ETag for the data identified by parts"""
+
+    return hashlib.sha1(repr((DATA_EPOCH,) + parts).encode()).hexdigest()
+
+
+def conditional(etag, render, public=False, flashes=True):
+    """Answer 304 if the client has the current page, without rendering it
+
+    Pending flash messages are part of the pages showing them, which are
+    then rendered unconditionally. Public pages may be stored by shared
+    caches, the others only by the browser, and both are revalidated with
+    the ETag.
+    """
+
+    if flashes and "_flashes" in session:
+        response = make_response(render())
+        response.cache_control.no_store = True
+        return response
+    # Compressed bodies have the encoding appended to their ETag
+    encoding = response_encoding()
+    variant = etag if encoding is None else f"{etag}-{encoding}"
+    if request.if_none_match.contains(variant):
+        response = app.response_class(status=304)
+        response.set_etag(variant)
+    elif request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+    else:
+        response = make_response(render())
+        response.set_etag(etag)
+    if public:
+        response.cache_control.public = True
+        response.cache_control.max_age = app.config["PUBLIC_MAX_AGE"]
+    else:
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    response.vary.add("Cookie")
+    return response
+
+
+@app.context_processor
+def inject_club():
+    return {"club": current_club()}
 
 
 @app.route("/")
@@ -117,8 +1037,7 @@ def index():
 
 @app.template_filter("is_past")
 def is_past(date):
-    converted_date = datetime.strptime(date, "%Y-%m-%d %H:%M:%S")
-    return converted_date < datetime.today()
+    return date < datetime.today()
 
 
 @app.route("/showSummary", methods=["GET", "POST"])
@@ -126,28 +1045,73 @@ def show_summary():
     """Display of the loaded competitions"""
 
     # Get club from request if this is the first connection
-    if request.method == "POST":
-        club = find_club_by_email(request.form["email"])
-    else:
-        club = session.get("club")
+    with timed("lookup"):
+        if request.method == "POST":
+            club = find_club_by_email(request.form["email"])
+        else:
+            club = current_club()
     if club is None:
         flash("This email is not registered")
         return redirect(url_for("index"))
     else:
-        session["club"] = club
-        return render_template("welcome.html", competitions=competitions)
+        if request.method == "POST":
+            session.regenerate()
+        session["club"] = club.name
+        now = datetime.today()
+        past_count = store.past_count(now)
+        after, limit = page_args(app.config["PAGE_SIZE"])
+
+        def render():
+            rank = store.rank(club)
+            if app.config["STREAM_PAGES"]:
+                return stream_page(
+                    "welcome.html", rank=rank,
+                    **competitions_context(now, after, limit),
+                )
+            # Shared by every club, until a booking or a competition starts
+            competitions_html = render_cached(
+                ("competitions", past_count, after, limit),
+                lambda: render_template(
+                    "competitions.html",
+                    **competitions_context(now, after, limit),
+                ),
+            )
+            return render_template(
+                "welcome.html", rank=rank,
+                competitions_html=Markup(competitions_html),
+            )
+
+        if request.method == "POST":
+            return render()
+        etag = make_etag(
+            "summary", store.version, past_count, after, limit, club.name
+        )
+        return conditional(etag, render)
 
 
 @app.route("/book/<competition>")
 def book(competition):
     """Allow user to book an upcoming competition"""
 
-    found_competition = find_competition_by_name(competition)
+    with timed("lookup"):
+        found_competition = find_competition_by_name(competition)
     if found_competition:
-        if is_past(found_competition["date"]):
+        if is_past(found_competition.date):
             return redirect(url_for("show_summary"))
 
-        return render_template("booking.html", competition=found_competition)
+        club = current_club()
+        etag = make_etag(
+            "book",
+            store.competition_version(found_competition.name),
+            found_competition.name,
+            None if club is None else club.name,
+        )
+        return conditional(
+            etag,
+            lambda: render_template(
+                "booking.html", competition=found_competition
+            ),
+        )
     else:
         flash("Something went wrong-please try again")
         return redirect(url_for("show_summary"))
@@ -158,14 +1122,11 @@ def purchase_places():
     if request.method == "GET":
         return redirect(url_for("show_summary"))
 
-    competition = find_competition_by_name(request.form["competition"])
-    club = session.get("club")
+    with timed("lookup"):
+        competition = find_competition_by_name(request.form["competition"])
+        club = current_club()
 
-    if not club:
-        flash("This club is not registered")
-        return redirect(url_for("index"))
-
-    if find_club_by_name(club["name"]) is None:
+    if club is None:
         flash("This club is not registered")
         return redirect(url_for("index"))
 
@@ -173,44 +1134,387 @@ def purchase_places():
         flash("This competition is not registered")
         return redirect(url_for("show_summary"))
 
-    left_places = int(competition["numberOfPlaces"])
-    places_required = int(request.form["places"])
-    points = int(club["points"])
-
-    if not validate_places(places_required):
-        flash(f"Place must be between 0 and 12")
-        return render_template("booking.html", competition=competition)
-
-    if not enough_places(competition, places_required):
-        flash("There is only {} places available".format(left_places))
+    if competition.number_of_places == 0:
+        # Nothing left to queue for
+        rejections.inc("places")
+        flash("This competition is sold out")
         return render_template("booking.html", competition=competition)
 
-    if not enough_points(club, places_required):
-        flash("You have only {} points available".format(points))
-        return render_template("booking.html", competition=competition)
-
-    if too_much_athlete(club, competition, places_required):
-        booking = find_competition_in_club_booking(competition["name"], club)
-        number_athlete = booking[competition["name"]]
-        flash(
-            f"You have already {number_athlete} athletes registered for this "
-            f"competition. "
-            f"You can only register {12 - number_athlete} more athletes.")
+    places_required = int(request.form["places"])
+    try:
+        error = check_and_book(club, competition, places_required)
+    except QueueFull:
+        rejections.inc("queue_full")
+        flash("Too many bookings in progress, please try again")
+        response = make_response(
+            render_template("booking.html", competition=competition), 503
+        )
+        response.retry_after = app.config["QUEUE_RETRY_AFTER"]
+        return response
+    if error:
+        flash(error)
         return render_template("booking.html", competition=competition)
 
-    book_places(club, competition, places_required)
     flash("Great-booking complete!")
     return redirect(url_for("show_summary"))
 
 
+@app.route("/purchasePlaces/batch", methods=["POST"])
+def purchase_places_batch():
+    """Book places in several competitions at once, all or nothing
+
+    The body is {"bookings": [{"competition": name, "places": n}, ...]}.
+    When a line is refused nothing is booked, and the error of every line
+    is returned.
+    """
+
+    club = current_club()
+    if club is None:
+        return api_error("This club is not registered", 401)
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(
+        body.get("bookings"), list
+    ):
+        return api_error("Expected a list of bookings", 400)
+    if not 0 < len(body["bookings"]) <= app.config["MAX_BATCH_LINES"]:
+        return api_error(
+            f"Expected 1 to {app.config['MAX_BATCH_LINES']} bookings", 400
+        )
+
+    lines = []
+    errors = []
+    with timed("lookup"):
+        for line in body["bookings"]:
+            competition = None
+            places_required = None
+            if isinstance(line, dict):
+                competition = find_competition_by_name(
+                    line.get("competition")
+                )
+                places_required = line.get("places")
+            if competition is None:
+                errors.append("This competition is not registered")
+            elif is_past(competition.date):
+                errors.append("This competition has already taken place")
+            elif type(places_required) is not int:
+                errors.append("Place must be between 0 and 12")
+            else:
+                errors.append(None)
+                lines.append((competition, places_required))
+    if not any(errors):
+        try:
+            errors = check_and_book_many(club, lines)
+        except QueueFull:
+            rejections.inc("queue_full", amount=len(lines))
+            response = api_error(
+                "Too many bookings in progress, please try again", 503
+            )
+            response.retry_after = app.config["QUEUE_RETRY_AFTER"]
+            return response
+    booked = not any(errors)
+    return app.response_class(
+        json.dumps({
+            "booked": booked,
+            "errors": [
+                {"line": i, "error": error}
+                for i, error in enumerate(errors) if error is not None
+            ],
+        }),
+        status=200 if booked else 409,
+        mimetype="application/json",
+    )
+
+
 @app.route("/points", methods=["GET"])
 def see_points():
     """Display points of all the clubs"""
 
-    return render_template("points.html", clubs=clubs)
+    logged_in = current_club() is not None
+    after, limit = page_args(app.config["PAGE_SIZE"])
+    sort = sort_arg()
+
+    def render():
+        if app.config["STREAM_PAGES"]:
+            return stream_page(
+                "points.html", **clubs_context(after, limit, sort)
+            )
+        return cached_response(
+            ("points", logged_in, after, limit, sort),
+            lambda: render_template(
+                "points.html", **clubs_context(after, limit, sort)
+            ).encode(),
+        )
+
+    return conditional(
+        make_etag("points", store.version, logged_in, after, limit, sort),
+        render,
+        public=not logged_in,
+        flashes=False,
+    )
 
 
 @app.route("/logout")
 def logout():
     session.clear()
     return redirect(url_for("index"))
+
+
+COMPETITION_FIELDS = ("name", "date", "places", "upcoming")
+CLUB_FIELDS = ("name", "points")
+
+
+def competition_record(competition, now):
+    return {
+        "name": competition.name,
+        "date": format_date(competition.date),
+        "places": competition.number_of_places,
+        "upcoming": competition.date >= now,
+    }
+
+
+def club_record(club, rank=None):
+    record = {"name": club.name, "points": club.points}
+    if rank is not None:
+        record["rank"] = rank
+    return record
+
+
+def select_fields(record, fields):
+    return {field: record[field] for field in fields}
+
+
+def api_fields(allowed):
+    """Return the fields asked with ?fields=, all of them by default
+
+    Return None if one of them is unknown.
+    """
+
+    fields = request.args.get("fields")
+    if not fields:
+        return allowed
+    fields = tuple(fields.split(","))
+    if not set(fields) <= set(allowed):
+        return None
+    return fields
+
+
+def api_error(message, status):
+    return app.response_class(
+        json.dumps({"error": message}), status=status,
+        mimetype="application/json",
+    )
+
+
+def api_version():
+    """Return the data version given to clients, to ask changes since it"""
+
+    return f"{DATA_EPOCH}-{store.version}"
+
+
+def api_changes():
+    """Return the (clubs, competitions) changed since ?since=
+
+    Return None if there is no ?since=, or if it is a version of another
+    process or too old to know what changed.
+    """
+
+    since = request.args.get("since")
+    if since is None:
+        return None
+    epoch, _, version = since.partition("-")
+    if epoch != DATA_EPOCH or not version.isdigit():
+        return None
+    return store.changed_since(int(version))
+
+
+def api_response(etag, build, *key):
+    """Send the JSON built by build, cached for the current data version"""
+
+    return conditional(
+        etag,
+        lambda: cached_response(
+            ("api", request.full_path) + key,
+            lambda: json.dumps(build(), separators=(",", ":")).encode(),
+            mimetype="application/json",
+        ),
+        public=True,
+        flashes=False,
+    )
+
+
+@app.route("/api/competitions")
+def api_competitions():
+    """Competitions and their places, upcoming first then past
+
+    With ?since=<version>, only the competitions changed since then.
+    """
+
+    fields = api_fields(COMPETITION_FIELDS)
+    if fields is None:
+        return api_error("Unknown field", 400)
+    now = datetime.today()
+    past_count = store.past_count(now)
+    after, limit = page_args(app.config["API_PAGE_SIZE"])
+
+    def build():
+        result = {"version": api_version()}
+        changes = api_changes()
+        if changes is not None:
+            _, competitions = changes
+            result["full"] = False
+            result["competitions"] = [
+                select_fields(competition_record(c, now), fields)
+                for c in competitions
+            ]
+            return result
+        if "since" in request.args:
+            result["full"] = True
+        context = competitions_context(now, after, limit)
+        result["competitions"] = [
+            select_fields(competition_record(c, now), fields)
+            for c in context["upcoming_competitions"]
+            + context["past_competitions"]
+        ]
+        result["next"] = context["next_after"]
+        return result
+
+    etag = make_etag("api", store.version, past_count, request.full_path)
+    return api_response(etag, build, past_count)
+
+
+@app.route("/api/competitions/<name>")
+def api_competition(name):
+    fields = api_fields(COMPETITION_FIELDS)
+    if fields is None:
+        return api_error("Unknown field", 400)
+    competition = find_competition_by_name(name)
+    if competition is None:
+        return api_error("Competition not found", 404)
+    now = datetime.today()
+    upcoming = competition.date >= now
+    etag = make_etag(
+        "api", store.competition_version(name), upcoming, request.full_path
+    )
+    return api_response(
+        etag,
+        lambda: select_fields(competition_record(competition, now), fields),
+        upcoming,
+    )
+
+
+@app.route("/api/points")
+def api_points():
+    """Points of the clubs, by name or with ?sort=points by rank
+
+    With ?since=<version>, only the clubs changed since then.
+    """
+
+    sort = sort_arg()
+    fields = api_fields(
+        CLUB_FIELDS + ("rank",) if sort == "points" else CLUB_FIELDS
+    )
+    if fields is None:
+        return api_error("Unknown field", 400)
+    after, limit = page_args(app.config["API_PAGE_SIZE"])
+
+    def build():
+        result = {"version": api_version()}
+        changes = api_changes()
+        if changes is not None:
+            clubs_changed, _ = changes
+            result["full"] = False
+            result["clubs"] = [
+                select_fields(club_record(
+                    c, store.rank(c) if sort == "points" else None
+                ), fields)
+                for c in clubs_changed
+            ]
+            return result
+        if "since" in request.args:
+            result["full"] = True
+        context = clubs_context(after, limit, sort)
+        ranks = context["ranks"] or [None] * len(context["clubs"])
+        result["clubs"] = [
+            select_fields(club_record(c, rank), fields)
+            for c, rank in zip(context["clubs"], ranks)
+        ]
+        result["next"] = context["next_after"]
+        return result
+
+    etag = make_etag("api", store.version, request.full_path)
+    return api_response(etag, build)
+
+
+@app.route("/api/points/<name>")
+def api_club(name):
+    """Points of a club and its rank by points"""
+
+    fields = api_fields(CLUB_FIELDS + ("rank",))
+    if fields is None:
+        return api_error("Unknown field", 400)
+    club = find_club_by_name(name)
+    if club is None:
+        return api_error("Club not found", 404)
+    etag = make_etag("api", store.version, request.full_path)
+    return api_response(
+        etag,
+        lambda: select_fields(club_record(club, store.rank(club)), fields),
+    )
+
+
+@app.route("/api/search")
+def api_search():
+    """Clubs and competitions whose name starts with ?q=, case ignored
+
+    ?type=clubs or ?type=competitions only searches those. Competitions
+    can be restricted to the upcoming ones with ?upcoming=1 and to the ones
+    with places left with ?available=1. ?limit= applies to each list.
+    """
+
+    prefix = request.args.get("q", "")
+    kind = request.args.get("type")
+    if kind not in (None, "clubs", "competitions"):
+        return api_error("Unknown type", 400)
+    _, limit = page_args(app.config["SEARCH_LIMIT"])
+    upcoming = request.args.get("upcoming") == "1"
+    available = request.args.get("available") == "1"
+    now = datetime.today()
+
+    def build():
+        result = {}
+        if kind != "competitions":
+            result["clubs"] = [
+                club_record(c) for c in store.search_clubs(prefix, limit)
+            ]
+        if kind != "clubs":
+            result["competitions"] = [
+                competition_record(c, now)
+                for c in store.search_competitions(
+                    prefix, limit, now if upcoming else None, available
+                )
+            ]
+        return result
+
+    past_count = store.past_count(now)
+    etag = make_etag("api", store.version, past_count, request.full_path)
+    return api_response(etag, build, past_count)
+
+
+@app.route("/api/queues")
+def api_queues():
+    """Booking queues of the competitions and their waiting times"""
+
+    return app.response_class(
+        json.dumps(competition_locks.stats(), separators=(",", ":")),
+        mimetype="application/json",
+    )
+
+
+@app.route("/metrics")
+def see_metrics():
+    """Latencies, bookings and persistence counters, for Prometheus"""
+
+    return app.response_class(
+        metrics.render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
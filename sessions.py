@@ -0,0 +1,159 @@
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+class MemorySessionStore:
+    """Session data kept in memory
+
+    Sessions expire ``ttl`` seconds after their last use, and the least
+    recently used ones are evicted past ``max_entries``.
+    """
+
+    def __init__(self, max_entries=10000, ttl=86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            data, expires = entry
+            if expires < time.monotonic():
+                del self._entries[sid]
+                return None
+            self._entries[sid] = (data, time.monotonic() + self.ttl)
+            self._entries.move_to_end(sid)
+            return data
+
+    def set(self, sid, data):
+        with self._lock:
+            self._entries[sid] = (data, time.monotonic() + self.ttl)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SqliteSessionStore:
+    """Session data kept in the SQLite storage, shared by worker processes
+
+    Sessions expire ``ttl`` seconds after they were last written.
+    """
+
+    def __init__(self, storage, ttl=86400, purge_every=1000):
+        self.storage = storage
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._writes = 0
+        self.storage.connection().execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+
+    def get(self, sid):
+        row = self.storage.connection().execute(
+            "SELECT data FROM sessions WHERE id = ? AND expires >= ?",
+            (sid, time.time()),
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def set(self, sid, data):
+        connection = self.storage.connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO sessions (id, data, expires) "
+            "VALUES (?, ?, ?)",
+            (sid, json.dumps(data), time.time() + self.ttl),
+        )
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            connection.execute(
+                "DELETE FROM sessions WHERE expires < ?", (time.time(),)
+            )
+
+    def delete(self, sid):
+        self.storage.connection().execute(
+            "DELETE FROM sessions WHERE id = ?", (sid,)
+        )
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(session):
+            session.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.replaced_sid = None
+
+    def regenerate(self):
+        """Move the data to a new id, the old one is deleted when saved
+
+        Called on login, so an id planted before it is of no use after.
+        """
+
+        if self.replaced_sid is None and not self.new:
+            self.replaced_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.new = True
+        self.modified = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Keep session data on the server, the cookie only holds a random id
+
+    Unlike the default signed cookie sessions, the data is neither sent with
+    every request nor decoded from it.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.store.get(sid)
+            if data is not None:
+                return ServerSideSession(data, sid=sid)
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.replaced_sid is not None:
+            self.store.delete(session.replaced_sid)
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if session.modified:
+            self.store.set(session.sid, dict(session))
+        if session.new or session.modified:
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
@@ -0,0 +1,154 @@
+import argparse
+import gc
+import logging
+import mmap
+import os
+import struct
+import zlib
+from datetime import datetime
+
+import msgpack
+
+from loader import load_snapshot
+from models import Club, Competition
+from persistence import write_atomic
+
+MAGIC = b"GUDLFT\x00\x01"
+HEADER_LENGTH = struct.Struct("<I")
+
+
+def pack_data(clubs, competitions):
+    """Serialize the models into the payload of a binary snapshot
+
+    Each field is stored as one array, which decodes faster than an array
+    per record.
+    """
+
+    return msgpack.packb({
+        "clubs": [
+            [c.name for c in clubs],
+            [c.email for c in clubs],
+            [c.points for c in clubs],
+            [c.bookings for c in clubs],
+        ],
+        "competitions": [
+            [c.name for c in competitions],
+            [c.date.isoformat() for c in competitions],
+            [c.number_of_places for c in competitions],
+        ],
+    })
+
+
+def unpack_data(payload):
+    # Millions of new objects would trigger collections finding no garbage
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        data = msgpack.unpackb(payload)
+        names, emails, points, bookings = data["clubs"]
+        clubs = list(map(Club, names, emails, points, bookings))
+        names, dates, places = data["competitions"]
+        competitions = list(map(
+            Competition, names, map(datetime.fromisoformat, dates), places
+        ))
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return clubs, competitions
+
+
+def stamp(path):
+    """Return what identifies the current content of a source file"""
+
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def write_binary_snapshot(path, payload, sources, journal_seq):
+    """Write a payload as the binary copy of the given JSON source files
+
+    It is only valid as long as the sources keep their size and mtime.
+    Return the size of the file written, in bytes.
+    """
+
+    header = msgpack.packb({
+        "sources": {os.fspath(source): stamp(source) for source in sources},
+        "checksum": zlib.crc32(payload),
+        "journalSeq": journal_seq,
+    })
+    return write_atomic(
+        path, MAGIC + HEADER_LENGTH.pack(len(header)) + header + payload
+    )
+
+
+def read_binary_snapshot(path, sources):
+    """Return the (clubs, competitions, journal_seq) of a binary snapshot
+
+    The file is memory-mapped and the models are built straight from it.
+    Return None when it is missing, corrupted or older than a source file,
+    the JSON snapshots must then be loaded instead.
+    """
+
+    try:
+        snapshot_file = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with snapshot_file, mmap.mmap(
+        snapshot_file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mapped:
+        view = memoryview(mapped)
+        try:
+            return _read(path, view, sources)
+        except (ValueError, KeyError, TypeError, struct.error,
+                msgpack.UnpackException) as error:
+            logging.warning(f"Ignoring invalid binary snapshot {path}: "
+                            f"{error!r}")
+            return None
+        finally:
+            view.release()
+
+
+def _read(path, view, sources):
+    if view[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a binary snapshot")
+    start = len(MAGIC) + HEADER_LENGTH.size
+    (length,) = HEADER_LENGTH.unpack(view[len(MAGIC):start])
+    header = msgpack.unpackb(view[start:start + length])
+    try:
+        current = {os.fspath(source): stamp(source) for source in sources}
+    except FileNotFoundError:
+        return None
+    if header["sources"] != current:
+        logging.info(f"Binary snapshot {path} is stale")
+        return None
+    payload = view[start + length:]
+    if zlib.crc32(payload) != header["checksum"]:
+        raise ValueError("Checksum mismatch")
+    clubs, competitions = unpack_data(payload)
+    return clubs, competitions, header["journalSeq"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build the binary snapshot of the JSON files"
+    )
+    parser.add_argument("--snapshot", default="gudlft.snapshot")
+    parser.add_argument("--clubs", default="clubs.json")
+    parser.add_argument("--competitions", default="competitions.json")
+    args = parser.parse_args(argv)
+    clubs, clubs_seq = load_snapshot(args.clubs, "clubs", Club.from_dict)
+    competitions, competitions_seq = load_snapshot(
+        args.competitions, "competitions", Competition.from_dict
+    )
+    if clubs_seq != competitions_seq:
+        parser.error("The JSON files were not written by the same compaction")
+    write_binary_snapshot(
+        args.snapshot,
+        pack_data(clubs, competitions),
+        [args.clubs, args.competitions],
+        clubs_seq,
+    )
+
+
+if __name__ == "__main__":
+    main()
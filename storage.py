@@ -0,0 +1,307 @@
+import argparse
+import json
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+
+from loader import load_snapshot
+from models import Club, Competition, format_date, parse_date
+from persistence import write_atomic
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+CREATE TABLE IF NOT EXISTS clubs (
+    name TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    points INTEGER NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS clubs_email ON clubs (email COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS clubs_version ON clubs (version);
+CREATE TABLE IF NOT EXISTS competitions (
+    name TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    places INTEGER NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS competitions_version ON competitions (version);
+CREATE TABLE IF NOT EXISTS bookings (
+    club TEXT NOT NULL REFERENCES clubs (name),
+    competition TEXT NOT NULL REFERENCES competitions (name),
+    places INTEGER NOT NULL,
+    PRIMARY KEY (club, competition)
+);
+"""
+
+MAX_PLACES_PER_COMPETITION = 12
+
+
+class BookingConflict(Exception):
+    """The database refused a booking the loaded data allowed"""
+
+
+class ThreadConnection:
+    """Connection of one thread, closed once the thread ends"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        weakref.finalize(self, connection.close)
+
+
+class SqliteStorage:
+    """Clubs, competitions and bookings shared by processes in SQLite
+
+    The database runs in WAL mode so readers never block the writer. Each
+    thread gets its own connection, reused for all its requests and closed
+    when the thread ends, so servers starting a thread per request do not
+    run out of file descriptors. Under gevent, threads are greenlets and each
+    request opens its connection. Every write
+    bumps a global version stored on the changed rows, which lets processes
+    fetch only what changed since they last looked.
+    """
+
+    def __init__(self, path="gudlft.db", timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self.seen_version = 0
+        self._local = threading.local()
+        # Only the threads reference their connection, for close
+        self._connections = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self.connection().executescript(SCHEMA)
+
+    def connection(self):
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            connection = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            holder = self._local.holder = ThreadConnection(connection)
+            with self._lock:
+                self._connections.add(holder)
+        return holder.connection
+
+    @contextmanager
+    def transaction(self):
+        """Run statements in a write transaction, taken before any read"""
+
+        connection = self.connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            for holder in list(self._connections):
+                holder.connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def version(self):
+        row = self.connection().execute(
+            "SELECT value FROM meta WHERE key = 'version'"
+        ).fetchone()
+        return row[0]
+
+    def is_empty(self):
+        row = self.connection().execute(
+            "SELECT COUNT(*) FROM clubs"
+        ).fetchone()
+        return row[0] == 0
+
+    def import_data(self, clubs, competitions):
+        """Replace the database content with clubs and competitions"""
+
+        with self.transaction() as connection:
+            version = self._next_version(connection)
+            connection.execute("DELETE FROM bookings")
+            connection.execute("DELETE FROM clubs")
+            connection.execute("DELETE FROM competitions")
+            connection.executemany(
+                "INSERT INTO competitions (name, date, places, version) "
+                "VALUES (?, ?, ?, ?)",
+                [(c.name, format_date(c.date), c.number_of_places, version)
+                 for c in competitions],
+            )
+            connection.executemany(
+                "INSERT INTO clubs (name, email, points, version) "
+                "VALUES (?, ?, ?, ?)",
+                [(c.name, c.email, c.points, version) for c in clubs],
+            )
+            connection.executemany(
+                "INSERT INTO bookings (club, competition, places) "
+                "VALUES (?, ?, ?)",
+                [(c.name, competition_name, places)
+                 for c in clubs
+                 for competition_name, places in c.bookings.items()],
+            )
+
+    def load(self):
+        """Return every club and competition"""
+
+        return self._select(since=None)
+
+    def changes(self):
+        """Return the clubs and competitions changed since the last call"""
+
+        version = self.version()
+        if version == self.seen_version:
+            return [], []
+        return self._select(since=self.seen_version)
+
+    def _select(self, since):
+        connection = self.connection()
+        # Read everything from the same snapshot of the database
+        connection.execute("BEGIN")
+        try:
+            version = self.version()
+            condition, parameters = "", ()
+            if since is not None:
+                condition, parameters = "WHERE version > ?", (since,)
+            competitions = [
+                Competition(name, parse_date(date), places)
+                for name, date, places in connection.execute(
+                    f"SELECT name, date, places FROM competitions {condition} "
+                    f"ORDER BY rowid", parameters
+                )
+            ]
+            clubs = []
+            clubs_by_name = {}
+            for name, email, points in connection.execute(
+                f"SELECT name, email, points FROM clubs {condition} "
+                f"ORDER BY rowid", parameters
+            ):
+                club = Club(name, email, points)
+                clubs.append(club)
+                clubs_by_name[name] = club
+            if since is None:
+                bookings = connection.execute(
+                    "SELECT club, competition, places FROM bookings "
+                    "ORDER BY rowid"
+                )
+            else:
+                bookings = connection.execute(
+                    "SELECT b.club, b.competition, b.places FROM bookings b "
+                    "JOIN clubs c ON c.name = b.club WHERE c.version > ? "
+                    "ORDER BY b.rowid", parameters
+                )
+            for club_name, competition_name, places in bookings:
+                clubs_by_name[club_name].bookings[competition_name] = places
+        finally:
+            connection.execute("COMMIT")
+        self.seen_version = max(self.seen_version, version)
+        return clubs, competitions
+
+    def book(self, booking):
+        """Book places in one transaction, or raise BookingConflict
+
+        The checks are made again against the shared data, so bookings from
+        other processes are accounted for. Return the committed (places,
+        points, booked) of the competition and club, as for book_many.
+        """
+
+        return self.book_many([booking])[0]
+
+    def book_many(self, bookings):
+        """Book places for every booking in one transaction, or none of them
+
+        Return, for each booking, the places left in the competition, the
+        points left to the club and the places it has booked in the
+        competition once committed, other processes' bookings included.
+        """
+
+        with self.transaction() as connection:
+            version = self._next_version(connection)
+            return [self._book(connection, version, booking)
+                    for booking in bookings]
+
+    @staticmethod
+    def _book(connection, version, booking):
+        places = connection.execute(
+            "UPDATE competitions SET places = places - ?, version = ? "
+            "WHERE name = ? AND places >= ? RETURNING places",
+            (booking.places, version, booking.competition, booking.places),
+        ).fetchone()
+        if places is None:
+            raise BookingConflict("Not enough places left")
+        points = connection.execute(
+            "UPDATE clubs SET points = points - ?, version = ? "
+            "WHERE name = ? AND points >= ? RETURNING points",
+            (booking.places, version, booking.club, booking.places),
+        ).fetchone()
+        if points is None:
+            raise BookingConflict("Not enough points left")
+        booked = connection.execute(
+            "INSERT INTO bookings (club, competition, places) "
+            "VALUES (?, ?, ?) ON CONFLICT (club, competition) "
+            "DO UPDATE SET places = places + excluded.places "
+            "RETURNING places",
+            (booking.club, booking.competition, booking.places),
+        ).fetchone()[0]
+        if booked > MAX_PLACES_PER_COMPETITION:
+            raise BookingConflict("Too many athletes registered")
+        return places[0], points[0], booked
+
+    @staticmethod
+    def _next_version(connection):
+        return connection.execute(
+            "UPDATE meta SET value = value + 1 WHERE key = 'version' "
+            "RETURNING value"
+        ).fetchone()[0]
+
+    def export_json(self, clubs_path="clubs.json",
+                    competitions_path="competitions.json"):
+        clubs, competitions = self.load()
+        write_atomic(
+            clubs_path,
+            json.dumps({"clubs": [c.to_dict() for c in clubs]}, indent=4),
+        )
+        write_atomic(
+            competitions_path,
+            json.dumps(
+                {"competitions": [c.to_dict() for c in competitions]},
+                indent=4,
+            ),
+        )
+
+    def import_json(self, clubs_path="clubs.json",
+                    competitions_path="competitions.json"):
+        clubs, _ = load_snapshot(clubs_path, "clubs", Club.from_dict)
+        competitions, _ = load_snapshot(
+            competitions_path, "competitions", Competition.from_dict
+        )
+        self.import_data(clubs, competitions)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Copy data between the JSON files and a SQLite database"
+    )
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("--database", default="gudlft.db")
+    parser.add_argument("--clubs", default="clubs.json")
+    parser.add_argument("--competitions", default="competitions.json")
+    args = parser.parse_args(argv)
+    storage = SqliteStorage(args.database)
+    if args.command == "import":
+        storage.import_json(args.clubs, args.competitions)
+    else:
+        storage.export_json(args.clubs, args.competitions)
+    storage.close()
+
+
+if __name__ == "__main__":
+    main()
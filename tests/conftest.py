@@ -1,28 +1,49 @@
+from datetime import datetime
+
 import pytest
 
+import server
+from journal import BookingJournal
+from models import Club, Competition
+from persistence import PersistenceWriter
+from repository import Repository
 from server import app
+from watcher import FileWatcher
 
 
 @pytest.fixture
 def client():
     app.config["TESTING"] = True
+    app.config["RENDER_CACHE"] = False
+    app.config["HOT_RELOAD_INTERVAL"] = None
     with app.test_client() as client:
         yield client
 
 
 @pytest.fixture
-def fake_data(mocker):
-    clubs = [{"name": "Simply Lift", "email": "john@simplylift.co", "points": "20",
-              "bookings" : []}]
+def fake_data(mocker, tmp_path):
+    clubs = [Club(name="Simply Lift", email="john@simplylift.co", points=20)]
     competitions = [
-        {
-            "name": "Spring Festival",
-            "date": "2024-10-22 13:00:00",
-            "numberOfPlaces": "25",
-        }
+        Competition(
+            name="Spring Festival",
+            date=datetime(2024, 10, 22, 13, 0),
+            number_of_places=25,
+        )
     ]
     mocker.patch("server.clubs", clubs)
     mocker.patch("server.competitions", competitions)
+    mocker.patch("server.store", Repository(clubs, competitions))
+    journal = BookingJournal(tmp_path / "bookings.journal")
+    mocker.patch("server.journal", journal)
+    mocker.patch(
+        "server.persistence",
+        PersistenceWriter(journal, server.compact, mode="sync"),
+    )
     mocker.patch("server.update_clubs", return_value=None)
     mocker.patch("server.update_competitions", return_value=None)
+    mocker.patch("server.update_binary_snapshot", return_value=None)
+    mocker.patch("server.snapshot_seqs",
+                 {"clubs.json": 0, "competitions.json": 0})
+    mocker.patch("server.watcher",
+                 FileWatcher(["clubs.json", "competitions.json"]))
     return clubs, competitions
@@ -8,42 +8,49 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.firefox.options import Options
 
+import server
+from journal import BookingJournal
+from models import Club, Competition
+from persistence import PersistenceWriter
+from repository import Repository
 from server import app
 
 @pytest.fixture(scope='function', autouse=True)
-def set_data(mocker):
+def set_data(mocker, tmp_path):
     tomorrow = datetime.today() + timedelta(days=1)
-    tomorrow = tomorrow.strftime("%Y-%m-%d %H:%M:%S")
     mock_competitions = [
-        {
-            "name": "Test Competition",
-            "date": tomorrow,
-            "numberOfPlaces": "25"
-        },
-        {
-            "name": "Spring Festival",
-            "date": "2025-04-15 13:00:00",
-            "numberOfPlaces": "20"
-        }
+        Competition(
+            name="Test Competition",
+            date=tomorrow,
+            number_of_places=25
+        ),
+        Competition(
+            name="Spring Festival",
+            date=datetime(2025, 4, 15, 13, 0),
+            number_of_places=20
+        )
     ]
 
     mock_clubs = [
-        {
-            "name": "Test Club",
-            "email": "john@simplylift.co",
-            "points": "10",
-            "bookings" : []
-        },
-        {
-            "name": "Iron Temple",
-            "email": "admin@irontemple.com",
-            "points": "15",
-            "bookings": []
-        }
+        Club(
+            name="Test Club",
+            email="john@simplylift.co",
+            points=10
+        ),
+        Club(
+            name="Iron Temple",
+            email="admin@irontemple.com",
+            points=15
+        )
     ]
 
     mocker.patch('server.clubs', mock_clubs)
     mocker.patch('server.competitions', mock_competitions)
+    mocker.patch('server.store', Repository(mock_clubs, mock_competitions))
+    journal = BookingJournal(tmp_path / 'bookings.journal')
+    mocker.patch('server.journal', journal)
+    mocker.patch('server.persistence',
+                 PersistenceWriter(journal, server.compact, mode='sync'))
     mocker.patch('server.update_clubs', return_value=None)
     mocker.patch('server.update_competitions', return_value=None)
 
@@ -52,6 +59,7 @@ class TestFunctional:
     @classmethod
     def setup_class(cls):
         app.config['TESTING'] = True
+        app.config['RENDER_CACHE'] = False
         # use different port in case the "real" server is launched
         app.config['LIVESERVER_PORT'] = 8943
         app.config[
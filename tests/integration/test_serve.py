@@ -0,0 +1,119 @@
+import http.cookiejar
+import json
+import os
+import re
+import shutil
+import signal
+import sqlite3
+import subprocess
+import sys
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+
+def start(directory, *args, **env):
+    """Start ``python -m serve`` on a free port, return (process, url)"""
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "serve", "--port", "0", *args],
+        cwd=directory, stderr=subprocess.PIPE, text=True,
+        env=dict(os.environ, PYTHONPATH=ROOT, **env),
+    )
+    for line in process.stderr:
+        match = re.search(r"Listening on (http://\S+)", line)
+        if match:
+            return process, match.group(1)
+    process.wait()
+    pytest.fail("The server did not start")
+
+
+def book(url, places):
+    opener = urllib.request.build_opener(
+        urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+    )
+    opener.open(url + "/showSummary", urllib.parse.urlencode(
+        {"email": "john@simplylift.co"}
+    ).encode())
+    opener.open(url + "/purchasePlaces", urllib.parse.urlencode(
+        {"competition": "Spring Festival", "places": places}
+    ).encode())
+
+
+@pytest.fixture
+def data(tmp_path):
+    for name in ("clubs.json", "competitions.json"):
+        shutil.copy(os.path.join(ROOT, name), tmp_path)
+    return tmp_path
+
+
+def stop(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        return process.wait(timeout=30)
+    finally:
+        process.stderr.close()
+
+
+def test_serve_writes_pending_bookings_on_sigterm(data):
+    process, url = start(data, GUDLFT_DURABILITY="async")
+    book(url, 2)
+    assert stop(process) == 0
+    journal = (data / "bookings.journal").read_text()
+    assert '"club":"Simply Lift","competition":"Spring Festival"' in journal
+
+
+def test_prefork_workers_share_the_database(data):
+    process, url = start(data, "--workers", "2", GUDLFT_STORAGE="sqlite")
+    for _ in range(3):
+        book(url, 1)
+    assert stop(process) == 0
+    with sqlite3.connect(data / "gudlft.db") as connection:
+        assert connection.execute(
+            "SELECT club, competition, places FROM bookings"
+        ).fetchall() == [("Simply Lift", "Spring Festival", 3)]
+
+
+def get_points(url, etag=None):
+    """Return (status, epoch of the answering worker or None, body)"""
+
+    request = urllib.request.Request(
+        url, headers={} if etag is None else {"If-None-Match": etag}
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            body = json.load(response)
+            body["etag"] = response.headers["ETag"]
+            return response.status, body["version"].partition("-")[0], body
+    except urllib.error.HTTPError as error:
+        assert error.code == 304
+        return 304, None, None
+
+
+def test_prefork_workers_refuse_each_other_versions(data):
+    process, url = start(data, "--workers", "2", GUDLFT_STORAGE="sqlite")
+    try:
+        workers = {}
+        for _ in range(100):
+            _, epoch, body = get_points(url + "/api/points")
+            workers.setdefault(epoch, body)
+            if len(workers) == 2:
+                break
+        assert len(workers) == 2
+        assert len({body["etag"] for body in workers.values()}) == 2
+        for epoch, body in workers.items():
+            for _ in range(10):
+                status, answered_by, changes = get_points(
+                    url + "/api/points?since=" + body["version"]
+                )
+                assert changes["full"] is (answered_by != epoch)
+                status, answered_by, _ = get_points(
+                    url + "/api/points", body["etag"]
+                )
+                assert status == 304 or answered_by != epoch
+    finally:
+        assert stop(process) == 0
@@ -1,7 +1,13 @@
+import gzip
 from datetime import datetime, timedelta
 
+import brotli
+import pytest
 from flask import url_for
 
+import server
+from admission import AdmissionQueue
+from models import Club, Competition
 from server import app, find_competition_in_club_booking
 
 
@@ -33,21 +39,21 @@ def test_should_purchase_places(client, fake_data):
     clubs, competitions = fake_data
     club = clubs[0]
     competition = competitions[0]
-    number_places = int(competitions[0]["numberOfPlaces"])
+    number_places = competitions[0].number_of_places
 
     with client.session_transaction() as session:
-        session["club"] = club
+        session["club"] = club.name
 
     response = client.post(
         "/purchasePlaces",
-        data={"competition": competition["name"], "places": 2},
+        data={"competition": competition.name, "places": 2},
         follow_redirects=True,
     )
 
     assert response.status_code == 200
     data = response.data.decode()
     assert "Great-booking complete!" in data
-    assert competition["numberOfPlaces"] == str(number_places - 2)
+    assert competition.number_of_places == number_places - 2
 
 
 def test_should_not_purchase_too_many_places(client, fake_data):
@@ -56,11 +62,11 @@ def test_should_not_purchase_too_many_places(client, fake_data):
     competition = competitions[0]
 
     with client.session_transaction() as session:
-        session["club"] = club
+        session["club"] = club.name
 
     response = client.post(
         "/purchasePlaces",
-        data={"competition": competition["name"], "places": 15},
+        data={"competition": competition.name, "places": 15},
         follow_redirects=True,
     )
 
@@ -73,15 +79,15 @@ def test_should_not_purchase_more_places_than_left(client, fake_data):
     clubs, competitions = fake_data
     club = clubs[0]
     competition = competitions[0]
-    competition["numberOfPlaces"] = 2
-    number_places = int(competitions[0]["numberOfPlaces"])
+    competition.number_of_places = 2
+    number_places = competitions[0].number_of_places
 
     with client.session_transaction() as session:
-        session["club"] = club
+        session["club"] = club.name
 
     response = client.post(
         "/purchasePlaces",
-        data={"competition": competition["name"], "places": 5},
+        data={"competition": competition.name, "places": 5},
         follow_redirects=True,
     )
 
@@ -92,16 +98,16 @@ def test_should_not_purchase_more_places_than_left(client, fake_data):
 
 def test_should_not_purchase_place_incorrect_club(client, fake_data):
     _, competitions = fake_data
-    club = {"name": "test", "email": "test@test.com", "points": "5"}
+    club = Club(name="test", email="test@test.com", points=5)
     competition = competitions[0]
-    competition["numberOfPlaces"] = 2
+    competition.number_of_places = 2
 
     with client.session_transaction() as session:
-        session["club"] = club
+        session["club"] = club.name
 
     response = client.post(
         "/purchasePlaces",
-        data={"competition": competition["name"], "places": 5},
+        data={"competition": competition.name, "places": 5},
         follow_redirects=True,
     )
 
@@ -113,18 +119,18 @@ def test_should_not_purchase_place_incorrect_club(client, fake_data):
 def test_should_not_purchase_place_incorrect_competition(client, fake_data):
     clubs, _ = fake_data
     club = clubs[0]
-    competition = {
-        "name": "Test",
-        "date": "2020-03-27 10:00:00",
-        "numberOfPlaces": "25",
-    }
+    competition = Competition(
+        name="Test",
+        date=datetime(2020, 3, 27, 10, 0),
+        number_of_places=25,
+    )
 
     with client.session_transaction() as session:
-        session["club"] = club
+        session["club"] = club.name
 
     response = client.post(
         "/purchasePlaces",
-        data={"competition": competition["name"], "places": 5},
+        data={"competition": competition.name, "places": 5},
         follow_redirects=True,
     )
 
@@ -137,39 +143,38 @@ def test_should_update_points(client, fake_data):
     clubs, competitions = fake_data
     club = clubs[0]
     competition = competitions[0]
-    number_points = int(club["points"])
+    number_points = club.points
 
     with client.session_transaction() as session:
-        session["club"] = club
+        session["club"] = club.name
 
     response = client.post(
         "/purchasePlaces",
-        data={"competition": competition["name"], "places": 2},
+        data={"competition": competition.name, "places": 2},
         follow_redirects=True,
     )
 
     assert response.status_code == 200
     data = response.data.decode()
     assert "Great-booking complete!" in data
-    assert club["points"] == str(number_points - 2)
-    booking = find_competition_in_club_booking(competition['name'], club)
-    assert booking is not None
-    assert booking[competition['name']] == 2
+    assert club.points == number_points - 2
+    booking = find_competition_in_club_booking(competition.name, club)
+    assert booking == 2
 
 
 def test_should_not_update_points_not_enough(client, fake_data):
     clubs, competitions = fake_data
     club = clubs[0]
     competition = competitions[0]
-    club["points"] = "1"
-    number_points = int(club["points"])
+    club.points = 1
+    number_points = club.points
 
     with client.session_transaction() as session:
-        session["club"] = club
+        session["club"] = club.name
 
     response = client.post(
         "/purchasePlaces",
-        data={"competition": competition["name"], "places": 2},
+        data={"competition": competition.name, "places": 2},
         follow_redirects=True,
     )
 
@@ -183,19 +188,19 @@ def test_should_be_able_to_book(client, fake_data):
     club = clubs[0]
     tomorrow = datetime.today() + timedelta(days=1)
     competition = competitions[0]
-    competition["date"] = tomorrow.strftime("%Y-%m-%d %H:%M:%S")
+    competition.date = tomorrow
 
     with app.test_request_context():
-        url = url_for("book", competition=competition["name"])
+        url = url_for("book", competition=competition.name)
 
     with client.session_transaction() as session:
-        session["club"] = club
+        session["club"] = club.name
 
-    response = client.get(url, data={"competition": competition["name"]})
+    response = client.get(url, data={"competition": competition.name})
 
     assert response.status_code == 200
     data = response.data.decode()
-    assert "Places available: {}".format(competition["numberOfPlaces"]) in data
+    assert "Places available: {}".format(competition.number_of_places) in data
 
 
 def test_should_not_be_able_to_book_athlete(client, fake_data):
@@ -203,15 +208,15 @@ def test_should_not_be_able_to_book_athlete(client, fake_data):
     club = clubs[0]
     tomorrow = datetime.today() + timedelta(days=1)
     competition = competitions[0]
-    competition["date"] = tomorrow.strftime("%Y-%m-%d %H:%M:%S")
-    club["bookings"].append({competition['name']: 12})
+    competition.date = tomorrow
+    club.bookings[competition.name] = 12
 
     with client.session_transaction() as session:
-        session["club"] = club
+        session["club"] = club.name
 
     response = client.post(
         "/purchasePlaces",
-        data={"competition": competition["name"], "places": 2},
+        data={"competition": competition.name, "places": 2},
         follow_redirects=True,
     )
 
@@ -227,24 +232,24 @@ def test_should_not_be_able_to_book(client, fake_data):
     competition = competitions[0]
 
     with app.test_request_context():
-        url = url_for("book", competition=competition["name"])
+        url = url_for("book", competition=competition.name)
 
     with client.session_transaction() as session:
-        session["club"] = club
+        session["club"] = club.name
 
     response = client.get(
-        url, data={"competition": competition["name"]}, follow_redirects=True
+        url, data={"competition": competition.name}, follow_redirects=True
     )
 
     assert response.status_code == 200
     data = response.data.decode()
-    assert "Welcome, {}".format(club["email"]) in data
+    assert "Welcome, {}".format(club.email) in data
 
 
 def test_should_display_points(client, fake_data):
     clubs, _ = fake_data
     clubs.append(
-        {"name": "Simply Lifty", "email": "john@simplylift.coo", "points": "15"}
+        Club(name="Simply Lifty", email="john@simplylift.coo", points=15)
     )
     response = client.get("/points", data={"clubs": clubs})
     assert response.status_code == 200
@@ -253,3 +258,574 @@ def test_should_display_points(client, fake_data):
     assert "<td>20</td>" in data
     assert "<td>Simply Lifty</td>" in data
     assert "<td>15</td>" in data
+
+
+def test_session_cookie_holds_only_id(client):
+    client.post("/showSummary", data={"email": "john@simplylift.co"})
+    cookie = client.get_cookie("session").value
+    assert "simplylift" not in cookie
+    assert len(cookie) < 64
+
+
+def test_login_issues_new_session_id(client):
+    client.get("/showSummary")
+    client.post("/showSummary", data={"email": "john@ift.co"})
+    planted = client.get_cookie("session").value
+    client.post("/showSummary", data={"email": "john@simplylift.co"})
+    assert client.get_cookie("session").value != planted
+    client.set_cookie("session", planted)
+    assert "Welcome" not in client.get("/showSummary").data.decode()
+
+
+def test_summary_shows_points_after_booking(client, fake_data):
+    clubs, competitions = fake_data
+    client.post("/showSummary", data={"email": clubs[0].email})
+    response = client.post(
+        "/purchasePlaces",
+        data={"competition": competitions[0].name, "places": 3},
+        follow_redirects=True,
+    )
+    assert "Points available: 17" in response.data.decode()
+
+
+def test_summary_splits_upcoming_and_past(client, fake_data):
+    clubs, competitions = fake_data
+    server.store.add_competition(
+        Competition(name="Winter Coming",
+                    date=datetime.today() + timedelta(days=30),
+                    number_of_places=16)
+    )
+    response = client.post("/showSummary", data={"email": clubs[0].email})
+    data = response.data.decode()
+    upcoming, past = data.split("Past competitions:")
+    assert "Winter Coming" in upcoming
+    assert "/book/Winter%20Coming" in upcoming
+    assert "Spring Festival" in past
+    assert "/book/" not in past
+
+
+@pytest.fixture
+def cached_client(client, mocker):
+    app.config["RENDER_CACHE"] = True
+    mocker.patch("server.render_cache", server.RenderCache())
+    yield client
+    app.config["RENDER_CACHE"] = False
+
+
+def test_points_served_from_cache(cached_client, fake_data):
+    first = cached_client.get("/points").data
+    second = cached_client.get("/points").data
+    assert first == second
+    assert server.render_cache.hits == 1
+    assert server.render_cache.misses == 1
+
+
+def test_points_cache_invalidated_by_booking(cached_client, fake_data):
+    clubs, competitions = fake_data
+    assert "<td>20</td>" in cached_client.get("/points").data.decode()
+    cached_client.post("/showSummary", data={"email": clubs[0].email})
+    cached_client.post(
+        "/purchasePlaces",
+        data={"competition": competitions[0].name, "places": 2},
+    )
+    assert "<td>18</td>" in cached_client.get("/points").data.decode()
+
+
+def test_summary_caches_competitions_only(cached_client, fake_data):
+    clubs, _ = fake_data
+    server.store.add_club(
+        Club(name="Iron Temple", email="admin@irontemple.com", points=4)
+    )
+    cached_client.post("/showSummary", data={"email": clubs[0].email})
+    response = cached_client.post(
+        "/showSummary", data={"email": "admin@irontemple.com"}
+    )
+    data = response.data.decode()
+    assert "Welcome, admin@irontemple.com" in data
+    assert "Points available: 4" in data
+    assert "Spring Festival" in data
+    assert server.render_cache.hits == 1
+
+
+def test_points_not_modified(client, fake_data):
+    response = client.get("/points")
+    etag = response.headers["ETag"]
+    assert response.cache_control.public
+
+    response = client.get("/points", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_points_etag_changes_after_booking(client, fake_data):
+    clubs, competitions = fake_data
+    etag = client.get("/points").headers["ETag"]
+    server.store.set_competition_date(
+        competitions[0], datetime.today() + timedelta(days=1)
+    )
+    client.post("/showSummary", data={"email": clubs[0].email})
+    client.post(
+        "/purchasePlaces",
+        data={"competition": competitions[0].name, "places": 2},
+    )
+
+    response = client.get("/points", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.cache_control.private
+
+
+def test_book_etag_follows_its_competition(client, fake_data):
+    clubs, competitions = fake_data
+    other = Competition(
+        name="Fall Classic",
+        date=datetime.today() + timedelta(days=2),
+        number_of_places=13,
+    )
+    server.store.add_competition(other)
+    server.store.set_competition_date(
+        competitions[0], datetime.today() + timedelta(days=1)
+    )
+    client.post("/showSummary", data={"email": clubs[0].email})
+    etag = client.get("/book/Fall Classic").headers["ETag"]
+
+    client.post(
+        "/purchasePlaces",
+        data={"competition": competitions[0].name, "places": 2},
+        follow_redirects=True,
+    )
+    response = client.get(
+        "/book/Fall Classic", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+    client.post(
+        "/purchasePlaces", data={"competition": "Fall Classic", "places": 1},
+        follow_redirects=True,
+    )
+    response = client.get(
+        "/book/Fall Classic", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert "Places available: 12" in response.data.decode()
+
+
+def test_summary_with_flashes_is_not_conditional(client, fake_data):
+    clubs, _ = fake_data
+    client.post("/showSummary", data={"email": clubs[0].email})
+    etag = client.get("/showSummary").headers["ETag"]
+
+    with client.session_transaction() as session:
+        session["_flashes"] = [("message", "Great-booking complete!")]
+    response = client.get("/showSummary", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert "Great-booking complete!" in response.data.decode()
+    assert "ETag" not in response.headers
+
+
+def test_points_paginated(client, fake_data):
+    for name in ["Iron Temple", "Boulder Crew"]:
+        server.store.add_club(
+            Club(name=name, email=f"{name[:4]}@gudlft.com", points=4)
+        )
+    data = client.get("/points?limit=2").data.decode()
+    assert "<td>Boulder Crew</td>" in data
+    assert "<td>Iron Temple</td>" in data
+    assert "<td>Simply Lift</td>" not in data
+    assert "/points?after=Iron+Temple&amp;limit=2" in data
+
+    data = client.get("/points?after=Iron+Temple&limit=2").data.decode()
+    assert "<td>Simply Lift</td>" in data
+    assert "<td>Iron Temple</td>" not in data
+    assert "Next" not in data
+
+
+def test_summary_paginated(client, fake_data):
+    clubs, _ = fake_data
+    server.store.add_competition(
+        Competition(name="Fall Classic",
+                    date=datetime.today() + timedelta(days=2),
+                    number_of_places=13)
+    )
+    client.post("/showSummary", data={"email": clubs[0].email})
+    data = client.get("/showSummary?limit=1").data.decode()
+    assert "Fall Classic" in data
+    assert "Spring Festival" not in data
+    assert "/showSummary?after=Fall+Classic&amp;limit=1" in data
+
+    data = client.get("/showSummary?after=Fall+Classic&limit=1").data.decode()
+    assert "Spring Festival" in data
+    assert "Fall Classic" not in data
+
+
+@pytest.fixture
+def streaming_client(client):
+    app.config["STREAM_PAGES"] = True
+    yield client
+    app.config["STREAM_PAGES"] = False
+
+
+def test_points_streamed(streaming_client, fake_data):
+    response = streaming_client.get("/points")
+    assert response.is_streamed
+    assert "<td>Simply Lift</td>" in response.data.decode()
+
+
+def test_summary_streamed_shows_flashes_once(streaming_client, fake_data):
+    clubs, competitions = fake_data
+    streaming_client.post("/showSummary", data={"email": clubs[0].email})
+    with streaming_client.session_transaction() as session:
+        session["_flashes"] = [("message", "Great-booking complete!")]
+
+    response = streaming_client.get("/showSummary")
+    assert response.is_streamed
+    data = response.data.decode()
+    assert "Great-booking complete!" in data
+    assert competitions[0].name in data
+    response = streaming_client.get("/showSummary")
+    assert "Great-booking complete!" not in response.data.decode()
+
+
+def test_api_competitions(client, fake_data):
+    _, competitions = fake_data
+    response = client.get("/api/competitions")
+    assert response.mimetype == "application/json"
+    assert response.json["competitions"] == [{
+        "name": "Spring Festival",
+        "date": "2024-10-22 13:00:00",
+        "places": 25,
+        "upcoming": False,
+    }]
+    assert response.json["next"] is None
+
+
+def test_api_competitions_fields_and_cursor(client, fake_data):
+    server.store.add_competition(
+        Competition(name="Fall Classic",
+                    date=datetime.today() + timedelta(days=2),
+                    number_of_places=13)
+    )
+    response = client.get("/api/competitions?fields=name,places&limit=1")
+    assert response.json["competitions"] == [
+        {"name": "Fall Classic", "places": 13}
+    ]
+    assert response.json["next"] == "Fall Classic"
+    response = client.get("/api/competitions?fields=name&after=Fall+Classic")
+    assert response.json["competitions"] == [{"name": "Spring Festival"}]
+    assert client.get("/api/competitions?fields=email").status_code == 400
+
+
+def test_api_competition(client, fake_data):
+    response = client.get("/api/competitions/Spring Festival?fields=places")
+    assert response.json == {"places": 25}
+    response = client.get(
+        "/api/competitions/Spring Festival?fields=places",
+        headers={"If-None-Match": response.headers["ETag"]},
+    )
+    assert response.status_code == 304
+    assert client.get("/api/competitions/Unknown").status_code == 404
+
+
+def test_api_points_since(client, fake_data):
+    clubs, competitions = fake_data
+    server.store.add_club(
+        Club(name="Iron Temple", email="admin@irontemple.com", points=4)
+    )
+    response = client.get("/api/points")
+    assert response.json["clubs"] == [
+        {"name": "Iron Temple", "points": 4},
+        {"name": "Simply Lift", "points": 20},
+    ]
+    version = response.json["version"]
+
+    server.store.set_competition_date(
+        competitions[0], datetime.today() + timedelta(days=1)
+    )
+    client.post("/showSummary", data={"email": clubs[0].email})
+    client.post(
+        "/purchasePlaces",
+        data={"competition": competitions[0].name, "places": 2},
+    )
+    response = client.get(f"/api/points?since={version}")
+    assert response.json["full"] is False
+    assert response.json["clubs"] == [{"name": "Simply Lift", "points": 18}]
+    response = client.get(f"/api/competitions?since={version}&fields=places")
+    assert response.json["competitions"] == [{"places": 23}]
+
+    response = client.get("/api/points?since=other-1")
+    assert response.json["full"] is True
+    assert len(response.json["clubs"]) == 2
+
+
+@pytest.fixture
+def season(client, fake_data):
+    clubs, competitions = fake_data
+    server.store.set_competition_date(
+        competitions[0], datetime.today() + timedelta(days=1)
+    )
+    server.store.add_competition(
+        Competition(name="Fall Classic",
+                    date=datetime.today() + timedelta(days=2),
+                    number_of_places=13)
+    )
+    client.post("/showSummary", data={"email": clubs[0].email})
+    return clubs[0]
+
+
+def test_purchase_batch(client, season):
+    response = client.post("/purchasePlaces/batch", json={"bookings": [
+        {"competition": "Spring Festival", "places": 3},
+        {"competition": "Fall Classic", "places": 5},
+    ]})
+    assert response.status_code == 200
+    assert response.json == {"booked": True, "errors": []}
+    assert season.points == 12
+    assert season.bookings == {"Spring Festival": 3, "Fall Classic": 5}
+    assert [b.competition for _, b in server.journal.records()] == [
+        "Spring Festival", "Fall Classic"
+    ]
+
+
+def test_purchase_batch_all_or_nothing(client, season):
+    response = client.post("/purchasePlaces/batch", json={"bookings": [
+        {"competition": "Spring Festival", "places": 10},
+        {"competition": "Spring Festival", "places": 3},
+        {"competition": "Fall Classic", "places": 12},
+    ]})
+    assert response.status_code == 409
+    assert response.json["errors"] == [
+        {"line": 1, "error": "You have already 10 athletes registered for "
+                             "this competition. You can only register 2 "
+                             "more athletes."},
+        {"line": 2, "error": "You have only 10 points available"},
+    ]
+    assert season.points == 20
+    assert season.bookings == {}
+    fall_classic = server.store.competition_by_name("Fall Classic")
+    assert fall_classic.number_of_places == 13
+    assert list(server.journal.records()) == []
+
+
+def test_purchase_batch_unknown_competition(client, season):
+    response = client.post("/purchasePlaces/batch", json={"bookings": [
+        {"competition": "Spring Festival", "places": 1},
+        {"competition": "Unknown", "places": 1},
+    ]})
+    assert response.status_code == 409
+    assert response.json["errors"] == [
+        {"line": 1, "error": "This competition is not registered"}
+    ]
+    assert season.points == 20
+
+
+def test_purchase_batch_past_competition(client, season):
+    server.store.add_competition(
+        Competition(name="Last Winter",
+                    date=datetime.today() - timedelta(days=90),
+                    number_of_places=13)
+    )
+    response = client.post("/purchasePlaces/batch", json={"bookings": [
+        {"competition": "Last Winter", "places": 1},
+        {"competition": "Fall Classic", "places": 1},
+    ]})
+    assert response.status_code == 409
+    assert response.json["errors"] == [
+        {"line": 0, "error": "This competition has already taken place"}
+    ]
+    assert season.points == 20
+    last_winter = server.store.competition_by_name("Last Winter")
+    assert last_winter.number_of_places == 13
+
+
+def test_purchase_batch_requires_login(client, fake_data):
+    response = client.post("/purchasePlaces/batch", json={"bookings": []})
+    assert response.status_code == 401
+
+
+def test_sold_out_answered_without_booking(client, fake_data, mocker):
+    clubs, competitions = fake_data
+    competitions[0].number_of_places = 0
+    check_and_book = mocker.spy(server, "check_and_book")
+    client.post("/showSummary", data={"email": clubs[0].email})
+    response = client.post(
+        "/purchasePlaces",
+        data={"competition": competitions[0].name, "places": 1},
+    )
+    assert "This competition is sold out" in response.data.decode()
+    check_and_book.assert_not_called()
+    assert clubs[0].points == 20
+
+
+def test_full_queue_sheds_with_503(client, fake_data, mocker):
+    clubs, competitions = fake_data
+    mocker.patch("server.competition_locks", AdmissionQueue(max_depth=0))
+    client.post("/showSummary", data={"email": clubs[0].email})
+    response = client.post(
+        "/purchasePlaces",
+        data={"competition": competitions[0].name, "places": 1},
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert clubs[0].points == 20
+
+    stats = client.get("/api/queues").json
+    assert stats["shed"] == 1
+
+
+def test_metrics(client, fake_data):
+    clubs, competitions = fake_data
+    booked = server.bookings_total.value()
+    refused = server.rejections.value("points")
+    with client.session_transaction() as session:
+        session["club"] = clubs[0].name
+
+    client.post("/purchasePlaces",
+                data={"competition": competitions[0].name, "places": 2})
+    clubs[0].points = 1
+    client.post("/purchasePlaces",
+                data={"competition": competitions[0].name, "places": 2})
+
+    assert server.bookings_total.value() == booked + 1
+    assert server.rejections.value("points") == refused + 1
+    assert server.phase_seconds.count("purchase_places", "persist") > 0
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    text = response.data.decode()
+    assert 'gudlft_booking_rejections_total{reason="points"}' in text
+    assert ('gudlft_request_seconds_count{endpoint="purchase_places",'
+            'status="302"}') in text
+    assert "gudlft_journal_written_bytes_total 74" in text
+
+
+@pytest.fixture
+def leaderboard(fake_data):
+    clubs, competitions = fake_data
+    for club in [
+        Club(name="Iron Temple", email="admin@irontemple.com", points=4),
+        Club(name="She Lifts", email="kate@shelifts.co.uk", points=12),
+    ]:
+        server.store.add_club(club)
+    return clubs, competitions
+
+
+def test_points_sorted_by_points(client, leaderboard):
+    response = client.get("/points?sort=points&limit=2")
+    data = response.data.decode()
+    assert data.index("Simply Lift") < data.index("She Lifts")
+    assert "Iron Temple" not in data
+    assert "<td>2</td>" in data
+    assert "after=She+Lifts" in data and "sort=points" in data
+
+    response = client.get("/points?sort=points&limit=2&after=She+Lifts")
+    assert "<td>Iron Temple</td>" in response.data.decode()
+
+
+def test_booking_updates_rank(client, leaderboard):
+    clubs, competitions = leaderboard
+    with client.session_transaction() as session:
+        session["club"] = clubs[0].name
+    client.post("/purchasePlaces",
+                data={"competition": competitions[0].name, "places": 10})
+
+    response = client.get("/api/points?sort=points")
+    assert response.json["clubs"] == [
+        {"name": "She Lifts", "points": 12, "rank": 1},
+        {"name": "Simply Lift", "points": 10, "rank": 2},
+        {"name": "Iron Temple", "points": 4, "rank": 3},
+    ]
+    assert client.get("/api/points/Simply Lift").json == {
+        "name": "Simply Lift", "points": 10, "rank": 2,
+    }
+    assert client.get("/api/points/Unknown").status_code == 404
+    response = client.get("/showSummary", follow_redirects=True)
+    assert "Rank: 2" in response.data.decode()
+
+
+def test_api_search(client, fake_data):
+    server.store.add_competition(Competition(
+        name="Spring Classic", date=datetime(2100, 3, 1, 10, 0),
+        number_of_places=5,
+    ))
+    response = client.get("/api/search?q=spr")
+    assert response.json["clubs"] == []
+    assert [c["name"] for c in response.json["competitions"]] == [
+        "Spring Classic", "Spring Festival",
+    ]
+    response = client.get("/api/search?q=SPR&upcoming=1&type=competitions")
+    assert response.json == {"competitions": [{
+        "name": "Spring Classic", "date": "2100-03-01 10:00:00",
+        "places": 5, "upcoming": True,
+    }]}
+    response = client.get("/api/search?q=simply&type=clubs&limit=1")
+    assert response.json == {"clubs": [{"name": "Simply Lift", "points": 20}]}
+    assert client.get("/api/search?type=other").status_code == 400
+
+
+@pytest.fixture
+def compressing(mocker):
+    mocker.patch.dict(app.config, {"COMPRESS_MIN_SIZE": 0})
+
+
+@pytest.mark.parametrize("encoding, decompress", [
+    ("br", brotli.decompress), ("gzip", gzip.decompress),
+])
+def test_points_compressed(client, fake_data, compressing, encoding,
+                           decompress):
+    plain = client.get("/points")
+    response = client.get("/points", headers={"Accept-Encoding": encoding})
+    assert response.content_encoding == encoding
+    assert "Accept-Encoding" in response.vary
+    assert decompress(response.data) == plain.data
+    assert response.headers["ETag"] == (
+        plain.headers["ETag"][:-1] + f'-{encoding}"'
+    )
+
+    response = client.get("/points", headers={
+        "Accept-Encoding": encoding,
+        "If-None-Match": response.headers["ETag"],
+    })
+    assert response.status_code == 304
+    assert response.headers["ETag"].endswith(f'-{encoding}"')
+
+
+def test_compression_negotiated(client, fake_data, compressing):
+    response = client.get("/points", headers={"Accept-Encoding": "gzip, br"})
+    assert response.content_encoding == "br"
+    response = client.get("/points",
+                          headers={"Accept-Encoding": "br;q=0.5, gzip"})
+    assert response.content_encoding == "gzip"
+    response = client.get("/points", headers={"Accept-Encoding": "identity"})
+    assert response.content_encoding is None
+    assert "<td>Simply Lift</td>" in response.data.decode()
+
+
+def test_small_bodies_not_compressed(client, fake_data, mocker):
+    mocker.patch.dict(app.config, {"COMPRESS_MIN_SIZE": 1_000_000})
+    response = client.get("/points", headers={"Accept-Encoding": "br"})
+    assert response.content_encoding is None
+    assert "Accept-Encoding" in response.vary
+    response = client.get("/api/competitions",
+                          headers={"Accept-Encoding": "br"})
+    assert response.json["competitions"][0]["name"] == "Spring Festival"
+
+
+def test_uncached_pages_compressed(client, fake_data, compressing):
+    clubs, _ = fake_data
+    response = client.post("/showSummary", data={"email": clubs[0].email},
+                           headers={"Accept-Encoding": "gzip"})
+    assert response.content_encoding == "gzip"
+    assert "Welcome" in gzip.decompress(response.data).decode()
+
+
+def test_compressed_once_per_version(cached_client, fake_data, compressing,
+                                     mocker):
+    compress = mocker.patch("server.compress", wraps=server.compress)
+    for _ in range(3):
+        response = cached_client.get("/api/competitions",
+                                     headers={"Accept-Encoding": "br"})
+        assert brotli.decompress(response.data).startswith(b"{")
+    assert compress.call_count == 1
+    server.store.touch(fake_data[1][0])
+    cached_client.get("/api/competitions", headers={"Accept-Encoding": "br"})
+    assert compress.call_count == 2
@@ -0,0 +1,77 @@
+"""A season of bookings in one batch request against sequential requests
+
+"sequential" posts one /purchasePlaces per competition, "batch" posts them
+all to /purchasePlaces/batch. Both run with each durability mode.
+
+Run with ``python -m tests.performance.bench_batch [competitions]``.
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import server
+from journal import BookingJournal
+from models import Club, Competition
+from persistence import PersistenceWriter
+from repository import Repository
+
+DEFAULT_COUNT = 20
+MODES = ["sync", "group"]
+
+
+def setup(directory, mode, count):
+    start = datetime.today() + timedelta(days=1)
+    competitions = [
+        Competition(name=f"Competition {i}", date=start + timedelta(days=i),
+                    number_of_places=20)
+        for i in range(count)
+    ]
+    club = Club(name="Simply Lift", email="john@simplylift.co",
+                points=2 * count)
+    server.store = Repository([club], competitions)
+    server.clubs = server.store.clubs
+    server.competitions = server.store.competitions
+    server.journal = BookingJournal(os.path.join(directory, f"{mode}.journal"))
+    server.persistence = PersistenceWriter(server.journal, server.compact,
+                                           mode=mode)
+    client = server.app.test_client()
+    client.post("/showSummary", data={"email": club.email})
+    return client, competitions
+
+
+def sequential(client, competitions):
+    for competition in competitions:
+        client.post("/purchasePlaces",
+                    data={"competition": competition.name, "places": 2})
+
+
+def batch(client, competitions):
+    response = client.post("/purchasePlaces/batch", json={"bookings": [
+        {"competition": competition.name, "places": 2}
+        for competition in competitions
+    ]})
+    assert response.json["booked"], response.json
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT
+    print(f"{count} competitions")
+    print(f"{'mode':>6} {'sequential (ms)':>16} {'batch (ms)':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in MODES:
+            timings = []
+            for book in (sequential, batch):
+                client, competitions = setup(directory, mode, count)
+                started = time.perf_counter()
+                book(client, competitions)
+                timings.append((time.perf_counter() - started) * 1e3)
+                server.persistence.close()
+                server.journal.close()
+                os.remove(server.journal.path)
+            print(f"{mode:>6} {timings[0]:16.1f} {timings[1]:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
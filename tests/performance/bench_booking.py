@@ -0,0 +1,53 @@
+"""Booking latency with the journal against rewriting the JSON snapshots
+
+Run with ``python -m tests.performance.bench_booking``.
+"""
+import json
+import os
+import tempfile
+import time
+
+from journal import BookingJournal
+from models import Booking
+
+SIZES = [10, 1_000, 10_000, 100_000]
+BOOKINGS = 50
+
+
+def make_clubs(size):
+    return [
+        {"name": f"Club {i}", "email": f"club{i}@gudlft.com",
+         "points": "10", "bookings": []}
+        for i in range(size)
+    ]
+
+
+def rewrite_booking(clubs, path):
+    with open(path, "w") as c:
+        json.dump({"clubs": clubs}, c, indent=4)
+
+
+def per_booking_ms(book):
+    start = time.perf_counter()
+    for _ in range(BOOKINGS):
+        book()
+    return (time.perf_counter() - start) / BOOKINGS * 1e3
+
+
+def main():
+    print(f"{'clubs':>8} {'journal (ms)':>14} {'rewrite (ms)':>14}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in SIZES:
+            clubs = make_clubs(size)
+            journal = BookingJournal(os.path.join(directory, f"{size}.journal"))
+            appended = per_booking_ms(
+                lambda: journal.append(Booking("Club 0", "Spring Festival", 1))
+            )
+            journal.close()
+            path = os.path.join(directory, f"{size}.json")
+            rewritten = per_booking_ms(lambda: rewrite_booking(clubs, path))
+            print(f"{size:>8} {appended:14.4f} {rewritten:14.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Bytes on the wire and CPU per request, with and without compression
+
+Each page is requested with no Accept-Encoding, with gzip and with br.
+"cached" serves it from the render cache, which holds the compressed
+variants, so a page is only compressed once. "uncached" renders and
+compresses it on every request, as a page changing at each request would
+be. The CPU time is the process time of each request, the first request,
+which fills the cache, excluded.
+
+Run with ``python -m tests.performance.bench_compression [clubs]``.
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+import server
+from models import Club, Competition
+from repository import Repository
+
+DEFAULT_COUNT = 10_000
+REQUESTS = 50
+PAGES = [
+    "/points",
+    "/points?limit=100",
+    "/api/points?limit=1000",
+    "/api/competitions",
+]
+ENCODINGS = [None, "gzip", "br"]
+
+
+def setup(count):
+    clubs = [
+        Club(name=f"Club {i}", email=f"club{i}@gudlft.com", points=i % 100)
+        for i in range(count)
+    ]
+    start = datetime.today() - timedelta(days=50)
+    competitions = [
+        Competition(name=f"Competition {i}", date=start + timedelta(days=i),
+                    number_of_places=i % 30)
+        for i in range(100)
+    ]
+    server.store = Repository(clubs, competitions)
+    server.clubs = server.store.clubs
+    server.competitions = server.store.competitions
+
+
+def measure(client, path, encoding):
+    headers = {"Accept-Encoding": encoding} if encoding else {}
+    size = len(client.get(path, headers=headers).data)
+    started = time.process_time()
+    for _ in range(REQUESTS):
+        client.get(path, headers=headers)
+    return size, (time.process_time() - started) / REQUESTS
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT
+    setup(count)
+    client = server.app.test_client()
+    print(f"{count} clubs, compressed above "
+          f"{server.app.config['COMPRESS_MIN_SIZE']} bytes")
+    print(f"{'page':>24} {'encoding':>8} {'size':>10} {'cached':>10} "
+          f"{'uncached':>10}")
+    for path in PAGES:
+        for encoding in ENCODINGS:
+            server.app.config["RENDER_CACHE"] = True
+            size, cached = measure(client, path, encoding)
+            server.app.config["RENDER_CACHE"] = False
+            _, uncached = measure(client, path, encoding)
+            print(f"{path:>24} {encoding or 'identity':>8} "
+                  f"{size / 2**10:6.1f} KiB {cached * 1e3:7.2f} ms "
+                  f"{uncached * 1e3:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Import time of ``server`` with and without the binary snapshot
+
+``server`` is imported in a fresh interpreter, in a directory holding
+JSON snapshots of many clubs. It is imported once with the JSON files only,
+then once the binary snapshot has been built from them.
+
+Run with ``python -m tests.performance.bench_import [count]``.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+DEFAULT_COUNT = 1_000_000
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)
+)))
+
+IMPORT = """
+import time
+started = time.perf_counter()
+import server
+print(time.perf_counter() - started)
+"""
+
+
+def write_json(directory, count):
+    clubs = [
+        {"name": f"Club {i}", "email": f"club{i}@gudlft.com",
+         "points": str(i % 100), "bookings": [{"Spring Festival": 2}]}
+        for i in range(count)
+    ]
+    with open(os.path.join(directory, "clubs.json"), "w") as c:
+        json.dump({"clubs": clubs, "journalSeq": 0}, c, indent=4)
+    with open(os.path.join(directory, "competitions.json"), "w") as c:
+        json.dump({"competitions": [
+            {"name": "Spring Festival", "date": "2020-03-27 10:00:00",
+             "numberOfPlaces": "25"}
+        ], "journalSeq": 0}, c, indent=4)
+
+
+def run(args, directory):
+    environment = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.run(
+        [sys.executable] + args, cwd=directory, env=environment, check=True,
+        capture_output=True, text=True,
+    ).stdout
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT
+    with tempfile.TemporaryDirectory() as directory:
+        write_json(directory, count)
+        without = float(run(["-c", IMPORT], directory))
+        run(["-m", "snapshot"], directory)
+        size = os.path.getsize(os.path.join(directory, "gudlft.snapshot"))
+        with_snapshot = float(run(["-c", IMPORT], directory))
+    print(f"{count} clubs")
+    print(f"json:            {without:8.2f} s")
+    print(f"binary snapshot: {with_snapshot:8.2f} s "
+          f"({size / 2**20:.0f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Top clubs by points and a club's rank, indexed against sorting
+
+"sort" sorts every club by points per request, as a "most points" view
+would without the index. "indexed" slices the leaderboard, and "rank"
+bisects it. "booking" is the cost of moving a club whose points changed,
+paid once per booking. "/points" is a whole request for the top clubs.
+
+Run with ``python -m tests.performance.bench_leaderboard [count]``.
+"""
+import random
+import sys
+import time
+import timeit
+
+import server
+from models import Club
+from repository import Repository
+
+DEFAULT_COUNT = 1_000_000
+TOP = 10
+
+
+def per_call_us(function, number):
+    seconds = min(timeit.repeat(function, number=number, repeat=3))
+    return seconds / number * 1e6
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT
+    rng = random.Random(0)
+    clubs = [
+        Club(name=f"Club {i}", email=f"club{i}@gudlft.com",
+             points=rng.randrange(1000))
+        for i in range(count)
+    ]
+    started = time.perf_counter()
+    repository = Repository(clubs, [])
+    built = time.perf_counter() - started
+    club = clubs[count // 2]
+
+    def sort():
+        return sorted(clubs, key=lambda c: (-c.points, c.name))[:TOP]
+
+    def booking():
+        club.points = rng.randrange(1000)
+        repository.touch(club=club)
+
+    assert [c for _, c in repository.leaderboard(limit=TOP)] == sort()
+    server.store = repository
+    server.clubs = repository.clubs
+    server.app.config["RENDER_CACHE"] = False
+    client = server.app.test_client()
+
+    def request():
+        response = client.get(f"/points?sort=points&limit={TOP}")
+        assert response.status_code == 200
+
+    print(f"{count} clubs, top {TOP}, index built in {built:.2f} s")
+    print(f"{'sort':>10} {per_call_us(sort, 1) / 1e3:12.1f} ms")
+    print(f"{'indexed':>10} "
+          f"{per_call_us(lambda: repository.leaderboard(limit=TOP), 1000):12.1f}"
+          f" us")
+    print(f"{'rank':>10} "
+          f"{per_call_us(lambda: repository.rank(club), 10000):12.2f} us")
+    print(f"{'booking':>10} {per_call_us(booking, 10000):12.2f} us")
+    print(f"{'/points':>10} {per_call_us(request, 100):12.1f} us")
+
+
+if __name__ == "__main__":
+    main()
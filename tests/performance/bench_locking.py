@@ -0,0 +1,91 @@
+"""Concurrent booking throughput, per-competition locks against a global lock
+
+Every thread books one place at a time in its own competition until it is
+sold out, then the number of places left is checked for oversell.
+
+Run with ``python -m tests.performance.bench_locking``.
+"""
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import server
+from journal import BookingJournal
+from locks import KeyedLocks
+from models import Club, Competition
+from persistence import PersistenceWriter
+from repository import Repository
+
+THREADS = [1, 4, 16, 64]
+PLACES = 2_000
+
+
+class GlobalLock:
+    """Same interface as KeyedLocks, a single lock for every key"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def hold(self, key):
+        with self._lock:
+            yield
+
+
+def run(thread_count, competition_locks, club_locks, directory):
+    clubs = [
+        Club(name=f"Club {i}", email=f"club{i}@gudlft.com", points=PLACES)
+        for i in range(thread_count)
+    ]
+    competitions = [
+        Competition(name=f"Competition {i}", date=datetime(2030, 1, 1, 10),
+                    number_of_places=PLACES)
+        for i in range(thread_count)
+    ]
+    journal = BookingJournal(
+        os.path.join(directory, f"{thread_count}.journal"),
+        compact_every=float("inf"),
+    )
+    server.store = Repository(clubs, competitions)
+    server.journal = journal
+    server.persistence = PersistenceWriter(journal, None, mode="async")
+    server.competition_locks = competition_locks
+    server.club_locks = club_locks
+    start = threading.Barrier(thread_count + 1)
+
+    def book(club, competition):
+        start.wait()
+        # The club is allowed 12 places per competition, reset its bookings
+        while server.check_and_book(club, competition, 1) is None:
+            club.bookings.clear()
+
+    threads = [threading.Thread(target=book, args=pair)
+               for pair in zip(clubs, competitions)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    server.persistence.close()
+    assert all(c.number_of_places == 0 for c in competitions), "oversell"
+    return thread_count * PLACES / elapsed
+
+
+def main():
+    print(f"{'threads':>8} {'per-key (bookings/s)':>22} "
+          f"{'global (bookings/s)':>21}")
+    with tempfile.TemporaryDirectory() as directory:
+        for thread_count in THREADS:
+            keyed = run(thread_count, KeyedLocks(), KeyedLocks(), directory)
+            single = GlobalLock()
+            global_ = run(thread_count, single, single, directory)
+            print(f"{thread_count:>8} {keyed:22.0f} {global_:21.0f}")
+
+
+if __name__ == "__main__":
+    main()
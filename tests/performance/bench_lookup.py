@@ -0,0 +1,52 @@
+"""Lookup latency of the indexed repository against the former linear scan
+
+Run with ``python -m tests.performance.bench_lookup``.
+"""
+import timeit
+
+from models import Club
+from repository import Repository
+
+SIZES = [10, 100, 1_000, 10_000, 100_000, 1_000_000]
+# Linear scans over 1M records take seconds per call, keep them bounded
+LINEAR_MAX_SIZE = 100_000
+LOOKUPS = 10_000
+
+
+def make_clubs(size):
+    return [
+        Club(name=f"Club {i}", email=f"club{i}@gudlft.com", points=10)
+        for i in range(size)
+    ]
+
+
+def linear_find_club_by_email(clubs, email):
+    return next((c for c in clubs if c.email == email), None)
+
+
+def per_call_us(statement, number):
+    seconds = min(timeit.repeat(statement, number=number, repeat=3))
+    return seconds / number * 1e6
+
+
+def main():
+    print(f"{'records':>10} {'indexed (us)':>14} {'linear (us)':>14}")
+    for size in SIZES:
+        clubs = make_clubs(size)
+        repository = Repository(clubs, [])
+        # Worst case for the linear scan: the last club of the list
+        email = clubs[-1].email
+        indexed = per_call_us(lambda: repository.club_by_email(email), LOOKUPS)
+        if size <= LINEAR_MAX_SIZE:
+            number = max(1, LOOKUPS * 10 // size)
+            linear = per_call_us(
+                lambda: linear_find_club_by_email(clubs, email), number
+            )
+            linear = f"{linear:14.2f}"
+        else:
+            linear = f"{'-':>14}"
+        print(f"{size:>10} {indexed:14.3f} {linear}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Memory footprint of the club models against the former JSON dicts
+
+Run with ``python -m tests.performance.bench_models [count]``.
+"""
+import sys
+import tracemalloc
+
+from models import Club
+
+DEFAULT_COUNT = 1_000_000
+
+
+def make_dicts(count):
+    return [
+        {"name": f"Club {i}", "email": f"club{i}@gudlft.com",
+         "points": str(i % 100), "bookings": [{"Spring Festival": 2}]}
+        for i in range(count)
+    ]
+
+
+def make_models(count):
+    return [
+        Club(name=f"Club {i}", email=f"club{i}@gudlft.com", points=i % 100,
+             bookings={"Spring Festival": 2})
+        for i in range(count)
+    ]
+
+
+def measure(build, count):
+    tracemalloc.start()
+    records = build(count)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT
+    dicts = measure(make_dicts, count)
+    models = measure(make_models, count)
+    print(f"{count} clubs")
+    print(f"{'dicts':>8} {dicts / 2**20:10.1f} MiB {dicts / count:8.1f} B/club")
+    print(f"{'models':>8} {models / 2**20:10.1f} MiB "
+          f"{models / count:8.1f} B/club")
+
+
+if __name__ == "__main__":
+    main()
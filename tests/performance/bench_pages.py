@@ -0,0 +1,81 @@
+"""Time to first byte and peak memory of /points with many clubs
+
+"full" renders the whole page before sending it, "stream" sends it while
+it is rendered and "page" only renders the first page of a paginated
+listing. Each mode runs in its own process, so the peak resident memory
+it reports is its own.
+
+Run with ``python -m tests.performance.bench_pages [count]``.
+"""
+import multiprocessing
+import resource
+import sys
+import time
+
+import server
+from models import Club
+from repository import Repository
+
+DEFAULT_COUNT = 100_000
+PAGE_SIZE = 100
+
+MODES = {
+    "full": ("/points", False),
+    "stream": ("/points", True),
+    "page": (f"/points?limit={PAGE_SIZE}", False),
+}
+
+
+def make_clubs(count):
+    return [
+        Club(name=f"Club {i}", email=f"club{i}@gudlft.com", points=i % 100)
+        for i in range(count)
+    ]
+
+
+def peak_rss():
+    # In KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(mode, count, results):
+    url, stream = MODES[mode]
+    clubs = make_clubs(count)
+    server.store = Repository(clubs, [])
+    server.clubs = clubs
+    server.app.config["RENDER_CACHE"] = False
+    server.app.config["STREAM_PAGES"] = stream
+    client = server.app.test_client()
+    baseline = peak_rss()
+
+    started = time.perf_counter()
+    response = client.get(url, buffered=False)
+    chunks = iter(response.response)
+    size = len(next(chunks))
+    first_byte = time.perf_counter() - started
+    for chunk in chunks:
+        size += len(chunk)
+    total = time.perf_counter() - started
+    response.close()
+    results[mode] = (first_byte, total, size, peak_rss() - baseline)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT
+    results = multiprocessing.Manager().dict()
+    for mode in MODES:
+        process = multiprocessing.Process(
+            target=measure, args=(mode, count, results)
+        )
+        process.start()
+        process.join()
+
+    print(f"{count} clubs")
+    print(f"{'mode':>8} {'ttfb':>10} {'total':>10} {'size':>10} {'rss':>10}")
+    for mode, (first_byte, total, size, rss) in results.items():
+        print(f"{mode:>8} {first_byte * 1e3:7.1f} ms {total * 1e3:7.1f} ms "
+              f"{size / 2**10:6.0f} KiB {rss / 2**10:6.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
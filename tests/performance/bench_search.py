@@ -0,0 +1,97 @@
+"""Prefix search over competition names, indexed against a linear scan
+
+1M competitions are named from random words, a tenth of them sold out.
+Each prefix is searched for 10 results with the sorted name index, then
+restricted to the upcoming competitions with places left, and with a scan
+of every competition as filtering the list did. "/api/search" is a whole
+request, without the render cache.
+
+Run with ``python -m tests.performance.bench_search [count]``.
+"""
+import random
+import sys
+import time
+import timeit
+from datetime import datetime, timedelta
+
+import server
+from models import Competition
+from repository import Repository
+
+DEFAULT_COUNT = 1_000_000
+LIMIT = 10
+PREFIXES = ["s", "spr", "spring fe", "zzz"]
+WORDS = ["Spring", "Summer", "Fall", "Winter", "Open", "Classic", "Cup",
+         "Festival", "Trophy", "Masters", "Regional", "National"]
+
+
+def per_call_us(function, number):
+    seconds = min(timeit.repeat(function, number=number, repeat=3))
+    return seconds / number * 1e6
+
+
+def make_competitions(count):
+    rng = random.Random(0)
+    # Half of them past
+    start = datetime.today() - timedelta(minutes=5 * count)
+    return [
+        Competition(
+            name=f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}",
+            date=start + timedelta(minutes=10 * i),
+            number_of_places=0 if rng.random() < 0.1 else 20,
+        )
+        for i in range(count)
+    ]
+
+
+def scan(competitions, prefix, now):
+    prefix = prefix.casefold()
+    found = sorted(
+        (c for c in competitions
+         if c.name.casefold().startswith(prefix)
+         and c.date >= now and c.number_of_places > 0),
+        key=lambda c: c.name.casefold(),
+    )
+    return found[:LIMIT]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT
+    competitions = make_competitions(count)
+    started = time.perf_counter()
+    repository = Repository([], competitions)
+    built = time.perf_counter() - started
+
+    server.store = repository
+    server.competitions = repository.competitions
+    server.app.config["RENDER_CACHE"] = False
+    client = server.app.test_client()
+
+    print(f"{count} competitions, indexes built in {built:.2f} s")
+    print(f"{'prefix':>10} {'index (us)':>12} {'filtered (us)':>14} "
+          f"{'/api/search (us)':>17} {'scan (ms)':>10}")
+    for prefix in PREFIXES:
+        indexed = per_call_us(
+            lambda: repository.search_competitions(prefix, LIMIT), 1000
+        )
+        # Searches are made at the current time, which only moves forward
+        filtered = per_call_us(
+            lambda: repository.search_competitions(
+                prefix, LIMIT, datetime.today(), available=True
+            ),
+            1000,
+        )
+        url = (f"/api/search?q={prefix}&type=competitions&upcoming=1"
+               f"&available=1&limit={LIMIT}")
+        request = per_call_us(lambda: client.get(url), 100)
+        now = datetime.today()
+        assert repository.search_competitions(
+            prefix, LIMIT, now, available=True
+        ) == scan(competitions, prefix, now)
+        scanned = per_call_us(lambda: scan(competitions, prefix, now), 1)
+        print(f"{prefix!r:>10} {indexed:12.1f} {filtered:14.1f} "
+              f"{request:17.1f} {scanned / 1e3:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
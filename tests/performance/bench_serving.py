@@ -0,0 +1,131 @@
+"""Throughput and latency of the Flask dev server against serve.py
+
+Each server is started on the same generated dataset and loaded by client
+threads, each keeping one connection open, reading listings and booking
+pages for a fixed time:
+
+- "dev": ``flask run``, Flask's threaded development server.
+- "gevent": ``python -m serve``, one process.
+- "prefork": ``python -m serve --workers N`` on the SQLite storage.
+
+The client runs in this process, on the same machine, so the numbers
+compare the servers with each other rather than giving their capacity.
+For a full scenario, run the Locust scenarios against each server with
+``--host``.
+
+Run with ``python -m tests.performance.bench_serving [clients] [seconds]``.
+"""
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from tests.performance.generate import generate
+
+CLUBS = 10_000
+DEFAULT_CLIENTS = 50
+DEFAULT_SECONDS = 10
+PORT = 8765
+WORKERS = os.cpu_count() or 1
+PATHS = [
+    "/points?limit=100",
+    "/api/competitions?limit=100",
+    "/api/search?q=Competition+1",
+    "/",
+]
+
+SERVERS = {
+    "dev": (["-m", "flask", "--app", "server", "run", "--port", str(PORT)],
+            {}),
+    "gevent": (["-m", "serve", "--port", str(PORT)], {}),
+    "prefork": (["-m", "serve", "--port", str(PORT),
+                 "--workers", str(max(2, WORKERS))],
+                {"GUDLFT_STORAGE": "sqlite"}),
+}
+
+
+def wait_for_port(timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", PORT), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listens on port {PORT}")
+
+
+def client(index, deadline, latencies, errors):
+    connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=30)
+    request = index
+    while time.monotonic() < deadline:
+        path = PATHS[request % len(PATHS)]
+        request += 1
+        started = time.perf_counter()
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors.append(path)
+            connection.close()
+            continue
+        latencies.append(time.perf_counter() - started)
+        if response.status != 200:
+            errors.append(path)
+    connection.close()
+
+
+def measure(name, directory, clients, seconds):
+    args, env = SERVERS[name]
+    process = subprocess.Popen(
+        [sys.executable, *args], cwd=directory,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env=dict(os.environ, PYTHONPATH=os.getcwd(), **env),
+    )
+    try:
+        wait_for_port()
+        latencies = []
+        errors = []
+        deadline = time.monotonic() + seconds
+        threads = [
+            threading.Thread(target=client,
+                             args=(i, deadline, latencies, errors))
+            for i in range(clients)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        process.terminate()
+        process.wait()
+    latencies.sort()
+    return (len(latencies) / seconds,
+            latencies[len(latencies) // 2] if latencies else 0,
+            latencies[int(len(latencies) * 0.95)] if latencies else 0,
+            len(errors))
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CLIENTS
+    seconds = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_SECONDS
+    print(f"{CLUBS} clubs, {clients} clients for {seconds}s, "
+          f"{WORKERS} CPUs")
+    print(f"{'server':>8} {'req/s':>8} {'p50':>10} {'p95':>10} {'errors':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        generate(directory, clubs=CLUBS, competitions=CLUBS // 10,
+                 bookings=CLUBS)
+        for name in SERVERS:
+            rate, p50, p95, errors = measure(name, directory, clients,
+                                             seconds)
+            print(f"{name:>8} {rate:8.0f} {p50 * 1e3:7.1f} ms "
+                  f"{p95 * 1e3:7.1f} ms {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
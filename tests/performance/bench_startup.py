@@ -0,0 +1,85 @@
+"""Time and peak memory of loading a large clubs snapshot
+
+"json.load" parses the whole file before building the models, as the
+loader used to. "streaming" builds each model as its record is parsed.
+Each loader runs in its own process, so the peak resident memory it
+reports is its own.
+
+Run with ``python -m tests.performance.bench_startup [count]``.
+"""
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from loader import load_snapshot
+from models import Club
+
+DEFAULT_COUNT = 1_000_000
+
+
+def write_snapshot(path, count):
+    clubs = [
+        {"name": f"Club {i}", "email": f"club{i}@gudlft.com",
+         "points": str(i % 100), "bookings": [{"Spring Festival": 2}]}
+        for i in range(count)
+    ]
+    with open(path, "w") as snapshot:
+        json.dump({"clubs": clubs, "journalSeq": 0}, snapshot, indent=4)
+
+
+def json_load(path):
+    with open(path) as snapshot:
+        data = json.load(snapshot)
+    return [Club.from_dict(c) for c in data["clubs"]]
+
+
+def streaming(path):
+    clubs, _ = load_snapshot(path, "clubs", Club.from_dict)
+    return clubs
+
+
+LOADERS = {"json.load": json_load, "streaming": streaming}
+
+
+def measure(name, path, results):
+    # In KiB on Linux
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    clubs = LOADERS[name](path)
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    results[name] = (len(clubs), elapsed, peak)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT
+    results = multiprocessing.Manager().dict()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "clubs.json")
+        # In a child process, the loaders would otherwise inherit its peak
+        process = multiprocessing.Process(
+            target=write_snapshot, args=(path, count)
+        )
+        process.start()
+        process.join()
+        size = os.path.getsize(path)
+        for name in LOADERS:
+            process = multiprocessing.Process(
+                target=measure, args=(name, path, results)
+            )
+            process.start()
+            process.join()
+
+    print(f"{count} clubs, {size / 2**20:.0f} MiB")
+    print(f"{'loader':>10} {'time':>10} {'peak rss':>12}")
+    for name, (loaded, elapsed, peak) in results.items():
+        assert loaded == count
+        print(f"{name:>10} {elapsed:8.2f} s {peak / 2**10:8.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
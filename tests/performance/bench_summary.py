@@ -0,0 +1,91 @@
+"""Rendering of /showSummary with many competitions, before and after the
+date index
+
+"before" renders the former template, which ran ``strptime`` through the
+``is_past`` filter for every competition. "after" requests the current page,
+built from the date-sorted index.
+
+Run with ``python -m tests.performance.bench_summary [count]``.
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+from flask import render_template_string
+
+import server
+from models import Club, Competition, format_date
+from repository import Repository
+
+DEFAULT_COUNT = 50_000
+RUNS = 5
+
+BEFORE_TEMPLATE = """
+<ul>
+    {% for comp in competitions %}
+        <li>
+            {{ comp['name'] }}<br/>
+            Date: {{ comp['date'] }}<br/>
+            Number of Places: {{ comp['numberOfPlaces'] }}
+            {% if comp['numberOfPlaces']|int > 0 and not comp['date']|is_past_string %}
+                <a href="{{ url_for('book',competition=comp['name']) }}">Book
+                    Places</a>
+            {% endif %}
+        </li>
+        <hr/>
+    {% endfor %}
+</ul>
+"""
+
+
+def is_past_string(date):
+    return datetime.strptime(date, "%Y-%m-%d %H:%M:%S") < datetime.today()
+
+
+def make_competitions(count):
+    # Half of the competitions are in the past
+    start = datetime.today() - timedelta(hours=count // 2)
+    return [
+        Competition(name=f"Competition {i}", date=start + timedelta(hours=i),
+                    number_of_places=i % 20)
+        for i in range(count)
+    ]
+
+
+def best_of(render):
+    timings = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        render()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1e3
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT
+    competitions = make_competitions(count)
+    club = Club(name="Simply Lift", email="john@simplylift.co", points=13)
+    server.store = Repository([club], competitions)
+    server.app.jinja_env.filters["is_past_string"] = is_past_string
+    dicts = [
+        {"name": c.name, "date": format_date(c.date),
+         "numberOfPlaces": str(c.number_of_places)}
+        for c in competitions
+    ]
+
+    def before():
+        with server.app.test_request_context():
+            render_template_string(BEFORE_TEMPLATE, competitions=dicts)
+
+    client = server.app.test_client()
+
+    def after():
+        client.post("/showSummary", data={"email": club.email})
+
+    print(f"{count} competitions")
+    print(f"before: {best_of(before):8.1f} ms")
+    print(f"after:  {best_of(after):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Worker processes booking through one shared SQLite database
+
+Every process books one place at a time until the competition is sold out,
+then the places booked by all of them are checked against the initial count.
+
+Run with ``python -m tests.performance.bench_workers``.
+"""
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from models import Booking, Club, Competition
+from storage import BookingConflict, SqliteStorage
+
+WORKERS = [1, 2, 4, 8]
+PLACES = 2_000
+# Enough clubs per worker to book every place within the 12 athletes cap
+CLUBS_PER_WORKER = PLACES // 12 + 1
+
+
+def worker(path, worker_index, booked):
+    storage = SqliteStorage(path)
+    count = 0
+    while True:
+        club_index = worker_index * CLUBS_PER_WORKER + count // 12
+        try:
+            storage.book(Booking(f"Club {club_index}", "Winter Coming", 1))
+        except BookingConflict:
+            break
+        count += 1
+    storage.close()
+    booked.put(count)
+
+
+def run(worker_count, directory):
+    path = os.path.join(directory, f"{worker_count}.db")
+    storage = SqliteStorage(path)
+    storage.import_data(
+        [Club(name=f"Club {i}", email=f"club{i}@gudlft.com", points=12)
+         for i in range(worker_count * CLUBS_PER_WORKER)],
+        [Competition(name="Winter Coming", date=datetime(2030, 12, 15, 13, 30),
+                     number_of_places=PLACES)],
+    )
+    booked = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(path, i, booked))
+        for i in range(worker_count)
+    ]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    total = sum(booked.get() for _ in processes)
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    _, competitions = storage.load()
+    storage.close()
+    assert total == PLACES, f"{total} places booked out of {PLACES}"
+    assert competitions[0].number_of_places == 0
+    return total / elapsed
+
+
+def main():
+    print(f"{'workers':>8} {'bookings/s':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for worker_count in WORKERS:
+            print(f"{worker_count:>8} {run(worker_count, directory):12.0f}")
+
+
+if __name__ == "__main__":
+    main()
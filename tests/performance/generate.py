@@ -0,0 +1,107 @@
+"""Generate clubs, competitions and bookings datasets of any size
+
+The JSON snapshots are written in the format of ``clubs.json`` and
+``competitions.json``. Bookings are folded into them, as after a
+compaction, and ``--journal`` more are appended to ``bookings.journal``
+to be replayed on startup. Half the competitions are past. The same seed
+always gives the same dataset.
+
+Run with ``python -m tests.performance.generate directory --clubs 100000
+[--competitions 1000] [--bookings 100000] [--journal 0] [--seed 0]``.
+"""
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+from journal import BookingJournal
+from models import Booking, Club, Competition
+
+
+def make_clubs(count):
+    return [
+        Club(name=f"Club {i}", email=f"club{i}@gudlft.com", points=1000)
+        for i in range(count)
+    ]
+
+
+def make_competitions(count):
+    start = datetime.today().replace(microsecond=0) - timedelta(days=count)
+    return [
+        Competition(name=f"Competition {i}",
+                    date=start + timedelta(days=2 * i),
+                    number_of_places=10_000)
+        for i in range(count)
+    ]
+
+
+def make_bookings(clubs, competitions, count, rng):
+    """Return bookings within the points and 12 athletes cap of the clubs"""
+
+    bookings = []
+    for _ in range(count):
+        club = rng.choice(clubs)
+        competition = rng.choice(competitions)
+        places = rng.randint(1, 3)
+        booked = club.bookings.get(competition.name, 0)
+        if booked + places > 12 or club.points < places:
+            continue
+        club.points -= places
+        club.bookings[competition.name] = booked + places
+        competition.number_of_places -= places
+        bookings.append(Booking(club.name, competition.name, places))
+    return bookings
+
+
+def write_snapshot(path, key, models):
+    with open(path, "w") as snapshot:
+        json.dump(
+            {key: [model.to_dict() for model in models], "journalSeq": 0},
+            snapshot, indent=4,
+        )
+
+
+def generate(directory, clubs=1000, competitions=100, bookings=1000,
+             journal=0, seed=0):
+    """Write a dataset to directory, return its (clubs, competitions)
+
+    The models returned hold the data once the journal is replayed.
+    """
+
+    rng = random.Random(seed)
+    club_models = make_clubs(clubs)
+    competition_models = make_competitions(competitions)
+    make_bookings(club_models, competition_models, bookings, rng)
+    os.makedirs(directory, exist_ok=True)
+    write_snapshot(os.path.join(directory, "clubs.json"), "clubs",
+                   club_models)
+    write_snapshot(os.path.join(directory, "competitions.json"),
+                   "competitions", competition_models)
+    journal_path = os.path.join(directory, "bookings.journal")
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
+    if journal:
+        booking_journal = BookingJournal(journal_path)
+        booking_journal.append_many(make_bookings(
+            club_models, competition_models, journal, rng
+        ))
+        booking_journal.close()
+    return club_models, competition_models
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a dataset")
+    parser.add_argument("directory")
+    parser.add_argument("--clubs", type=int, default=1000)
+    parser.add_argument("--competitions", type=int, default=100)
+    parser.add_argument("--bookings", type=int, default=1000)
+    parser.add_argument("--journal", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    generate(args.directory, args.clubs, args.competitions, args.bookings,
+             args.journal, args.seed)
+
+
+if __name__ == "__main__":
+    main()
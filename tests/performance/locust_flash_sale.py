@@ -0,0 +1,38 @@
+"""Flash sale: every client books "Winter Coming" as soon as it opens
+
+Run with ``locust -f tests/performance/locust_flash_sale.py --users 200
+--spawn-rate 200``. Sold out answers and requests shed with 503 are
+expected outcomes, the queues are polled from ``/api/queues``.
+"""
+from locust import HttpUser, constant, task
+
+from tests.performance import thresholds  # noqa: F401, adds the options
+
+CLUB_EMAILS = [
+    "john@simplylift.co",
+    "admin@irontemple.com",
+    "kate@shelifts.co.uk",
+]
+
+
+class FlashSaleUser(HttpUser):
+    wait_time = constant(0)
+
+    def on_start(self):
+        email = CLUB_EMAILS[id(self) % len(CLUB_EMAILS)]
+        self.client.post("/showSummary", data={"email": email})
+
+    @task(10)
+    def purchase(self):
+        with self.client.post(
+            "/purchasePlaces",
+            data={"competition": "Winter Coming", "places": 1},
+            catch_response=True,
+        ) as response:
+            if response.status_code == 503:
+                # Shed by the admission queue, as intended under load
+                response.success()
+
+    @task
+    def queues(self):
+        self.client.get("/api/queues")
@@ -1,31 +1,210 @@
-from locust import HttpUser, task, between
+"""Load test scenarios on a generated dataset, with correctness checks
 
+The server and Locust must use the same dataset, e.g. generated with
+``python -m tests.performance.generate data --clubs 10000`` and served from
+``data``, the directory locust.conf gives Locust with ``dataset``. Users
+log in as random clubs of the dataset:
 
-class ProjectPerfTest(HttpUser):
+- ``BrowsingUser`` mostly reads the listings and booking pages.
+- ``BookingSpikeUser`` books the few next competitions without pause.
+- ``MixedUser`` browses and books any upcoming competition.
+
+When the run stops, the points spent by the clubs must equal the places
+taken from the competitions, and the places booked by the users, and no
+count may be negative. Headless runs exit with 1 when this check fails, or
+when the 95th percentile latency or the failure ratio exceed the
+``max-p95-ms`` and ``max-error-rate`` set in locust.conf.
+
+Run with ``locust --headless --run-time 1m`` from the root of the
+repository, and one scenario by naming its class, e.g.
+``locust --headless BookingSpikeUser``.
+"""
+import logging
+import os
+import random
+import threading
+from datetime import datetime
+from operator import attrgetter
+
+import requests
+from locust import HttpUser, between, constant, events, task
+from locust.runners import LocalRunner, WorkerRunner
+
+from loader import load_snapshot
+from models import Club, Competition
+from tests.performance import thresholds  # noqa: F401, adds the options
+
+API_PAGE = 1000
+# Competitions booked by the spike, all clubs together
+HOT_COMPETITIONS = 3
+
+
+class Dataset:
+    emails = []
+    upcoming = []
+
+
+booked_places = 0
+booked_lock = threading.Lock()
+
+
+@events.init.add_listener
+def load_dataset(environment, **kwargs):
+    directory = environment.parsed_options.dataset
+    clubs, _ = load_snapshot(
+        os.path.join(directory, "clubs.json"), "clubs", Club.from_dict
+    )
+    competitions, _ = load_snapshot(
+        os.path.join(directory, "competitions.json"), "competitions",
+        Competition.from_dict,
+    )
+    now = datetime.today()
+    Dataset.emails = [club.email for club in clubs]
+    # Soonest first, the spike books the first ones
+    Dataset.upcoming = [
+        c.name for c in sorted(competitions, key=attrgetter("date"))
+        if c.date >= now
+    ]
+    if not Dataset.upcoming:
+        raise ValueError(f"No upcoming competition in {directory}")
+
+
+class ClubUser(HttpUser):
+    abstract = True
+
+    def on_start(self):
+        self.client.post("/showSummary",
+                         data={"email": random.choice(Dataset.emails)})
+
+    def book(self, competition, places):
+        global booked_places
+        with self.client.post(
+            "/purchasePlaces",
+            data={"competition": competition, "places": places},
+            allow_redirects=False,
+            catch_response=True,
+            name="/purchasePlaces",
+        ) as response:
+            if response.status_code == 302:
+                with booked_lock:
+                    booked_places += places
+            elif response.status_code in (200, 503):
+                # Refused or shed by the queue, as expected under contention
+                response.success()
+
+    def browse_competition(self, competition):
+        self.client.get(f"/book/{competition}", name="/book/[competition]")
+
+
+class BrowsingUser(ClubUser):
     wait_time = between(1, 3)
 
-    @task
-    def home(self):
-        self.client.get("/")
+    @task(5)
+    def summary(self):
+        self.client.get("/showSummary")
 
-    @task(3)
-    def login(self):
-        self.client.post("/showSummary", data={"email": "john@simplylift.co"})
+    @task(5)
+    def points(self):
+        self.client.get("/points?limit=100", name="/points")
 
     @task(3)
-    def logout(self):
-        self.client.get("/logout")
+    def competition(self):
+        self.browse_competition(random.choice(Dataset.upcoming))
 
-    @task(3)
+    @task(2)
+    def api(self):
+        self.client.get("/api/competitions")
+
+    @task
+    def book_one(self):
+        self.book(random.choice(Dataset.upcoming), 1)
+
+
+class BookingSpikeUser(ClubUser):
+    wait_time = constant(0)
+
+    @task
+    def book_hot(self):
+        competition = random.choice(Dataset.upcoming[:HOT_COMPETITIONS])
+        self.book(competition, random.randint(1, 3))
+
+
+class MixedUser(ClubUser):
+    wait_time = between(0.5, 2)
+
+    @task(4)
+    def summary(self):
+        self.client.get("/showSummary")
+
+    @task(2)
     def points(self):
-        self.client.get("/points")
+        self.client.get("/points?limit=100", name="/points")
 
     @task(3)
-    def book(self):
-        self.client.get("/book/Winter%20Coming")
+    def book_any(self):
+        competition = random.choice(Dataset.upcoming)
+        self.browse_competition(competition)
+        self.book(competition, random.randint(1, 4))
 
-    @task(3)
-    def purchase(self):
-        self.client.post(
-            "/purchasePlaces", data={"competition": "Winter Coming", "places": 1}
-        )
+
+def totals(host):
+    """Return the total (points, places) of the clubs and competitions"""
+
+    sums = []
+    for path, key, field in (("/api/points", "clubs", "points"),
+                             ("/api/competitions", "competitions", "places")):
+        total = 0
+        after = None
+        while True:
+            params = {"fields": f"name,{field}", "limit": API_PAGE}
+            if after is not None:
+                params["after"] = after
+            page = requests.get(host + path, params=params, timeout=60).json()
+            for record in page[key]:
+                if record[field] < 0:
+                    logging.error(f"Negative {field} for {record['name']}")
+                    total = None
+                    break
+                total += record[field]
+            after = page["next"]
+            if total is None or after is None:
+                break
+        sums.append(total)
+    return tuple(sums)
+
+
+@events.test_start.add_listener
+def record_totals(environment, **kwargs):
+    global booked_places
+    if isinstance(environment.runner, WorkerRunner):
+        return
+    booked_places = 0
+    environment.initial_totals = totals(environment.host)
+
+
+@events.test_stop.add_listener
+def check_invariants(environment, **kwargs):
+    if isinstance(environment.runner, WorkerRunner):
+        return
+    points, places = environment.initial_totals
+    points_after, places_after = totals(environment.host)
+    failures = []
+    if None in (points, places, points_after, places_after):
+        failures.append("a club or competition went negative")
+    else:
+        spent = points - points_after
+        taken = places - places_after
+        if spent != taken:
+            failures.append(f"{spent} points spent for {taken} places taken")
+        # Users of other processes are not counted here
+        if isinstance(environment.runner, LocalRunner) and (
+            taken != booked_places
+        ):
+            failures.append(
+                f"{taken} places taken for {booked_places} booked"
+            )
+    for failure in failures:
+        logging.error(f"Invariant broken: {failure}")
+        environment.process_exit_code = 1
+    if not failures:
+        logging.info("Invariants hold")
@@ -0,0 +1,182 @@
+"""Micro-benchmarks of the server on generated datasets, with a baseline
+
+For each size, a dataset of that many clubs (and a tenth as many
+competitions) is generated and loaded, then each benchmark reports its
+time per call: the best of several timed runs. Results are written as
+JSON. Given the results of an earlier run as baseline, the change of each
+benchmark is printed, and the run fails when one got slower than the
+threshold allows.
+
+Run with ``python -m tests.performance.suite [--sizes 10,1000,100000]
+[--output results.json] [--baseline baseline.json] [--threshold 0.2]``.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+
+from flask import render_template, session
+
+import server
+from journal import BookingJournal
+from persistence import PersistenceWriter
+from tests.performance.generate import generate
+
+DEFAULT_SIZES = [10, 1_000, 100_000]
+REPEAT = 5
+# Seconds each timed run lasts at least
+MIN_RUN = 0.2
+
+
+def setup(directory, size):
+    """Generate a dataset of size clubs and load it in the server"""
+
+    generate(directory, clubs=size, competitions=max(1, size // 10),
+             bookings=size)
+    server.store.load(
+        server.load_clubs(os.path.join(directory, "clubs.json")),
+        server.load_competitions(os.path.join(directory, "competitions.json")),
+    )
+    server.journal = BookingJournal(
+        os.path.join(directory, "bookings.journal"),
+        # Compactions rewrite every record, they are not per-call costs
+        compact_every=sys.maxsize,
+    )
+    server.persistence = PersistenceWriter(
+        server.journal, server.compact, mode="async"
+    )
+
+
+def benchmarks(directory):
+    """Return the benchmarks of the loaded dataset, by name"""
+
+    clubs = server.clubs
+    competitions = server.competitions
+    emails = itertools.cycle([club.email for club in clubs])
+    booked = itertools.cycle([
+        (name, club) for club in clubs for name in club.bookings
+    ] or [(competitions[0].name, clubs[0])])
+    places = itertools.cycle(itertools.product(clubs, competitions))
+    clubs_path = os.path.join(directory, "clubs.json")
+    club = clubs[0]
+    competition = competitions[-1]
+
+    def render(template_name, **context):
+        def run():
+            with server.app.test_request_context():
+                session["club"] = club.name
+                render_template(template_name, **context)
+        return run
+
+    now = datetime.today()
+
+    def book():
+        club, competition = next(places)
+        server.book_places(club, competition, 1)
+
+    return {
+        "find_club_by_email": lambda: server.find_club_by_email(next(emails)),
+        "find_competition_in_club_booking": lambda: (
+            server.find_competition_in_club_booking(*next(booked))
+        ),
+        "book_places": book,
+        "load_clubs": lambda: server.load_clubs(clubs_path),
+        "render_index": render("index.html"),
+        "render_welcome": render(
+            "welcome.html", **server.competitions_context(now, None, None)
+        ),
+        "render_booking": render("booking.html", competition=competition),
+        "render_points": render(
+            "points.html", **server.clubs_context(None, None)
+        ),
+    }
+
+
+def measure(function):
+    """Return the best time per call of function, and the calls per run"""
+
+    timer = timeit.Timer(function)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * MIN_RUN / elapsed))
+    best = min(timer.repeat(repeat=REPEAT, number=number))
+    return best / number, number
+
+
+def run(sizes):
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        # Compactions write the snapshots to the working directory
+        os.chdir(directory)
+        for size in sizes:
+            setup(directory, size)
+            for name, function in benchmarks(directory).items():
+                seconds, number = measure(function)
+                results.append({"name": name, "size": size,
+                                "seconds": seconds, "calls": number})
+                print(f"{name:>34} {size:>8} {seconds * 1e6:14.2f} us",
+                      flush=True)
+            server.persistence.close()
+            server.journal.close()
+        os.chdir(cwd)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print the change of each benchmark, return the regressed ones"""
+
+    previous = {(r["name"], r["size"]): r["seconds"]
+                for r in baseline["results"]}
+    regressions = []
+    print(f"{'benchmark':>34} {'size':>8} {'baseline':>12} {'now':>12} "
+          f"{'change':>8}")
+    for result in results:
+        key = (result["name"], result["size"])
+        if key not in previous:
+            continue
+        change = result["seconds"] / previous[key] - 1
+        if change > threshold:
+            regressions.append(key)
+        print(f"{key[0]:>34} {key[1]:>8} {previous[key] * 1e6:10.2f}us "
+              f"{result['seconds'] * 1e6:10.2f}us {change:+8.1%}"
+              f"{'  REGRESSION' if change > threshold else ''}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+        help="comma separated numbers of clubs, from 10 to 1000000",
+    )
+    parser.add_argument("--output", help="write the results to this file")
+    parser.add_argument("--baseline", help="results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="slowdown failing the run, 0.2 for 20%%")
+    args = parser.parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",")]
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    output = os.path.abspath(args.output) if args.output else None
+    results = run(sizes)
+    if output:
+        with open(output, "w") as output_file:
+            json.dump({"python": platform.python_version(),
+                       "results": results}, output_file, indent=4)
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            sys.exit(f"{len(regressions)} benchmarks regressed by more than "
+                     f"{args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
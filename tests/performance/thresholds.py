@@ -0,0 +1,41 @@
+"""Pass/fail thresholds of headless Locust runs, set in locust.conf
+
+Imported by the locustfiles, it adds their options: ``max-p95-ms`` and
+``max-error-rate`` fail the run when exceeded, 0 ignores them, and
+``dataset`` is the directory of the JSON files the server uses.
+"""
+import logging
+
+from locust import events
+
+
+@events.init_command_line_parser.add_listener
+def add_options(parser):
+    parser.add_argument("--dataset", default=".",
+                        help="directory of the JSON files the server uses")
+    parser.add_argument("--max-p95-ms", type=float, default=0,
+                        help="95th percentile latency failing the run, "
+                             "0 to ignore")
+    parser.add_argument("--max-error-rate", type=float, default=0,
+                        help="failure ratio failing the run, 0 to ignore")
+
+
+@events.quitting.add_listener
+def check_thresholds(environment, **kwargs):
+    options = environment.parsed_options
+    total = environment.stats.total
+    p95 = total.get_response_time_percentile(0.95) or 0
+    exceeded = False
+    if options.max_p95_ms and p95 > options.max_p95_ms:
+        logging.error(f"95th percentile {p95} ms exceeds "
+                      f"{options.max_p95_ms} ms")
+        exceeded = True
+    if options.max_error_rate and total.fail_ratio > options.max_error_rate:
+        logging.error(f"Failure ratio {total.fail_ratio:.2%} exceeds "
+                      f"{options.max_error_rate:.2%}")
+        exceeded = True
+    if exceeded:
+        environment.process_exit_code = 1
+    elif options.max_error_rate and environment.process_exit_code is None:
+        # Locust would exit with 1 on any failure, even below the rate
+        environment.process_exit_code = 0
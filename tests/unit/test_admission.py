@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionQueue, QueueFull
+
+
+def test_served_in_arrival_order():
+    queue = AdmissionQueue()
+    served = []
+    threads = []
+
+    def book(number):
+        with queue.hold("Winter Coming"):
+            served.append(number)
+
+    with queue.hold("Winter Coming"):
+        for number in range(5):
+            thread = threading.Thread(target=book, args=(number,))
+            thread.start()
+            threads.append(thread)
+            # Wait for the thread to queue before starting the next one
+            while queue.depth("Winter Coming") != number + 2:
+                time.sleep(0.001)
+    for thread in threads:
+        thread.join()
+    assert served == [0, 1, 2, 3, 4]
+    assert queue.depth("Winter Coming") == 0
+
+
+def test_other_key_not_blocked():
+    queue = AdmissionQueue()
+    with queue.hold("Winter Coming"):
+        with queue.hold("Spring Festival"):
+            assert queue.depth("Spring Festival") == 1
+
+
+def test_sheds_beyond_max_depth():
+    queue = AdmissionQueue(max_depth=1)
+    with queue.hold("Winter Coming"):
+        with pytest.raises(QueueFull):
+            with queue.hold("Winter Coming"):
+                pass
+    assert queue.shed == 1
+    with queue.hold("Winter Coming"):
+        pass
+
+
+def test_stats():
+    queue = AdmissionQueue()
+    with queue.hold("Winter Coming"):
+        stats = queue.stats()
+    assert stats["depths"] == {"Winter Coming": 1}
+    assert stats["admitted"] == 1
+    assert stats["shed"] == 0
+    assert stats["waitSecondsMax"] >= 0
+    assert queue.stats()["depths"] == {}
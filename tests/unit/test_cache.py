@@ -0,0 +1,39 @@
+from cache import RenderCache
+
+
+def test_get_or_render_caches():
+    cache = RenderCache()
+    renders = []
+
+    def render():
+        renders.append(1)
+        return b"page"
+
+    assert cache.get_or_render((1, "points"), render) == b"page"
+    assert cache.get_or_render((1, "points"), render) == b"page"
+    assert len(renders) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_new_version_renders_again():
+    cache = RenderCache()
+    cache.get_or_render((1, "points"), lambda: b"old")
+    assert cache.get_or_render((2, "points"), lambda: b"new") == b"new"
+    assert cache.misses == 2
+
+
+def test_bounded_size():
+    cache = RenderCache(max_entries=2)
+    cache.get_or_render(1, lambda: "a")
+    cache.get_or_render(2, lambda: "b")
+    cache.get_or_render(1, lambda: "a")
+    cache.get_or_render(3, lambda: "c")
+    assert len(cache) == 2
+    assert cache.get_or_render(2, lambda: "b again") == "b again"
+
+
+def test_clear():
+    cache = RenderCache()
+    cache.get_or_render(1, lambda: "a")
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,39 @@
+import gzip
+
+import brotli
+import pytest
+from werkzeug.http import parse_accept_header
+
+from compression import compress, compressible, negotiate
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("*", "br"),
+    ("br;q=0, *;q=0.1", "gzip"),
+    ("identity", None),
+    ("", None),
+])
+def test_negotiate(header, expected):
+    assert negotiate(parse_accept_header(header)) == expected
+
+
+def test_compress():
+    body = b"<tr><td>Simply Lift</td><td>13</td></tr>" * 100
+    assert brotli.decompress(compress(body, "br")) == body
+    assert gzip.decompress(compress(body, "gzip")) == body
+    assert len(compress(body, "br")) < len(body) // 10
+
+
+def test_compress_text_and_same_output():
+    assert gzip.decompress(compress("Competition", "gzip")) == b"Competition"
+    assert compress("Competition", "gzip") == compress(b"Competition", "gzip")
+
+
+def test_compressible():
+    assert compressible("text/html")
+    assert compressible("application/json")
+    assert not compressible("image/png")
+    assert not compressible(None)
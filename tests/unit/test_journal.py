@@ -0,0 +1,101 @@
+import pytest
+
+from journal import BookingJournal
+from models import Booking
+
+
+def test_append_and_records(tmp_path):
+    journal = BookingJournal(tmp_path / "bookings.journal")
+    assert journal.append(Booking("Simply Lift", "Spring Festival", 2)) == 1
+    assert journal.append(Booking("Iron Temple", "Spring Festival", 1)) == 2
+    records = list(journal.records())
+    assert records[0] == (1, Booking("Simply Lift", "Spring Festival", 2))
+    assert records[1][0] == 2
+
+
+def test_records_missing_file(tmp_path):
+    journal = BookingJournal(tmp_path / "bookings.journal")
+    assert list(journal.records()) == []
+
+
+def test_records_ignore_torn_line(tmp_path):
+    file = tmp_path / "bookings.journal"
+    file.write_text(
+        '{"seq":1,"club":"Simply Lift","competition":"Fall Classic","places":1}\n'
+        '{"seq":2,"club":"Simp'
+    )
+    journal = BookingJournal(file)
+    assert [seq for seq, _ in journal.records()] == [1]
+
+
+def test_records_fail_on_corrupted_line(tmp_path):
+    file = tmp_path / "bookings.journal"
+    file.write_text(
+        '{"seq":1,"club":"Simply Lift","competition":"Fall Classic",'
+        '"places":1}\n'
+        '{"seq":2,"club":"Simp\n'
+        '{"seq":3,"club":"Simply Lift","competition":"Fall Classic",'
+        '"places":1}\n'
+    )
+    with pytest.raises(ValueError, match="line 2"):
+        list(BookingJournal(file).records())
+
+
+def test_restore_drops_torn_line(tmp_path):
+    file = tmp_path / "bookings.journal"
+    file.write_text(
+        '{"seq":1,"club":"Simply Lift","competition":"Fall Classic",'
+        '"places":1}\n'
+        '{"seq":2,"club":"Simp'
+    )
+    journal = BookingJournal(file)
+    journal.restore(0)
+    journal.append(Booking("Simply Lift", "Fall Classic", 1))
+    journal.close()
+    assert [seq for seq, _ in BookingJournal(file).records()] == [1, 2]
+
+
+def test_restore(tmp_path):
+    journal = BookingJournal(tmp_path / "bookings.journal")
+    journal.append(Booking("Simply Lift", "Spring Festival", 2))
+    journal.append(Booking("Simply Lift", "Spring Festival", 3))
+    journal.close()
+    restored = BookingJournal(tmp_path / "bookings.journal")
+    assert len(restored.restore(0)) == 2
+    assert restored.seq == 2
+    assert restored.append(Booking("Simply Lift", "Spring Festival", 1)) == 3
+
+
+def test_restore_after_snapshot(tmp_path):
+    journal = BookingJournal(tmp_path / "bookings.journal")
+    assert journal.restore(7) == []
+    assert journal.append(Booking("Simply Lift", "Spring Festival", 1)) == 8
+
+
+def test_needs_compaction(tmp_path):
+    journal = BookingJournal(tmp_path / "bookings.journal", compact_every=2)
+    journal.append(Booking("Simply Lift", "Spring Festival", 1))
+    assert not journal.needs_compaction()
+    journal.append(Booking("Simply Lift", "Spring Festival", 1))
+    assert journal.needs_compaction()
+
+
+def test_truncate_keeps_later_records(tmp_path):
+    journal = BookingJournal(tmp_path / "bookings.journal")
+    for _ in range(3):
+        journal.append(Booking("Simply Lift", "Spring Festival", 1))
+    journal.truncate(2)
+    assert [seq for seq, _ in journal.records()] == [3]
+    assert journal.pending == 1
+    assert journal.append(Booking("Simply Lift", "Spring Festival", 1)) == 4
+
+
+def test_truncate_failure_keeps_journal(tmp_path, mocker):
+    journal = BookingJournal(tmp_path / "bookings.journal")
+    for _ in range(3):
+        journal.append(Booking("Simply Lift", "Spring Festival", 1))
+    mocker.patch("persistence.os.replace", side_effect=OSError)
+    with pytest.raises(OSError):
+        journal.truncate(2)
+    assert [seq for seq, _ in journal.records()] == [1, 2, 3]
+    assert [path.name for path in tmp_path.iterdir()] == ["bookings.journal"]
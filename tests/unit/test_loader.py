@@ -0,0 +1,86 @@
+import io
+import json
+import logging
+
+import pytest
+
+from loader import CHUNK_SIZE, SnapshotReader, load_snapshot
+from models import Club
+
+CLUBS = {
+    "clubs": [
+        {"name": f"Club {i}", "email": f"club{i}@gudlft.com",
+         "points": str(i), "bookings": [{"Spring Festival": 1}]}
+        for i in range(100)
+    ],
+    "journalSeq": 7,
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 10, 1 << 16])
+@pytest.mark.parametrize("indent", [None, 4])
+def test_reader_yields_records(chunk_size, indent):
+    text = json.dumps(CLUBS, indent=indent)
+    reader = SnapshotReader(io.StringIO(text), "clubs", chunk_size=chunk_size)
+    assert [record for _, record in reader.records()] == CLUBS["clubs"]
+    assert reader.values == {"journalSeq": 7}
+
+
+def test_reader_lines():
+    text = '{"clubs": [\n{"name": "A"},\n\n{"name": "B"}\n]}'
+    reader = SnapshotReader(io.StringIO(text), "clubs", chunk_size=4)
+    assert [line for line, _ in reader.records()] == [2, 4]
+
+
+def test_reader_empty_snapshot():
+    reader = SnapshotReader(io.StringIO("{}"), "clubs")
+    assert list(reader.records()) == []
+
+
+@pytest.mark.parametrize("text, line", [
+    ("{invalid}", 1),
+    ('{"clubs": [\n{"name": "A"}\n{"name": "B"}]}', 3),
+    ('{"clubs": [\n{"name": "A"},\n', 3),
+    ('{"clubs": []} trailing', 1),
+])
+def test_reader_invalid_json(text, line):
+    reader = SnapshotReader(io.StringIO(text), "clubs", chunk_size=4)
+    with pytest.raises(json.JSONDecodeError) as error:
+        list(reader.records())
+    assert error.value.lineno == line
+
+
+def test_reader_record_over_many_chunks():
+    club = Club("Simply Lift", "john@simplylift.co", 13,
+                {f"Competition {i}": 1 for i in range(60_000)})
+    text = json.dumps({"clubs": [club.to_dict(), CLUBS["clubs"][0]]},
+                      indent=4)
+    assert len(text) > 50 * CHUNK_SIZE
+    reader = SnapshotReader(io.StringIO(text), "clubs")
+    records = [record for _, record in reader.records()]
+    assert Club.from_dict(records[0]) == club
+    assert records[1] == CLUBS["clubs"][0]
+
+
+def test_reader_invalid_json_in_large_record():
+    text = '{"clubs": [\n{"bookings": [' + '{"A": 1},\n' * 20_000 + '}]}'
+    reader = SnapshotReader(io.StringIO(text), "clubs", chunk_size=64)
+    with pytest.raises(json.JSONDecodeError) as error:
+        list(reader.records())
+    assert error.value.lineno == 20_002
+
+
+def test_load_snapshot_skips_malformed_records(tmp_path, caplog):
+    file = tmp_path / "clubs.json"
+    file.write_text(json.dumps({"clubs": [
+        {"name": "Simply Lift", "email": "john@simplylift.co", "points": "13"},
+        {"name": "Iron Temple", "points": "4"},
+        {"name": "She Lifts", "email": "kate@shelifts.co.uk", "points": "x"},
+        {"name": "Boulder Crew", "email": "b@crew.com", "points": "3"},
+    ], "journalSeq": 3}, indent=4))
+    with caplog.at_level(logging.WARNING):
+        clubs, seq = load_snapshot(file, "clubs", Club.from_dict)
+    assert [c.name for c in clubs] == ["Simply Lift", "Boulder Crew"]
+    assert seq == 3
+    assert "record 1 of clubs at line 8" in caplog.text
+    assert "record 2 of clubs at line 12" in caplog.text
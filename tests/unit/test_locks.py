@@ -0,0 +1,29 @@
+import threading
+
+from locks import KeyedLocks
+
+
+def test_same_key_same_lock():
+    locks = KeyedLocks()
+    assert locks.get("Spring Festival") is locks.get("Spring Festival")
+
+
+def test_other_key_not_blocked():
+    locks = KeyedLocks()
+    acquired = threading.Event()
+
+    def hold_other():
+        with locks.hold("Fall Classic"):
+            acquired.set()
+
+    with locks.hold("Spring Festival"):
+        thread = threading.Thread(target=hold_other)
+        thread.start()
+        assert acquired.wait(timeout=5)
+    thread.join()
+
+
+def test_same_key_blocked():
+    locks = KeyedLocks()
+    with locks.hold("Spring Festival"):
+        assert not locks.get("Spring Festival").acquire(blocking=False)
@@ -0,0 +1,55 @@
+from metrics import Counter, Histogram, Registry
+
+
+def test_counter():
+    counter = Counter("bookings_total", "Bookings", ("reason",))
+    counter.inc("places")
+    counter.inc("places", amount=2)
+    assert counter.value("places") == 3
+    assert counter.value("points") == 0
+    assert list(counter.samples()) == [
+        ("bookings_total", {"reason": "places"}, 3)
+    ]
+
+
+def test_counter_without_labels_starts_at_zero():
+    counter = Counter("bookings_total", "Bookings")
+    assert list(counter.samples()) == [("bookings_total", {}, 0)]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("seconds", "Time", ("phase",), buckets=(0.1, 1))
+    histogram.observe(0.05, "lookup")
+    histogram.observe(0.5, "lookup")
+    histogram.observe(5, "lookup")
+    assert histogram.count("lookup") == 3
+    assert list(histogram.samples()) == [
+        ("seconds_bucket", {"phase": "lookup", "le": "0.1"}, 1),
+        ("seconds_bucket", {"phase": "lookup", "le": "1"}, 2),
+        ("seconds_bucket", {"phase": "lookup", "le": "+Inf"}, 3),
+        ("seconds_sum", {"phase": "lookup"}, 5.55),
+        ("seconds_count", {"phase": "lookup"}, 3),
+    ]
+
+
+def test_histogram_time():
+    histogram = Histogram("seconds", "Time", ("phase",))
+    with histogram.time("render"):
+        pass
+    assert histogram.count("render") == 1
+
+
+def test_render():
+    registry = Registry()
+    registry.counter("rejections_total", "Refused", ("reason",)).inc('a"b')
+    registry.collector(lambda: [
+        ("queue_depth", "gauge", "Depth", [({"competition": "Spring"}, 2)])
+    ])
+    assert registry.render() == (
+        "# HELP rejections_total Refused\n"
+        "# TYPE rejections_total counter\n"
+        'rejections_total{reason="a\\"b"} 1\n'
+        "# HELP queue_depth Depth\n"
+        "# TYPE queue_depth gauge\n"
+        'queue_depth{competition="Spring"} 2\n'
+    )
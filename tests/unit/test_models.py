@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import pytest
+
+from models import Club, Competition
+
+
+def test_competition_from_dict():
+    competition = Competition.from_dict(
+        {"name": "Spring Festival", "date": "2020-03-27 10:00:00",
+         "numberOfPlaces": "25"}
+    )
+    assert competition == Competition(
+        name="Spring Festival", date=datetime(2020, 3, 27, 10, 0),
+        number_of_places=25,
+    )
+
+
+def test_competition_round_trip():
+    data = {"name": "Fall Classic", "date": "2020-10-22 13:30:00",
+            "numberOfPlaces": "13"}
+    assert Competition.from_dict(data).to_dict() == data
+
+
+def test_club_from_dict_merges_bookings():
+    club = Club.from_dict(
+        {"name": "Simply Lift", "email": "john@simplylift.co", "points": "13",
+         "bookings": [{"Fall Classic": 2}, {"Winter Coming": 1},
+                      {"Fall Classic": 3}]}
+    )
+    assert club.points == 13
+    assert club.bookings == {"Fall Classic": 5, "Winter Coming": 1}
+
+
+def test_club_without_bookings():
+    club = Club.from_dict(
+        {"name": "Simply Lift", "email": "john@simplylift.co", "points": "13"}
+    )
+    assert club.bookings == {}
+
+
+def test_club_round_trip():
+    data = {"name": "Simply Lift", "email": "john@simplylift.co",
+            "points": "13", "bookings": [{"Fall Classic": 2}]}
+    assert Club.from_dict(data).to_dict() == data
+
+
+def test_models_have_slots():
+    club = Club(name="Simply Lift", email="john@simplylift.co", points=13)
+    with pytest.raises(AttributeError):
+        club.nickname = "SL"
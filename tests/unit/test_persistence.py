@@ -0,0 +1,140 @@
+import json
+import threading
+
+import pytest
+
+from journal import BookingJournal
+from models import Booking
+from persistence import PersistenceWriter, write_atomic
+
+
+def test_write_atomic(tmp_path):
+    file = tmp_path / "clubs.json"
+    file.write_text("old")
+    write_atomic(file, json.dumps({"clubs": []}))
+    assert json.loads(file.read_text()) == {"clubs": []}
+    assert [f.name for f in tmp_path.iterdir()] == ["clubs.json"]
+
+
+def test_write_atomic_keeps_file_on_error(tmp_path):
+    file = tmp_path / "clubs.json"
+    file.write_text("old")
+    with pytest.raises(TypeError):
+        write_atomic(file, None)
+    assert file.read_text() == "old"
+    assert [f.name for f in tmp_path.iterdir()] == ["clubs.json"]
+
+
+def test_unknown_mode(tmp_path):
+    with pytest.raises(ValueError):
+        PersistenceWriter(BookingJournal(tmp_path / "j"), None, mode="fast")
+
+
+def test_sync_mode_writes_before_returning(tmp_path):
+    journal = BookingJournal(tmp_path / "bookings.journal")
+    writer = PersistenceWriter(journal, None, mode="sync")
+    pending = writer.submit(Booking("Simply Lift", "Spring Festival", 2))
+    assert pending.done()
+    assert len(list(journal.records())) == 1
+
+
+@pytest.mark.parametrize("mode", ["group", "async"])
+def test_batched_modes(tmp_path, mode):
+    journal = BookingJournal(tmp_path / "bookings.journal")
+    writer = PersistenceWriter(journal, None, mode=mode, window_ms=20)
+    pendings = [writer.submit(Booking("Simply Lift", "Spring Festival", 1))
+                for _ in range(5)]
+    for pending in pendings:
+        pending.result(timeout=5)
+    assert [seq for seq, _ in journal.records()] == [1, 2, 3, 4, 5]
+    writer.close()
+
+
+def test_group_mode_waits_for_flush(tmp_path, mocker):
+    journal = BookingJournal(tmp_path / "bookings.journal")
+    writer = PersistenceWriter(journal, None, mode="group", window_ms=1)
+    append_many = mocker.spy(journal, "append_many")
+    writer.wait(writer.submit(Booking("Simply Lift", "Spring Festival", 1)))
+    append_many.assert_called_once()
+    assert append_many.call_args.kwargs == {"fsync": True}
+    writer.close()
+
+
+@pytest.mark.parametrize("mode", ["sync", "group"])
+def test_submit_many_writes_once(tmp_path, mocker, mode):
+    journal = BookingJournal(tmp_path / "bookings.journal")
+    writer = PersistenceWriter(journal, None, mode=mode, window_ms=1)
+    append_many = mocker.spy(journal, "append_many")
+    writer.wait(writer.submit_many([
+        Booking("Simply Lift", "Spring Festival", 1),
+        Booking("Simply Lift", "Fall Classic", 2),
+    ]))
+    append_many.assert_called_once()
+    assert [seq for seq, _ in journal.records()] == [1, 2]
+    writer.close()
+
+
+def test_async_mode_does_not_wait(tmp_path):
+    journal = BookingJournal(tmp_path / "bookings.journal")
+    writer = PersistenceWriter(journal, None, mode="async", window_ms=1000)
+    writer.wait(writer.submit(Booking("Simply Lift", "Spring Festival", 1)))
+    assert list(journal.records()) == []
+    writer.close()
+    assert len(list(journal.records())) == 1
+
+
+def test_close_drains_queue(tmp_path):
+    journal = BookingJournal(tmp_path / "bookings.journal")
+    writer = PersistenceWriter(journal, None, mode="async", window_ms=1000)
+    writer.submit(Booking("Simply Lift", "Spring Festival", 1))
+    writer.submit(Booking("Iron Temple", "Spring Festival", 1))
+    writer.close()
+    assert len(list(journal.records())) == 2
+
+
+def test_compaction_runs_on_its_own_thread(tmp_path, mocker):
+    journal = BookingJournal(tmp_path / "bookings.journal", compact_every=2)
+    compact = mocker.Mock(side_effect=lambda: journal.truncate(journal.seq))
+    writer = PersistenceWriter(journal, compact, mode="sync")
+    writer.submit(Booking("Simply Lift", "Spring Festival", 1))
+    writer.submit(Booking("Simply Lift", "Spring Festival", 1))
+    writer.close()
+    compact.assert_called_once()
+    assert list(journal.records()) == []
+
+
+def test_group_commits_continue_during_compaction(tmp_path):
+    journal = BookingJournal(tmp_path / "bookings.journal", compact_every=2)
+    started = threading.Event()
+    release = threading.Event()
+
+    def compact():
+        seq = journal.seq
+        started.set()
+        release.wait(timeout=10)
+        journal.truncate(seq)
+
+    writer = PersistenceWriter(journal, compact, mode="group", window_ms=1)
+    booking = Booking("Simply Lift", "Spring Festival", 1)
+    for _ in range(2):
+        writer.wait(writer.submit(booking))
+    assert started.wait(timeout=5)
+    # Written and acknowledged while the compaction is still running
+    future = writer.submit(Booking("Iron Temple", "Spring Festival", 1))
+    future.result(timeout=5)
+    release.set()
+    writer.close()
+    assert [seq for seq, _ in journal.records()] == [3]
+
+
+def test_bookings_written_while_compactor_waits(tmp_path):
+    journal = BookingJournal(tmp_path / "bookings.journal", compact_every=5)
+    writer = PersistenceWriter(
+        journal, lambda: journal.truncate(journal.seq), mode="group",
+        window_ms=1,
+    )
+    for _ in range(20):
+        writer.submit(Booking("Simply Lift", "Spring Festival", 1)).result(
+            timeout=5
+        )
+    writer.close()
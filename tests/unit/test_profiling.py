@@ -0,0 +1,75 @@
+import pytest
+from flask import Flask
+
+from profiling import ProfilingMiddleware, dumps, main
+
+
+@pytest.fixture
+def profiled(tmp_path):
+    app = Flask(__name__)
+    app.config.update(
+        PROFILE_DIR=str(tmp_path), PROFILE_SAMPLE_EVERY=0,
+        PROFILE_SLOW_SECONDS=None, PROFILE_TOKEN="secret",
+        PROFILE_HEADER="X-Profile-Token",
+    )
+
+    @app.route("/points")
+    def see_points():
+        return "points"
+
+    app.wsgi_app = ProfilingMiddleware(app.wsgi_app, app.config, app.url_map)
+    return app
+
+
+def test_not_profiled_by_default(profiled, tmp_path):
+    assert profiled.test_client().get("/points").data == b"points"
+    assert dumps(tmp_path) == []
+
+
+def test_sample_every(profiled, tmp_path):
+    profiled.config["PROFILE_SAMPLE_EVERY"] = 2
+    client = profiled.test_client()
+    for _ in range(4):
+        assert client.get("/points").data == b"points"
+    assert len(dumps(tmp_path, "see_points")) == 2
+
+
+def test_profiled_with_token(profiled, tmp_path):
+    client = profiled.test_client()
+    client.get("/points", headers={"X-Profile-Token": "wrong"})
+    assert dumps(tmp_path) == []
+    client.get("/points", headers={"X-Profile-Token": "secret"})
+    client.get("/missing", headers={"X-Profile-Token": "secret"})
+    assert len(dumps(tmp_path, "see_points")) == 1
+    assert len(dumps(tmp_path, "unmatched")) == 1
+
+
+def test_slow_requests(profiled, tmp_path):
+    profiled.config["PROFILE_SLOW_SECONDS"] = 60
+    profiled.test_client().get("/points")
+    assert dumps(tmp_path) == []
+    profiled.config["PROFILE_SLOW_SECONDS"] = 0
+    profiled.test_client().get("/points")
+    assert len(dumps(tmp_path)) == 1
+
+
+def test_disabled_without_directory(profiled, tmp_path):
+    profiled.config["PROFILE_DIR"] = None
+    profiled.test_client().get(
+        "/points", headers={"X-Profile-Token": "secret"}
+    )
+    assert dumps(tmp_path) == []
+
+
+def test_report(profiled, tmp_path, capsys):
+    profiled.config["PROFILE_SAMPLE_EVERY"] = 1
+    profiled.test_client().get("/points")
+    main([str(tmp_path), "--top", "5"])
+    output = capsys.readouterr().out
+    assert "1 profiles: see_points 1" in output
+    assert "function calls" in output
+
+
+def test_report_without_profiles(tmp_path):
+    with pytest.raises(SystemExit):
+        main([str(tmp_path)])
@@ -0,0 +1,405 @@
+import sys
+import threading
+from datetime import datetime
+
+from models import Club, Competition
+from repository import Repository
+
+
+def make_repository():
+    clubs = [
+        Club(name="Simply Lift", email="john@simplylift.co", points=13),
+        Club(name="Iron Temple", email="admin@irontemple.com", points=4),
+    ]
+    competitions = [
+        Competition(name="Spring Festival", date=datetime(2020, 3, 27, 10, 0),
+                    number_of_places=25)
+    ]
+    return Repository(clubs, competitions)
+
+
+def test_club_by_email():
+    repository = make_repository()
+    assert repository.club_by_email("john@simplylift.co").name == "Simply Lift"
+
+
+def test_club_by_email_case_insensitive():
+    repository = make_repository()
+    club = repository.club_by_email(" John@SimplyLift.co ")
+    assert club.name == "Simply Lift"
+
+
+def test_club_by_email_wrong():
+    repository = make_repository()
+    assert repository.club_by_email("john@simplylift") is None
+
+
+def test_club_by_name():
+    repository = make_repository()
+    assert repository.club_by_name("Iron Temple").points == 4
+
+
+def test_competition_by_name():
+    repository = make_repository()
+    assert repository.competition_by_name("Spring Festival") is not None
+    assert repository.competition_by_name("Spring") is None
+
+
+def test_index_shares_records():
+    repository = make_repository()
+    club = repository.club_by_name("Simply Lift")
+    club.points = 3
+    assert repository.club_by_email("john@simplylift.co").points == 3
+
+
+def test_load_rebuilds_indexes_in_place():
+    repository = make_repository()
+    clubs = repository.clubs
+    repository.load(
+        [Club(name="She Lifts", email="kate@shelifts.co.uk", points=12)], []
+    )
+    assert clubs is repository.clubs
+    assert len(clubs) == 1
+    assert repository.club_by_name("Simply Lift") is None
+    assert repository.club_by_email("kate@shelifts.co.uk") is not None
+    assert repository.competition_by_name("Spring Festival") is None
+
+
+def test_add_club_and_competition():
+    repository = make_repository()
+    repository.add_club(Club(name="New Club", email="new@club.com", points=1))
+    repository.add_competition(
+        Competition(name="Summer Cup", date=datetime(2030, 6, 1, 10, 0),
+                    number_of_places=5)
+    )
+    assert repository.club_by_email("NEW@club.com").name == "New Club"
+    assert repository.competition_by_name("Summer Cup") in repository.competitions
+
+
+def make_calendar():
+    competitions = [
+        Competition(name="Winter Coming", date=datetime(2025, 12, 15, 13, 30),
+                    number_of_places=16),
+        Competition(name="Spring Festival", date=datetime(2020, 3, 27, 10, 0),
+                    number_of_places=25),
+        Competition(name="Fall Classic", date=datetime(2020, 10, 22, 13, 30),
+                    number_of_places=13),
+    ]
+    return Repository([], competitions)
+
+
+def test_upcoming_and_past_competitions():
+    repository = make_calendar()
+    now = datetime(2021, 1, 1)
+    assert [c.name for c in repository.past_competitions(now)] == [
+        "Spring Festival", "Fall Classic"
+    ]
+    assert [c.name for c in repository.upcoming_competitions(now)] == [
+        "Winter Coming"
+    ]
+
+
+def test_competition_starting_now_is_upcoming():
+    repository = make_calendar()
+    now = datetime(2020, 10, 22, 13, 30)
+    assert [c.name for c in repository.upcoming_competitions(now)] == [
+        "Fall Classic", "Winter Coming"
+    ]
+
+
+def test_added_competition_is_sorted():
+    repository = make_calendar()
+    repository.add_competition(
+        Competition(name="Summer Cup", date=datetime(2021, 6, 1),
+                    number_of_places=5)
+    )
+    now = datetime(2021, 1, 1)
+    assert [c.name for c in repository.upcoming_competitions(now)] == [
+        "Summer Cup", "Winter Coming"
+    ]
+
+
+def test_set_competition_date():
+    repository = make_calendar()
+    competition = repository.competition_by_name("Spring Festival")
+    repository.set_competition_date(competition, datetime(2030, 3, 27))
+    assert competition.date == datetime(2030, 3, 27)
+    upcoming = repository.upcoming_competitions(datetime(2021, 1, 1))
+    assert [c.name for c in upcoming] == ["Winter Coming", "Spring Festival"]
+
+
+def test_version_bumped_on_changes():
+    repository = make_repository()
+    version = repository.version
+    repository.add_club(Club(name="New Club", email="new@club.com", points=1))
+    assert repository.version == version + 1
+    repository.touch()
+    repository.load([], [])
+    assert repository.version == version + 3
+
+
+def test_competition_version():
+    repository = make_repository()
+    version = repository.competition_version("Spring Festival")
+    repository.touch()
+    assert repository.competition_version("Spring Festival") == version
+    repository.touch(repository.competition_by_name("Spring Festival"))
+    assert repository.competition_version("Spring Festival") == (
+        repository.version
+    )
+
+
+def test_clubs_page():
+    repository = make_repository()
+    repository.add_club(Club(name="Boulder Crew", email="b@crew.com", points=3))
+    assert [c.name for c in repository.clubs_page(limit=2)] == [
+        "Boulder Crew", "Iron Temple"
+    ]
+    assert [c.name for c in repository.clubs_page("Iron Temple", 2)] == [
+        "Simply Lift"
+    ]
+    assert repository.clubs_page("Simply Lift") == []
+
+
+def test_competitions_page_upcoming_then_past():
+    competitions = [
+        Competition(name=f"Competition {year}", date=datetime(year, 1, 1),
+                    number_of_places=5)
+        for year in range(2020, 2025)
+    ]
+    repository = Repository([], competitions)
+    now = datetime(2022, 6, 1)
+    assert repository.competitions_page(now, limit=2) == (
+        [competitions[3], competitions[4]], []
+    )
+    assert repository.competitions_page(now, "Competition 2024", 2) == (
+        [], [competitions[0], competitions[1]]
+    )
+    assert repository.competitions_page(now, "Competition 2021") == (
+        [], [competitions[2]]
+    )
+    assert repository.competitions_page(now, "Unknown", 1) == (
+        [competitions[3]], []
+    )
+
+
+def test_changed_since():
+    repository = make_repository()
+    version = repository.version
+    club = repository.club_by_name("Iron Temple")
+    competition = repository.competition_by_name("Spring Festival")
+    repository.touch(competition, club)
+    assert repository.changed_since(version) == ([club], [competition])
+    assert repository.changed_since(repository.version) == ([], [])
+    repository.load(repository.clubs[:], repository.competitions[:])
+    assert repository.changed_since(version) is None
+
+
+def test_remove_club_and_competition():
+    repository = make_repository()
+    version = repository.version
+    club = repository.club_by_name("Iron Temple")
+    competition = repository.competition_by_name("Spring Festival")
+    repository.remove_club(club)
+    repository.remove_competition(competition)
+    assert repository.club_by_email("admin@irontemple.com") is None
+    assert repository.club_by_name("Iron Temple") is None
+    assert repository.clubs_page() == [repository.club_by_name("Simply Lift")]
+    assert repository.competition_by_name("Spring Festival") is None
+    assert repository.competitions == []
+    assert repository.changed_since(version) is None
+
+
+def test_set_club_email():
+    repository = make_repository()
+    club = repository.club_by_name("Iron Temple")
+    repository.set_club_email(club, "coach@irontemple.com")
+    assert repository.club_by_email("admin@irontemple.com") is None
+    assert repository.club_by_email("coach@irontemple.com") is club
+
+
+def make_leaderboard():
+    clubs = [
+        Club(name="Simply Lift", email="john@simplylift.co", points=13),
+        Club(name="Iron Temple", email="admin@irontemple.com", points=4),
+        Club(name="She Lifts", email="kate@shelifts.co.uk", points=13),
+        Club(name="Big Lift", email="big@lift.com", points=20),
+    ]
+    return Repository(clubs, [])
+
+
+def ranked_names(ranked):
+    return [(rank, club.name) for rank, club in ranked]
+
+
+def test_leaderboard():
+    repository = make_leaderboard()
+    assert ranked_names(repository.leaderboard()) == [
+        (1, "Big Lift"), (2, "She Lifts"), (2, "Simply Lift"),
+        (4, "Iron Temple"),
+    ]
+
+
+def test_leaderboard_page():
+    repository = make_leaderboard()
+    assert ranked_names(repository.leaderboard(limit=2)) == [
+        (1, "Big Lift"), (2, "She Lifts"),
+    ]
+    assert ranked_names(repository.leaderboard("She Lifts", 2)) == [
+        (2, "Simply Lift"), (4, "Iron Temple"),
+    ]
+
+
+def test_leaderboard_follows_points():
+    repository = make_leaderboard()
+    club = repository.club_by_name("Big Lift")
+    club.points = 1
+    repository.touch(club=club)
+    assert repository.rank(club) == 4
+    assert repository.rank(repository.club_by_name("Simply Lift")) == 1
+    repository.add_club(Club(name="New", email="new@lift.com", points=30))
+    repository.remove_club(repository.club_by_name("Iron Temple"))
+    assert ranked_names(repository.leaderboard()) == [
+        (1, "New"), (2, "She Lifts"), (2, "Simply Lift"), (4, "Big Lift"),
+    ]
+
+
+def test_leaderboard_read_while_touched():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    clubs = [
+        Club(name=f"Club {i}", email=f"club{i}@lift.com", points=i)
+        for i in range(2000)
+    ]
+    repository = Repository(clubs, [])
+    done = threading.Event()
+
+    def touch():
+        i = 0
+        while not done.is_set():
+            club = clubs[i % len(clubs)]
+            club.points = (club.points + 997) % 3000
+            repository.touch(club=club)
+            i += 1
+
+    toucher = threading.Thread(target=touch)
+    toucher.start()
+    try:
+        for _ in range(50000):
+            assert len(repository.leaderboard("Club 5", 50)) <= 50
+            assert repository.rank(clubs[0]) >= 1
+    finally:
+        done.set()
+        toucher.join()
+        sys.setswitchinterval(interval)
+
+
+def test_pages_read_while_dates_change():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    competitions = [
+        Competition(name=f"Competition {i}", date=datetime(2030, 1, 1 + i),
+                    number_of_places=1)
+        for i in range(20)
+    ]
+    repository = Repository([], competitions)
+    now = datetime(2030, 1, 10)
+    done = threading.Event()
+
+    def move():
+        i = 0
+        while not done.is_set():
+            repository.set_competition_date(
+                competitions[5], datetime(2030, 1, 1 + (i * 7) % 20)
+            )
+            i += 1
+
+    mover = threading.Thread(target=move)
+    mover.start()
+    try:
+        for _ in range(20000):
+            upcoming, past = repository.competitions_page(
+                now, "Competition 5", 5
+            )
+            assert len(upcoming) + len(past) <= 5
+            assert len(repository.search_competitions("comp", now=now)) <= 20
+    finally:
+        done.set()
+        mover.join()
+        sys.setswitchinterval(interval)
+
+
+def test_rank_unknown_club():
+    repository = make_leaderboard()
+    club = Club(name="Unknown", email="unknown@lift.com", points=3)
+    assert repository.rank(club) is None
+
+
+def make_search():
+    competitions = [
+        Competition(name="Spring Festival", date=datetime(2020, 3, 27, 10, 0),
+                    number_of_places=25),
+        Competition(name="spring classic", date=datetime(2030, 4, 1, 10, 0),
+                    number_of_places=0),
+        Competition(name="Sprint Cup", date=datetime(2030, 5, 1, 10, 0),
+                    number_of_places=8),
+        Competition(name="Fall Classic", date=datetime(2030, 10, 22, 13, 0),
+                    number_of_places=13),
+    ]
+    return Repository(make_repository().clubs, competitions)
+
+
+def search_names(models):
+    return [model.name for model in models]
+
+
+def test_search_competitions():
+    repository = make_search()
+    assert search_names(repository.search_competitions("SPRING")) == [
+        "spring classic", "Spring Festival",
+    ]
+    assert search_names(repository.search_competitions("sprin", 2)) == [
+        "spring classic", "Spring Festival",
+    ]
+    assert search_names(repository.search_competitions("x")) == []
+
+
+def test_search_competitions_filters():
+    repository = make_search()
+    now = datetime(2025, 1, 1)
+    assert search_names(repository.search_competitions("spr", now=now)) == [
+        "spring classic", "Sprint Cup",
+    ]
+    assert search_names(
+        repository.search_competitions("spr", now=now, available=True)
+    ) == ["Sprint Cup"]
+
+
+def test_search_follows_changes():
+    repository = make_search()
+    repository.add_club(Club(name="Iron Giants", email="giants@iron.com",
+                             points=3))
+    repository.remove_club(repository.club_by_name("Iron Temple"))
+    assert search_names(repository.search_clubs("iron")) == ["Iron Giants"]
+    repository.remove_competition(repository.competition_by_name("Sprint Cup"))
+    assert search_names(repository.search_competitions("sprint")) == []
+
+
+def test_search_upcoming_competitions():
+    repository = make_search()
+    now = datetime(2030, 4, 15)
+    assert search_names(repository.search_competitions("spr", now=now)) == [
+        "Sprint Cup",
+    ]
+    competition = repository.competition_by_name("spring classic")
+    repository.set_competition_date(competition, datetime(2031, 1, 1))
+    repository.add_competition(Competition(
+        name="Spring Open", date=datetime(2030, 1, 1), number_of_places=3,
+    ))
+    assert search_names(repository.search_competitions("spr", now=now)) == [
+        "spring classic", "Sprint Cup",
+    ]
+    later = datetime(2030, 6, 1)
+    assert search_names(repository.search_competitions("spr", now=later)) == [
+        "spring classic",
+    ]
@@ -0,0 +1,24 @@
+import pytest
+
+from server import app
+from serve import main, warm_up
+
+
+def test_warm_up_compiles_templates():
+    app.jinja_env.cache.clear()
+    count = warm_up(app)
+    assert count == len(app.jinja_env.list_templates()) > 0
+    assert len(app.jinja_env.cache) == count
+
+
+@pytest.mark.parametrize("argv", [["--workers", "0"], ["--connections", "0"]])
+def test_main_refuses_no_worker_or_connection(argv):
+    with pytest.raises(SystemExit):
+        main(argv)
+
+
+def test_main_refuses_workers_without_sqlite(monkeypatch, capsys):
+    monkeypatch.delenv("GUDLFT_STORAGE", raising=False)
+    with pytest.raises(SystemExit):
+        main(["--workers", "2"])
+    assert "GUDLFT_STORAGE=sqlite" in capsys.readouterr().err
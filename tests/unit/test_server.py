@@ -1,8 +1,13 @@
 import json
+import os
+import sys
+import threading
 from datetime import datetime, timedelta
 
 import pytest
 
+import server
+
 from server import (
     find_competition_by_name,
     find_club_by_name,
@@ -17,8 +22,19 @@ from server import (
     update_clubs,
     update_competitions,
     too_much_athlete,
-    update_booking, find_competition_in_club_booking
+    update_booking, find_competition_in_club_booking,
+    reload_data,
+    compact,
+    booking_refusal,
+    check_and_book,
+    refresh_data,
+    reload_file,
+    reload_changed_files,
 )
+from models import Booking, Club, Competition
+from persistence import PersistenceWriter
+from snapshot import pack_data, read_binary_snapshot, write_binary_snapshot
+from storage import SqliteStorage
 
 
 def test_find_competition_by_name():
@@ -93,8 +109,8 @@ def test_book_places(fake_data):
     club = clubs[0]
     competition = competitions[0]
     book_places(club, competition, 4)
-    assert club["points"] == "16"
-    assert competition["numberOfPlaces"] == "21"
+    assert club.points == 16
+    assert competition.number_of_places == 21
 
 
 def test_book_places_wrong(fake_data):
@@ -102,17 +118,17 @@ def test_book_places_wrong(fake_data):
     club = clubs[0]
     competition = competitions[0]
     book_places(club, competition, 4)
-    assert not club["points"] == "20"
-    assert not competition["numberOfPlaces"] == "25"
+    assert not club.points == 20
+    assert not competition.number_of_places == 25
 
 
 def test_is_past():
-    assert is_past("2020-03-27 10:00:00")
+    assert is_past(datetime(2020, 3, 27, 10, 0))
 
 
 def test_is_past_wrong():
     tomorrow = datetime.today() + timedelta(days=1)
-    assert not is_past(tomorrow.strftime("%Y-%m-%d %H:%M:%S"))
+    assert not is_past(tomorrow)
 
 
 def test_loading_clubs(tmp_path):
@@ -123,7 +139,9 @@ def test_loading_clubs(tmp_path):
     }
     file = tmp_path / "clubs.json"
     file.write_text(json.dumps(club_data))
-    assert load_clubs(file) == club_data["clubs"]
+    assert load_clubs(file) == [
+        Club(name="Simply Lift", email="john@simplylift.co", points=13)
+    ]
 
 
 def test_loading_clubs_wrong_path(tmp_path):
@@ -150,7 +168,13 @@ def test_loading_competitions(tmp_path):
     }
     file = tmp_path / "competitions.json"
     file.write_text(json.dumps(competition_data))
-    assert load_competitions(file) == competition_data["competitions"]
+    assert load_competitions(file) == [
+        Competition(
+            name="Spring Festival",
+            date=datetime(2020, 3, 27, 10, 0),
+            number_of_places=25,
+        )
+    ]
 
 
 def test_loading_competitions_wrong_path(tmp_path):
@@ -171,12 +195,13 @@ def test_update_clubs(tmp_path, mocker):
             {"name": "Simply Lift", "email": "john@simplylift.co", "points": "13"}
         ]
     }
-    mocker.patch("server.clubs", club_data["clubs"])
     file = tmp_path / "clubs.json"
     file.write_text(json.dumps(club_data))
-    club_data["clubs"][0]["points"] = "16"
+    clubs = load_clubs(file)
+    mocker.patch("server.clubs", clubs)
+    clubs[0].points = 16
     update_clubs(file)
-    assert load_clubs(file) == club_data["clubs"]
+    assert load_clubs(file) == clubs
 
 
 def test_update_competitions(tmp_path, mocker):
@@ -189,12 +214,13 @@ def test_update_competitions(tmp_path, mocker):
             }
         ]
     }
-    mocker.patch("server.competitions", competition_data["competitions"])
     file = tmp_path / "competitions.json"
     file.write_text(json.dumps(competition_data))
-    competition_data["competitions"][0]["numberOfPlaces"] = "16"
+    competitions = load_competitions(file)
+    mocker.patch("server.competitions", competitions)
+    competitions[0].number_of_places = 16
     update_competitions(file)
-    assert load_competitions(file) == competition_data["competitions"]
+    assert load_competitions(file) == competitions
 
 
 def test_too_much_athlete(fake_data):
@@ -208,7 +234,7 @@ def test_too_much_athlete_wrong(fake_data):
     clubs, competitions = fake_data
     club = clubs[0]
     competition = competitions[0]
-    club["bookings"].append({competition['name'] : 12})
+    club.bookings[competition.name] = 12
     assert too_much_athlete(club, competition, 5) == True
 
 
@@ -216,16 +242,393 @@ def test_update_booking(fake_data):
     clubs, competitions = fake_data
     club = clubs[0]
     competition = competitions[0]
-    update_booking(club, competition['name'], 5)
-    booking = find_competition_in_club_booking(competition['name'], club)
-    assert booking[competition['name']] == 5
+    update_booking(club, competition.name, 5)
+    booking = find_competition_in_club_booking(competition.name, club)
+    assert booking == 5
 
 
 def test_update_booking_already_exists(fake_data):
     clubs, competitions = fake_data
     club = clubs[0]
     competition = competitions[0]
-    club["bookings"].append({competition['name']: 5})
-    update_booking(club, competition['name'], 5)
-    booking = find_competition_in_club_booking(competition['name'], club)
-    assert booking[competition['name']] == 10
+    club.bookings[competition.name] = 5
+    update_booking(club, competition.name, 5)
+    booking = find_competition_in_club_booking(competition.name, club)
+    assert booking == 10
+
+
+def test_book_places_appends_journal(fake_data):
+    clubs, competitions = fake_data
+    book_places(clubs[0], competitions[0], 3)
+    records = list(server.journal.records())
+    assert records == [(1, Booking("Simply Lift", "Spring Festival", 3))]
+
+
+def test_book_places_compacts_journal(fake_data, mocker):
+    clubs, competitions = fake_data
+    server.journal.compact_every = 2
+    book_places(clubs[0], competitions[0], 1)
+    server.update_clubs.assert_not_called()
+    book_places(clubs[0], competitions[0], 1)
+    server.persistence.close()
+    server.update_clubs.assert_called_once()
+    server.update_competitions.assert_called_once()
+    assert list(server.journal.records()) == []
+
+
+def test_shutdown_writes_pending_bookings(fake_data, mocker):
+    clubs, competitions = fake_data
+    mocker.patch("server.persistence", PersistenceWriter(
+        server.journal, server.compact, mode="async", window_ms=1000
+    ))
+    book_places(clubs[0], competitions[0], 2)
+    server.shutdown()
+    records = list(server.journal.records())
+    assert records == [(1, Booking("Simply Lift", "Spring Festival", 2))]
+
+
+def write_snapshots(path, clubs_seq=0, competitions_seq=0):
+    (path / "clubs.json").write_text(json.dumps({
+        "clubs": [{"name": "Simply Lift", "email": "john@simplylift.co",
+                   "points": "13", "bookings": []}],
+        "journalSeq": clubs_seq,
+    }))
+    (path / "competitions.json").write_text(json.dumps({
+        "competitions": [{"name": "Spring Festival",
+                          "date": "2020-03-27 10:00:00",
+                          "numberOfPlaces": "25"}],
+        "journalSeq": competitions_seq,
+    }))
+
+
+def test_reload_data_replays_journal(fake_data, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_snapshots(tmp_path)
+    server.journal.append(Booking("Simply Lift", "Spring Festival", 2))
+    server.journal.append(Booking("Simply Lift", "Spring Festival", 3))
+    reload_data()
+    club = find_club_by_name("Simply Lift")
+    assert club.points == 8
+    assert club.bookings == {"Spring Festival": 5}
+    assert find_competition_by_name("Spring Festival").number_of_places == 20
+
+
+def test_reload_data_skips_records_in_snapshot(fake_data, tmp_path,
+                                               monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Crash between the two snapshot writes of a compaction
+    write_snapshots(tmp_path, clubs_seq=0, competitions_seq=1)
+    server.journal.append(Booking("Simply Lift", "Spring Festival", 2))
+    reload_data()
+    assert find_club_by_name("Simply Lift").points == 11
+    assert find_competition_by_name("Spring Festival").number_of_places == 25
+    assert server.journal.seq == 1
+
+
+def test_compact_writes_journal_seq(tmp_path, monkeypatch, mocker):
+    monkeypatch.chdir(tmp_path)
+    write_snapshots(tmp_path)
+    mocker.patch("server.clubs", load_clubs())
+    mocker.patch("server.competitions", load_competitions())
+    mocker.patch("server.journal",
+                 server.BookingJournal(tmp_path / "bookings.journal"))
+    server.journal.append(Booking("Simply Lift", "Spring Festival", 2))
+    compact()
+    with open(tmp_path / "clubs.json") as file:
+        assert json.load(file)["journalSeq"] == 1
+    assert list(server.journal.records()) == []
+
+
+def test_reload_data_uses_binary_snapshot(fake_data, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_snapshots(tmp_path)
+    clubs = [Club(name="Simply Lift", email="john@simplylift.co", points=9)]
+    write_binary_snapshot(
+        "gudlft.snapshot", pack_data(clubs, []),
+        ["clubs.json", "competitions.json"], 0,
+    )
+    reload_data()
+    assert find_club_by_name("Simply Lift").points == 9
+
+    # Edited by hand since
+    write_snapshots(tmp_path)
+    os.utime("clubs.json", ns=(0, 0))
+    reload_data()
+    assert find_club_by_name("Simply Lift").points == 13
+
+
+def test_compact_writes_binary_snapshot(tmp_path, monkeypatch, mocker):
+    monkeypatch.chdir(tmp_path)
+    write_snapshots(tmp_path)
+    mocker.patch("server.clubs", load_clubs())
+    mocker.patch("server.competitions", load_competitions())
+    mocker.patch("server.journal",
+                 server.BookingJournal(tmp_path / "bookings.journal"))
+    server.journal.append(Booking("Simply Lift", "Spring Festival", 2))
+    compact()
+    assert read_binary_snapshot(
+        server.snapshot_path, ["clubs.json", "competitions.json"]
+    ) == (server.clubs, server.competitions, 1)
+
+
+def test_reload_file_keeps_bookings(fake_data, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_snapshots(tmp_path)
+    reload_data()
+    book_places(find_club_by_name("Simply Lift"),
+                find_competition_by_name("Spring Festival"), 2)
+    (tmp_path / "competitions.json").write_text(json.dumps({
+        "competitions": [
+            {"name": "Spring Festival", "date": "2020-03-27 10:00:00",
+             "numberOfPlaces": "30"},
+            {"name": "Fall Classic", "date": "2020-10-22 13:30:00",
+             "numberOfPlaces": "13"},
+        ],
+        "journalSeq": 0,
+    }))
+    reload_file("competitions.json")
+    assert find_competition_by_name("Spring Festival").number_of_places == 28
+    assert find_competition_by_name("Fall Classic").number_of_places == 13
+
+    (tmp_path / "clubs.json").write_text(json.dumps({
+        "clubs": [{"name": "Iron Temple", "email": "admin@irontemple.com",
+                   "points": "4", "bookings": []},
+                  {"name": "Simply Lift", "email": "kate@simplylift.co",
+                   "points": "20", "bookings": []}],
+        "journalSeq": 0,
+    }))
+    reload_file("clubs.json")
+    club = find_club_by_email("kate@simplylift.co")
+    assert club.points == 18
+    assert club.bookings == {"Spring Festival": 2}
+    assert find_club_by_email("john@simplylift.co") is None
+    assert find_club_by_name("Iron Temple").points == 4
+
+
+def test_reload_file_removes_records(fake_data, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_snapshots(tmp_path)
+    reload_data()
+    (tmp_path / "competitions.json").write_text(json.dumps({
+        "competitions": [], "journalSeq": 0,
+    }))
+    reload_file("competitions.json")
+    assert find_competition_by_name("Spring Festival") is None
+    assert server.store.competitions == []
+
+
+def test_reload_file_refuses_stale_copy(fake_data, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_snapshots(tmp_path, clubs_seq=3, competitions_seq=3)
+    reload_data()
+    write_snapshots(tmp_path)
+    reload_file("clubs.json")
+    assert find_club_by_name("Simply Lift").points == 13
+    (tmp_path / "clubs.json").write_text(json.dumps({
+        "clubs": [], "journalSeq": 0,
+    }))
+    reload_file("clubs.json")
+    assert find_club_by_name("Simply Lift") is not None
+
+
+def test_reload_changed_files(fake_data, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(server.app.config, "HOT_RELOAD_INTERVAL", 0)
+    write_snapshots(tmp_path)
+    reload_data()
+    (tmp_path / "competitions.json").write_text(json.dumps({
+        "competitions": [{"name": "Spring Festival",
+                          "date": "2020-03-27 10:00:00",
+                          "numberOfPlaces": "5"}],
+        "journalSeq": 0,
+    }))
+    os.utime("competitions.json", ns=(0, 0))
+    with server.app.test_request_context():
+        reload_changed_files()
+    wait_for_reloads()
+    assert find_competition_by_name("Spring Festival").number_of_places == 5
+    # Not reloaded again until edited
+    find_competition_by_name("Spring Festival").number_of_places = 4
+    with server.app.test_request_context():
+        reload_changed_files()
+    wait_for_reloads()
+    assert find_competition_by_name("Spring Festival").number_of_places == 4
+
+
+def wait_for_reloads():
+    for thread in threading.enumerate():
+        if thread.name == "hot-reload":
+            thread.join()
+
+
+def test_reload_changed_files_once_at_a_time(fake_data, tmp_path,
+                                             monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(server.app.config, "HOT_RELOAD_INTERVAL", 0)
+    write_snapshots(tmp_path)
+    reload_data()
+    os.utime("clubs.json", ns=(0, 0))
+    parsing = threading.Event()
+    parsed = threading.Event()
+    reloaded = []
+
+    def slow_reload(path):
+        reloaded.append(path)
+        parsing.set()
+        parsed.wait(10)
+
+    monkeypatch.setattr(server, "reload_file", slow_reload)
+    with server.app.test_request_context():
+        reload_changed_files()
+        assert parsing.wait(10)
+        # The request noticing the edit did not wait, later ones do not
+        # start another reload of the same file
+        reload_changed_files()
+    parsed.set()
+    wait_for_reloads()
+    with server.app.test_request_context():
+        reload_changed_files()
+    wait_for_reloads()
+    assert reloaded == ["clubs.json"]
+
+
+def test_booking_refusal(fake_data):
+    clubs, competitions = fake_data
+    assert booking_refusal(clubs[0], competitions[0], 2) is None
+    assert booking_refusal(clubs[0], competitions[0], 13) == (
+        "invalid", "Place must be between 0 and 12"
+    )
+    competitions[0].number_of_places = 1
+    assert booking_refusal(clubs[0], competitions[0], 2) == (
+        "places", "There is only 1 places available"
+    )
+
+
+def test_check_and_book_refused(fake_data):
+    clubs, competitions = fake_data
+    clubs[0].points = 1
+    error = check_and_book(clubs[0], competitions[0], 2)
+    assert error == "You have only 1 points available"
+    assert competitions[0].number_of_places == 25
+    assert list(server.journal.records()) == []
+
+
+def test_check_and_book_no_oversell(fake_data):
+    clubs, competitions = fake_data
+    clubs[:] = [
+        Club(name=f"Club {i}", email=f"club{i}@gudlft.com", points=100)
+        for i in range(20)
+    ]
+    competition = competitions[0]
+    competition.number_of_places = 50
+    server.store.load(clubs, competitions)
+    # Switch threads as often as possible to provoke interleavings
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    booked = []
+    start = threading.Barrier(len(clubs))
+
+    def book_until_refused(club):
+        start.wait()
+        while check_and_book(club, competition, 1) is None:
+            booked.append(1)
+
+    threads = [threading.Thread(target=book_until_refused, args=(club,))
+               for club in clubs]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert competition.number_of_places == 0
+    assert len(booked) == 50
+    assert sum(100 - club.points for club in clubs) == 50
+    assert len(list(server.journal.records())) == 50
+
+
+@pytest.fixture
+def sqlite_data(fake_data, tmp_path, mocker):
+    clubs, competitions = fake_data
+    storage = SqliteStorage(tmp_path / "gudlft.db")
+    storage.import_data(clubs, competitions)
+    mocker.patch("server.storage", storage)
+    yield clubs, competitions, storage
+    storage.close()
+
+
+def test_check_and_book_sqlite(sqlite_data):
+    clubs, competitions, storage = sqlite_data
+    assert check_and_book(clubs[0], competitions[0], 2) is None
+    assert clubs[0].points == 18
+    stored_clubs, stored_competitions = storage.load()
+    assert stored_clubs[0].points == 18
+    assert stored_competitions[0].number_of_places == 23
+    assert list(server.journal.records()) == []
+
+
+def test_check_and_book_sqlite_concurrent_refresh(sqlite_data, mocker):
+    clubs, competitions, storage = sqlite_data
+    book_many = storage.book_many
+    refreshes = []
+
+    def commit_then_refresh(bookings):
+        committed = book_many(bookings)
+        # Another request refreshes between the commit and the update
+        refresh = threading.Thread(target=refresh_data)
+        refresh.start()
+        refresh.join(timeout=0.2)
+        refreshes.append(refresh)
+        return committed
+
+    mocker.patch.object(storage, "book_many", commit_then_refresh)
+    assert check_and_book(clubs[0], competitions[0], 2) is None
+    refreshes[0].join()
+    refresh_data()
+    stored_clubs, stored_competitions = storage.load()
+    assert clubs[0].points == stored_clubs[0].points == 18
+    assert competitions[0].number_of_places == 23
+    assert stored_competitions[0].number_of_places == 23
+
+
+def test_check_and_book_sqlite_takes_committed_values(sqlite_data, tmp_path):
+    clubs, competitions, storage = sqlite_data
+    storage.load()
+    other = SqliteStorage(tmp_path / "gudlft.db")
+    other.book(Booking("Simply Lift", "Spring Festival", 5))
+    other.close()
+    assert check_and_book(clubs[0], competitions[0], 2) is None
+    assert clubs[0].points == 13
+    assert clubs[0].bookings == {"Spring Festival": 7}
+    assert competitions[0].number_of_places == 18
+
+
+def test_check_and_book_sqlite_conflict(sqlite_data, tmp_path):
+    clubs, competitions, storage = sqlite_data
+    # Another worker takes the places first
+    other = SqliteStorage(tmp_path / "gudlft.db")
+    other.import_data(
+        [Club(name="Simply Lift", email="john@simplylift.co", points=20),
+         Club(name="Iron Temple", email="admin@irontemple.com", points=30)],
+        [Competition(name="Spring Festival", date=competitions[0].date,
+                     number_of_places=12)],
+    )
+    for _ in range(2):
+        other.book(Booking("Iron Temple", "Spring Festival", 5))
+    error = check_and_book(clubs[0], competitions[0], 4)
+    assert error == "There is only 2 places available"
+    assert competitions[0].number_of_places == 2
+    other.close()
+
+
+def test_refresh_data_adds_new_records(sqlite_data):
+    clubs, competitions, storage = sqlite_data
+    storage.load()
+    storage.import_data(
+        clubs + [Club(name="Iron Temple", email="admin@irontemple.com",
+                      points=4)],
+        competitions,
+    )
+    refresh_data()
+    assert find_club_by_email("admin@irontemple.com").points == 4
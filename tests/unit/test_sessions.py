@@ -0,0 +1,122 @@
+import time
+
+from flask import Flask, session
+
+from sessions import (
+    MemorySessionStore,
+    ServerSideSessionInterface,
+    SqliteSessionStore,
+)
+from storage import SqliteStorage
+
+
+def test_memory_store_get_set_delete():
+    store = MemorySessionStore()
+    store.set("sid", {"club": "Simply Lift"})
+    assert store.get("sid") == {"club": "Simply Lift"}
+    store.delete("sid")
+    assert store.get("sid") is None
+
+
+def test_memory_store_lru_eviction():
+    store = MemorySessionStore(max_entries=2)
+    store.set("a", {})
+    store.set("b", {})
+    store.get("a")
+    store.set("c", {})
+    assert store.get("b") is None
+    assert store.get("a") == {}
+    assert len(store) == 2
+
+
+def test_memory_store_ttl(mocker):
+    now = time.monotonic()
+    monotonic = mocker.patch("sessions.time.monotonic", return_value=now)
+    store = MemorySessionStore(ttl=10)
+    store.set("sid", {})
+    monotonic.return_value = now + 9
+    assert store.get("sid") == {}
+    # Reading the session restarted its lifetime
+    monotonic.return_value = now + 18
+    assert store.get("sid") == {}
+    monotonic.return_value = now + 29
+    assert store.get("sid") is None
+
+
+def test_sqlite_store(tmp_path, mocker):
+    storage = SqliteStorage(tmp_path / "gudlft.db")
+    store = SqliteSessionStore(storage, ttl=10)
+    store.set("sid", {"club": "Simply Lift"})
+    assert store.get("sid") == {"club": "Simply Lift"}
+    # Visible from another worker
+    other = SqliteSessionStore(SqliteStorage(tmp_path / "gudlft.db"))
+    assert other.get("sid") == {"club": "Simply Lift"}
+    mocker.patch("sessions.time.time", return_value=time.time() + 11)
+    assert store.get("sid") is None
+    store.delete("sid")
+    storage.close()
+
+
+def make_app(store):
+    app = Flask(__name__)
+    app.session_interface = ServerSideSessionInterface(store)
+
+    @app.route("/login")
+    def login():
+        session.regenerate()
+        session["club"] = "Simply Lift"
+        return ""
+
+    @app.route("/whoami")
+    def whoami():
+        return session.get("club", "")
+
+    @app.route("/logout")
+    def logout():
+        session.clear()
+        return ""
+
+    return app
+
+
+def test_cookie_only_holds_id():
+    store = MemorySessionStore()
+    client = make_app(store).test_client()
+    client.get("/login")
+    sid = client.get_cookie("session").value
+    assert "Simply Lift" not in sid
+    assert store.get(sid) == {"club": "Simply Lift"}
+    assert client.get("/whoami").data == b"Simply Lift"
+
+
+def test_no_cookie_for_empty_session():
+    client = make_app(MemorySessionStore()).test_client()
+    response = client.get("/whoami")
+    assert "Set-Cookie" not in response.headers
+
+
+def test_unknown_id_starts_new_session():
+    client = make_app(MemorySessionStore()).test_client()
+    client.set_cookie("session", "forged")
+    assert client.get("/whoami").data == b""
+
+
+def test_clear_deletes_session():
+    store = MemorySessionStore()
+    client = make_app(store).test_client()
+    client.get("/login")
+    client.get("/logout")
+    assert len(store) == 0
+    assert client.get_cookie("session") is None
+
+
+def test_login_regenerates_id():
+    store = MemorySessionStore()
+    client = make_app(store).test_client()
+    client.get("/login")
+    planted = client.get_cookie("session").value
+    client.get("/login")
+    sid = client.get_cookie("session").value
+    assert sid != planted
+    assert store.get(planted) is None
+    assert store.get(sid) == {"club": "Simply Lift"}
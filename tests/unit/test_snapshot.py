@@ -0,0 +1,78 @@
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from models import Club, Competition
+from snapshot import (
+    main,
+    pack_data,
+    read_binary_snapshot,
+    write_binary_snapshot,
+)
+
+CLUBS = [
+    Club(name="Simply Lift", email="john@simplylift.co", points=13,
+         bookings={"Fall Classic": 2}),
+    Club(name="Iron Temple", email="admin@irontemple.com", points=4),
+]
+COMPETITIONS = [
+    Competition(name="Fall Classic", date=datetime(2020, 10, 22, 13, 30),
+                number_of_places=13),
+]
+
+
+@pytest.fixture
+def sources(tmp_path):
+    clubs = tmp_path / "clubs.json"
+    clubs.write_text(json.dumps(
+        {"clubs": [c.to_dict() for c in CLUBS], "journalSeq": 4}
+    ))
+    competitions = tmp_path / "competitions.json"
+    competitions.write_text(json.dumps(
+        {"competitions": [c.to_dict() for c in COMPETITIONS],
+         "journalSeq": 4}
+    ))
+    return [clubs, competitions]
+
+
+def test_round_trip(tmp_path, sources):
+    path = tmp_path / "gudlft.snapshot"
+    write_binary_snapshot(path, pack_data(CLUBS, COMPETITIONS), sources, 4)
+    assert read_binary_snapshot(path, sources) == (CLUBS, COMPETITIONS, 4)
+
+
+def test_missing(tmp_path, sources):
+    assert read_binary_snapshot(tmp_path / "gudlft.snapshot", sources) is None
+
+
+def test_stale_when_source_changes(tmp_path, sources):
+    path = tmp_path / "gudlft.snapshot"
+    write_binary_snapshot(path, pack_data(CLUBS, COMPETITIONS), sources, 4)
+    stat = os.stat(sources[1])
+    os.utime(sources[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert read_binary_snapshot(path, sources) is None
+
+
+def test_corrupted(tmp_path, sources, caplog):
+    path = tmp_path / "gudlft.snapshot"
+    write_binary_snapshot(path, pack_data(CLUBS, COMPETITIONS), sources, 4)
+    content = bytearray(path.read_bytes())
+    content[-3] ^= 0xFF
+    path.write_bytes(bytes(content))
+    assert read_binary_snapshot(path, sources) is None
+    assert "Checksum mismatch" in caplog.text
+
+
+def test_not_a_snapshot(tmp_path, sources):
+    path = tmp_path / "gudlft.snapshot"
+    path.write_bytes(b"{}")
+    assert read_binary_snapshot(path, sources) is None
+
+
+def test_main_builds_from_json(tmp_path, sources):
+    path = tmp_path / "gudlft.snapshot"
+    main(["--snapshot", str(path), "--clubs", str(sources[0]),
+          "--competitions", str(sources[1])])
+    assert read_binary_snapshot(path, sources) == (CLUBS, COMPETITIONS, 4)
@@ -0,0 +1,194 @@
+import gc
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+import pytest
+
+from models import Booking, Club, Competition
+from storage import BookingConflict, SqliteStorage, main
+
+CLUBS = [
+    Club(name="Simply Lift", email="john@simplylift.co", points=13,
+         bookings={"Fall Classic": 2}),
+    Club(name="Iron Temple", email="admin@irontemple.com", points=4),
+]
+COMPETITIONS = [
+    Competition(name="Fall Classic", date=datetime(2020, 10, 22, 13, 30),
+                number_of_places=13),
+    Competition(name="Winter Coming", date=datetime(2025, 12, 15, 13, 30),
+                number_of_places=16),
+]
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SqliteStorage(tmp_path / "gudlft.db")
+    storage.import_data(CLUBS, COMPETITIONS)
+    yield storage
+    storage.close()
+
+
+def test_wal_mode(storage):
+    mode = storage.connection().execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode == "wal"
+
+
+def test_import_and_load(storage):
+    clubs, competitions = storage.load()
+    assert clubs == CLUBS
+    assert competitions == COMPETITIONS
+
+
+def test_is_empty(tmp_path, storage):
+    assert not storage.is_empty()
+    assert SqliteStorage(tmp_path / "other.db").is_empty()
+
+
+def test_connection_per_thread(storage):
+    connections = []
+    thread = threading.Thread(
+        target=lambda: connections.append(storage.connection())
+    )
+    thread.start()
+    thread.join()
+    assert connections[0] is not storage.connection()
+    assert storage.connection() is storage.connection()
+
+
+def test_connection_closed_when_thread_ends(storage):
+    connections = []
+    threads = [
+        threading.Thread(
+            target=lambda: connections.append(storage.connection())
+        )
+        for _ in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+        thread.join()
+    del threads
+    gc.collect()
+    for connection in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            connection.execute("SELECT 1")
+    assert storage.connection().execute("SELECT 1").fetchone() == (1,)
+
+
+def test_book(storage):
+    storage.book(Booking("Simply Lift", "Winter Coming", 3))
+    clubs, competitions = storage.load()
+    assert clubs[0].points == 10
+    assert clubs[0].bookings == {"Fall Classic": 2, "Winter Coming": 3}
+    assert competitions[1].number_of_places == 13
+
+
+def test_book_adds_to_existing_booking(storage):
+    storage.book(Booking("Simply Lift", "Fall Classic", 3))
+    clubs, _ = storage.load()
+    assert clubs[0].bookings == {"Fall Classic": 5}
+
+
+@pytest.mark.parametrize("club, competition, places", [
+    ("Iron Temple", "Winter Coming", 5),
+    ("Simply Lift", "Fall Classic", 11),
+    ("Simply Lift", "Unknown", 1),
+])
+def test_book_conflict_rolls_back(storage, club, competition, places):
+    before = storage.load()
+    with pytest.raises(BookingConflict):
+        storage.book(Booking(club, competition, places))
+    assert storage.load() == before
+
+
+def test_book_many(storage):
+    storage.book_many([
+        Booking("Simply Lift", "Winter Coming", 3),
+        Booking("Simply Lift", "Fall Classic", 1),
+    ])
+    clubs, competitions = storage.load()
+    assert clubs[0].points == 9
+    assert clubs[0].bookings == {"Fall Classic": 3, "Winter Coming": 3}
+
+
+def test_book_many_all_or_nothing(storage):
+    before = storage.load()
+    with pytest.raises(BookingConflict):
+        storage.book_many([
+            Booking("Iron Temple", "Winter Coming", 3),
+            Booking("Iron Temple", "Fall Classic", 3),
+        ])
+    assert storage.load() == before
+
+
+def test_book_not_enough_places(storage):
+    storage.import_data(
+        [Club(name="Simply Lift", email="john@simplylift.co", points=100)],
+        [Competition(name="Fall Classic", date=datetime(2020, 10, 22, 13, 30),
+                     number_of_places=2)],
+    )
+    with pytest.raises(BookingConflict):
+        storage.book(Booking("Simply Lift", "Fall Classic", 3))
+
+
+def test_changes_from_other_worker(tmp_path, storage):
+    storage.load()
+    assert storage.changes() == ([], [])
+    other = SqliteStorage(tmp_path / "gudlft.db")
+    other.book(Booking("Iron Temple", "Winter Coming", 2))
+    clubs, competitions = storage.changes()
+    assert clubs == [Club(name="Iron Temple", email="admin@irontemple.com",
+                          points=2, bookings={"Winter Coming": 2})]
+    assert competitions == [
+        Competition(name="Winter Coming", date=datetime(2025, 12, 15, 13, 30),
+                    number_of_places=14)
+    ]
+    assert storage.changes() == ([], [])
+    other.close()
+
+
+def test_workers_share_places(tmp_path):
+    storage = SqliteStorage(tmp_path / "gudlft.db")
+    storage.import_data(
+        [Club(name=f"Club {i}", email=f"club{i}@gudlft.com", points=100)
+         for i in range(8)],
+        [Competition(name="Winter Coming", date=datetime(2025, 12, 15, 13, 30),
+                     number_of_places=30)],
+    )
+    booked = []
+
+    def worker(club_name):
+        # A storage per thread stands for a worker process
+        worker_storage = SqliteStorage(tmp_path / "gudlft.db")
+        while True:
+            try:
+                worker_storage.book(Booking(club_name, "Winter Coming", 1))
+            except BookingConflict:
+                break
+            booked.append(club_name)
+        worker_storage.close()
+
+    threads = [threading.Thread(target=worker, args=(f"Club {i}",))
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    _, competitions = storage.load()
+    assert competitions[0].number_of_places == 0
+    assert len(booked) == 30
+    storage.close()
+
+
+def test_export_import_json(tmp_path, storage):
+    storage.book(Booking("Simply Lift", "Winter Coming", 1))
+    main(["export", "--database", str(tmp_path / "gudlft.db"),
+          "--clubs", str(tmp_path / "clubs.json"),
+          "--competitions", str(tmp_path / "competitions.json")])
+    exported = json.loads((tmp_path / "clubs.json").read_text())["clubs"]
+    assert exported[0]["points"] == "12"
+    main(["import", "--database", str(tmp_path / "copy.db"),
+          "--clubs", str(tmp_path / "clubs.json"),
+          "--competitions", str(tmp_path / "competitions.json")])
+    assert SqliteStorage(tmp_path / "copy.db").load() == storage.load()
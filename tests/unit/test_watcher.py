@@ -0,0 +1,63 @@
+import os
+
+from watcher import FileWatcher
+
+
+def test_changed_after_edit(tmp_path):
+    file = tmp_path / "competitions.json"
+    file.write_text("{}")
+    watcher = FileWatcher([file])
+    assert [path for path, _ in watcher.changed()] == [file]
+    watcher.remember(file)
+    assert watcher.changed() == []
+    file.write_text('{"competitions": []}')
+    assert [path for path, _ in watcher.changed()] == [file]
+
+
+def test_changed_after_replace(tmp_path):
+    file = tmp_path / "competitions.json"
+    file.write_text("{}")
+    watcher = FileWatcher([file])
+    watcher.remember(file)
+    stat = os.stat(file)
+    replacement = tmp_path / "new.json"
+    replacement.write_text("[]")
+    os.utime(replacement, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(replacement, file)
+    assert [path for path, _ in watcher.changed()] == [file]
+
+
+def test_checked_once_per_interval(tmp_path):
+    file = tmp_path / "competitions.json"
+    file.write_text("{}")
+    watcher = FileWatcher([file])
+    watcher.remember(file)
+    assert watcher.changed(interval=60) == []
+    file.write_text('{"competitions": []}')
+    assert watcher.changed(interval=60) == []
+    assert len(watcher.changed(interval=0)) == 1
+
+
+def test_missing_file_not_reported(tmp_path):
+    watcher = FileWatcher([tmp_path / "competitions.json"])
+    assert watcher.changed() == []
+
+
+def test_not_reported_again_until_remembered(tmp_path):
+    file = tmp_path / "competitions.json"
+    file.write_text("{}")
+    watcher = FileWatcher([file])
+    [(_, current)] = watcher.changed()
+    file.write_text('{"competitions": []}')
+    assert watcher.changed() == []
+    watcher.remember(file, current)
+    assert [path for path, _ in watcher.changed()] == [file]
+
+
+def test_reported_again_once_released(tmp_path):
+    file = tmp_path / "competitions.json"
+    file.write_text("{}")
+    watcher = FileWatcher([file])
+    assert len(watcher.changed()) == 1
+    watcher.release(file)
+    assert len(watcher.changed()) == 1
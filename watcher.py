@@ -0,0 +1,69 @@
+import os
+import threading
+import time
+
+
+def stamp(path):
+    """Return what identifies the current version of a file, None if absent"""
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class FileWatcher:
+    """Tell which files changed since they were last remembered
+
+    A file changed when its inode, size or mtime differ, so files edited in
+    place and files replaced by a rename are both noticed. Files that
+    disappeared are not reported.
+
+    A reported file is not reported again until it is remembered or
+    released, so it is not reloaded twice at once.
+    """
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self._stamps = {}
+        self._pending = set()
+        self._checked = None
+        self._lock = threading.Lock()
+
+    def remember(self, path, current=None):
+        """Take the current version of path, or current, as seen"""
+
+        self._stamps[path] = stamp(path) if current is None else current
+        self._pending.discard(path)
+
+    def release(self, path):
+        """Report path again if it is still changed, without remembering it"""
+
+        self._pending.discard(path)
+
+    def changed(self, interval=0):
+        """Return the (path, stamp) of the changed files
+
+        Files are checked at most once per interval seconds, and by a single
+        thread at a time.
+        """
+
+        now = time.monotonic()
+        if self._checked is not None and now - self._checked < interval:
+            return []
+        if not self._lock.acquire(blocking=False):
+            return []
+        try:
+            self._checked = now
+            changes = []
+            for path in self.paths:
+                if path in self._pending:
+                    continue
+                current = stamp(path)
+                if current is not None and current != self._stamps.get(path):
+                    self._pending.add(path)
+                    changes.append((path, current))
+            return changes
+        finally:
+            self._lock.release()